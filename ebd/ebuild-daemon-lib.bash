@@ -33,6 +33,33 @@ __ebd_read_size() {
 		die "coms error in ${PKGCORE_EBD_PID}, read_size $@ failed w/ ${ret}: backing out of daemon."
 }
 
+# Read length-prefixed env frames directly into exported variables, avoiding
+# the quoting and eval passes required for export statements. The frames are
+# sent as a header line listing 'NAME SIZE' for scalars and
+# 'NAME[] COUNT SIZE...' for arrays, followed by the concatenated values.
+# Sizes are in bytes so the values are read in the C locale.
+__ebd_read_env_frames() {
+	local LC_ALL=C
+	local -a __frames __names
+	local __name __i=0 __j __count
+	read -u ${PKGCORE_EBD_READ_FD} -r -a __frames || return
+	while (( __i < ${#__frames[@]} )); do
+		__name=${__frames[__i++]}
+		if [[ ${__name} == *"[]" ]]; then
+			__name=${__name%"[]"}
+			unset "${__name}"
+			declare -ga "${__name}"
+			for (( __j = 0, __count = __frames[__i++]; __j < __count; __j++ )); do
+				read -u ${PKGCORE_EBD_READ_FD} -r -N ${__frames[__i++]} "${__name}[${__j}]" || return
+			done
+		else
+			read -u ${PKGCORE_EBD_READ_FD} -r -N ${__frames[__i++]} "${__name}" || return
+		fi
+		__names+=( "${__name}" )
+	done
+	export "${__names[@]}"
+}
+
 __ebd_read_cat_size() {
 	dd bs=$1 count=1 <&${PKGCORE_EBD_READ_FD}
 }
@@ -198,6 +198,10 @@ __ebd_process_ebuild_phases() {
 						source "${line}"
 						cont=$?
 						;;
+					frames)
+						__ebd_read_env_frames
+						cont=$?
+						;;
 					bytes*)
 						line=${line#bytes }
 						__ebd_read_size "${line}" line
@@ -286,6 +290,7 @@ __ebd_process_ebuild_phases() {
 	)
 }
 
+# Process the ebuild env passed in via ${__data}.
 __ebd_process_metadata() {
 	# protect the env.
 	# note the local usage is redundant in light of it, but prefer to write it this
@@ -293,11 +298,9 @@ __ebd_process_metadata() {
 	(
 		# Heavy QA checks (IFS, shopt, etc) are suppressed for speed
 		declare -r PKGCORE_QA_SUPPRESSED=false
-		# Wipe __mode; it bleeds from our parent.
-		unset -v __mode
-		local __data
+		# Wipe __mode and any queued requests; they bleed from our parent.
+		unset -v __mode __batch
 		local __ret
-		__ebd_read_size "$1" __data
 		local IFS=$'\0'
 		eval "$__data"
 		__ret=$?
@@ -316,7 +319,7 @@ __ebd_process_metadata() {
 			die "external commands disallowed during metadata regen: '${*}'"
 		}
 
-		__execute_phases "${2:-depend}" && exit 0
+		__execute_phases "${1:-depend}" && exit 0
 		__ebd_process_sandbox_results
 		exit 1
 	)
@@ -330,7 +333,7 @@ __make_preloaded_eclass_func() {
 }
 
 __ebd_main_loop() {
-	PKGCORE_BLACKLIST_VARS+=( __mode com is_depends phases line cont )
+	PKGCORE_BLACKLIST_VARS+=( __mode __data __batch __i com is_depends phases line cont )
 	SANDBOX_ON=1
 	while :; do
 		local com=''
@@ -379,14 +382,35 @@ __ebd_main_loop() {
 				__ebd_write_line "metadata_path_received"
 				;;
 			gen_metadata\ *|gen_ebuild_env\ *)
-				local __mode="depend"
+				local __mode="depend" __data
 				[[ ${com} == gen_ebuild_env* ]] && __mode="generate_env"
 				line=${com#* }
-				if __ebd_process_metadata "${line}" "${__mode}"; then
+				__ebd_read_size "${line}" __data
+				if __ebd_process_metadata "${__mode}"; then
 					__ebd_write_line "phases succeeded"
 				else
 					__ebd_write_line "phases failed"
 				fi
+				unset -v __data
+				;;
+			gen_metadata_batch\ *)
+				# Read all queued requests up front so only responses to
+				# inherit requests are left to be read while processing.
+				local __data __i
+				local -a __batch=()
+				for (( __i = 0; __i < ${com#gen_metadata_batch }; __i++ )); do
+					__ebd_read_line line
+					__ebd_read_size "${line}" "__batch[__i]"
+				done
+				for (( __i = 0; __i < ${#__batch[@]}; __i++ )); do
+					__data=${__batch[__i]}
+					if __ebd_process_metadata depend; then
+						__ebd_write_line "phases succeeded"
+					else
+						__ebd_write_line "phases failed"
+					fi
+				done
+				unset -v __data __i __batch
 				;;
 			alive)
 				__ebd_write_line "yep!"
@@ -85,7 +85,10 @@ alias __load_environ='{
 	[[ -z ${PKGCORE_TARGET_ENV} ]] && die "__load_environ was invoked w/out PKGCORE_TARGET_ENV set";
 	[[ -z ${T} ]] && die "__load_environ requires \$T to be set";
 	PKGCORE_EXISTING_PATH=${PATH};
-	__timed_call __environ_sanitize_saved_env "${PKGCORE_TARGET_ENV}"
+	# envs dumped by previous phases of the same build are already filtered
+	if [[ ${PKGCORE_TARGET_ENV} != "${PKGCORE_TRUSTED_ENV}" ]]; then
+		__timed_call __environ_sanitize_saved_env "${PKGCORE_TARGET_ENV}"
+	fi
 	if [[ -n ${PKGCORE_PERF_DEBUG} ]]; then
 		echo "timing source ${PKGCORE_TARGET_ENV}" >&2
 		time source "${PKGCORE_TARGET_ENV}" >&2
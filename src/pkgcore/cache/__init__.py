@@ -12,8 +12,9 @@ import os
 import operator
 
 from snakeoil import klass
-from snakeoil.chksum import get_handler
+from snakeoil.chksum import LazilyHashedPath, get_handler
 from snakeoil.mappings import ProtectedDict, make_SlottedDict_kls
+from snakeoil.osutils import pjoin
 
 from pkgcore.cache import errors
 from pkgcore.ebuild.const import metadata_keys
@@ -185,6 +186,25 @@ class base(object):
         for x in self.keys():
             yield (x, self[x])
 
+    def export_entry(self, data):
+        """Convert an entry from this cache into a form accepted by other caches.
+
+        Entries read from a cache carry their serialized chksum and eclass
+        data while :obj:`__setitem__` expects the chksum objects generated
+        during metadata regen; this rebuilds the latter from the former.
+        """
+        data = dict(data.items())
+        data['_chf_'] = LazilyHashedPath('', **{self.chf_type: data.pop(self._chf_key)})
+        eclasses = data.get('_eclasses_')
+        if eclasses is not None:
+            d = {}
+            for eclass, chfs in eclasses:
+                chfs = dict(chfs)
+                path = pjoin(chfs.pop('eclassdir', ''), f'{eclass}.eclass')
+                d[eclass] = LazilyHashedPath(path, **chfs)
+            data['_eclasses_'] = d
+        return data
+
     def clear(self):
         for key in list(self):
             del self[key]
@@ -246,7 +266,13 @@ class base(object):
             raise errors.CacheCorruption(
                 cpv, f'ValueError reading {eclass_string!r}') from e
 
-    def validate_entry(self, cache_item, ebuild_hash_item, eclass_db):
+    def validate_entry(self, cache_item, ebuild_hash_item, eclass_db,
+                       eclass_results=None):
+        """Check if a cache entry is still valid, updating its eclass data.
+
+        :param eclass_results: optional dict used to memoize eclass checks
+            between calls, keyed by the eclass data of an entry
+        """
         chf_hash = cache_item.get(self._chf_key)
         if (chf_hash is None or
             chf_hash != getattr(ebuild_hash_item, self.chf_type, None)):
@@ -254,12 +280,50 @@ class base(object):
         eclass_data = cache_item.get('_eclasses_')
         if eclass_data is None:
             return True
-        update = eclass_db.rebuild_cache_entry(eclass_data)
+        if eclass_results is None:
+            update = eclass_db.rebuild_cache_entry(eclass_data)
+        else:
+            key = tuple(eclass_data)
+            try:
+                update = eclass_results[key]
+            except KeyError:
+                update = eclass_results[key] = eclass_db.rebuild_cache_entry(eclass_data)
+            if update is not None:
+                update = dict(update)
         if update is None:
             return False
         cache_item['_eclasses_'] = update
         return True
 
+    def validate_entries(self, ebuild_hashes, eclass_db, eclass_results=None):
+        """Validate the cache entries for multiple packages at once.
+
+        Packages commonly share the same set of inherited eclasses so their
+        checks are only run once per eclass set.
+
+        :param ebuild_hashes: mapping of cpv to the ebuild hash object to
+            validate the cache entry against
+        :param eclass_results: optional dict used to memoize eclass checks,
+            pass the same dict for multiple calls to share the results
+        :return: tuple of a dict mapping cpvs to their valid cache entries
+            and a list of the cpvs without one
+        """
+        if eclass_results is None:
+            eclass_results = {}
+        valid = {}
+        stale = []
+        for cpv, ebuild_hash in ebuild_hashes.items():
+            try:
+                data = self[cpv]
+            except (KeyError, errors.CacheError):
+                stale.append(cpv)
+                continue
+            if self.validate_entry(data, ebuild_hash, eclass_db, eclass_results):
+                valid[cpv] = data
+            else:
+                stale.append(cpv)
+        return valid, stale
+
 
 class bulk(base):
 
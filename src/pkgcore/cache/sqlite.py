@@ -0,0 +1,183 @@
+# License: GPL2/BSD
+
+"""
+single file, indexed backend using sqlite
+
+All entries are stored in one database file keyed by cpv, avoiding the per
+entry open/read/close overhead of the flat file backends. The file can be
+shared read-only, e.g. across build containers, once generated.
+"""
+
+__all__ = ("database", "md5_cache")
+
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+from snakeoil.osutils import ensure_dirs, pjoin
+
+from pkgcore.cache import base, errors
+from pkgcore.config import ConfigHint
+
+
+class database(base):
+    """Stores cache entries as key=value blobs in a sqlite database."""
+
+    pkgcore_config_type = ConfigHint(
+        {'readonly': 'bool', 'location': 'str', 'label': 'str',
+         'auxdbkeys': 'list'},
+        required=['location'],
+        positional=['location'],
+        typename='cache')
+
+    autocommits = False
+    eclass_chf_types = ('eclassdir', 'mtime')
+
+    # bump when the on disk layout changes; older files are wiped if writable
+    schema_version = '1'
+
+    def __init__(self, location, label=None, **config):
+        """
+        :param location: path to the database file
+        :param label: if given, the database file is located at location/label
+        """
+        super().__init__(**config)
+        if label is not None:
+            location = pjoin(location, label.lstrip(os.path.sep))
+        self.location = location
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_pid = None
+        # open up front so format mismatches are reported at creation time
+        self._connection
+
+    @property
+    def _db_metadata(self):
+        return {
+            'version': self.schema_version,
+            'chf_type': self.chf_type,
+            'eclass_chf_types': ' '.join(self.eclass_chf_types),
+        }
+
+    @property
+    def _connection(self):
+        # sqlite connections can't be shared across fork()
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = self._connect()
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _connect(self):
+        try:
+            if self.readonly:
+                if not os.path.exists(self.location):
+                    # nothing generated yet, act as an empty cache
+                    return None
+                conn = sqlite3.connect(
+                    f'file:{quote(self.location)}?mode=ro', uri=True,
+                    check_same_thread=False)
+            else:
+                ensure_dirs(os.path.dirname(self.location), mode=0o775, minimal=True)
+                conn = sqlite3.connect(self.location, check_same_thread=False)
+            self._check_schema(conn)
+        except sqlite3.Error as e:
+            raise errors.InitializationError(self.__class__, e) from e
+        return conn
+
+    def _check_schema(self, conn):
+        expected = self._db_metadata
+        try:
+            found = dict(conn.execute('SELECT key, value FROM metadata'))
+        except sqlite3.OperationalError:
+            # new or non-pkgcore database
+            found = {}
+        if found == expected:
+            return
+        elif self.readonly:
+            raise errors.InitializationError(
+                self.__class__,
+                f'{self.location!r} has incompatible format: {found!r}')
+
+        # it's only a cache; regenerate it from scratch
+        with conn:
+            conn.execute('DROP TABLE IF EXISTS metadata')
+            conn.execute('DROP TABLE IF EXISTS entries')
+            conn.execute(
+                'CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            conn.execute(
+                'CREATE TABLE entries (cpv TEXT PRIMARY KEY, data TEXT NOT NULL) '
+                'WITHOUT ROWID')
+            conn.executemany(
+                'INSERT INTO metadata VALUES (?, ?)', expected.items())
+
+    def _execute(self, sql, args=()):
+        with self._lock:
+            conn = self._connection
+            if conn is None:
+                return ()
+            try:
+                return conn.execute(sql, args).fetchall()
+            except sqlite3.Error as e:
+                raise errors.GeneralCacheCorruption(e) from e
+
+    def _getitem(self, cpv):
+        rows = self._execute('SELECT data FROM entries WHERE cpv = ?', (cpv,))
+        if not rows:
+            raise KeyError(cpv)
+        try:
+            return self._parse_data(rows[0][0].split('\n'))
+        except ValueError as e:
+            raise errors.CacheCorruption(cpv, e) from e
+
+    def _parse_data(self, data):
+        d = self._cdict_kls()
+        known = self._known_keys
+        for x in data:
+            k, v = x.split('=', 1)
+            if k in known:
+                d[k] = v
+        d[self._chf_key] = self._chf_deserializer(d[self._chf_key])
+        return d
+
+    def _setitem(self, cpv, values):
+        data = '\n'.join(f'{k}={v}' for k, v in sorted(values.items()))
+        self._execute(
+            'INSERT OR REPLACE INTO entries (cpv, data) VALUES (?, ?)', (cpv, data))
+
+    def _delitem(self, cpv):
+        if cpv not in self:
+            raise KeyError(cpv)
+        self._execute('DELETE FROM entries WHERE cpv = ?', (cpv,))
+
+    def __contains__(self, cpv):
+        return bool(self._execute('SELECT 1 FROM entries WHERE cpv = ?', (cpv,)))
+
+    def keys(self):
+        return iter([x[0] for x in self._execute('SELECT cpv FROM entries')])
+
+    def __len__(self):
+        rows = self._execute('SELECT COUNT(*) FROM entries')
+        return rows[0][0] if rows else 0
+
+    def commit(self, force=False):
+        with self._lock:
+            if self._conn is not None and not self.readonly:
+                try:
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    raise errors.GeneralCacheCorruption(e) from e
+
+
+class md5_cache(database):
+    """sqlite variant of :obj:`pkgcore.cache.flat_hash.md5_cache`.
+
+    Can be populated from an existing md5-cache via pclonecache.
+    """
+
+    chf_type = 'md5'
+    eclass_chf_types = ('md5',)
+
+    def __init__(self, location, **config):
+        location = pjoin(location, 'metadata', 'md5-cache.sqlite')
+        super().__init__(location, **config)
@@ -0,0 +1,129 @@
+# License: GPL2/BSD
+
+"""
+base for persistent caches validated via file stamps
+
+Several caches store data derived from files on disk, e.g. repo layouts or
+parsed config files, along with stamps of the files such as their mtimes.
+Subsequent runs only need to regenerate the entries whose stamps changed.
+"""
+
+__all__ = ("StampedCache",)
+
+import atexit
+import json
+import os
+import threading
+import time
+
+from snakeoil.demandload import demandload
+from snakeoil.osutils import ensure_dirs
+
+demandload(
+    'snakeoil.fileutils:AtomicWriteFile',
+    'pkgcore.log:logger',
+)
+
+
+class StampedCache(object):
+    """Base class for on-disk JSON caches of entries validated via file stamps.
+
+    Entries are loaded lazily on first access and modifications are written
+    to disk at exit. Subclasses define how entries are stamped and converted
+    to and from their on-disk form.
+
+    :ivar format_version: version of the on-disk format, data written by
+        other versions is ignored
+    :ivar racy_window: files modified within this many seconds aren't
+        recorded since further changes may not alter their mtime
+    :ivar description: name of the cache used in log messages
+    :ivar perms: permissions of the written file
+    """
+
+    format_version = 1
+    racy_window = 2
+    description = 'cache'
+    perms = 0o644
+
+    def __init__(self, path):
+        """
+        :param path: location of the cache file
+        """
+        self.path = path
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _header(self):
+        """Return the fields the on-disk data has to match to be loaded."""
+        return {'version': self.format_version}
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if any(data.get(k) != v for k, v in self._header().items()):
+                return {}
+            return self._decode_entries(data['entries'])
+        except FileNotFoundError:
+            pass
+        except (EnvironmentError, ValueError, TypeError, KeyError) as e:
+            logger.warning('ignoring invalid %s %r: %s', self.description, self.path, e)
+        return {}
+
+    @staticmethod
+    def _decode_entries(entries):
+        """Convert the entries loaded from disk to their in-memory form."""
+        return entries
+
+    @staticmethod
+    def _encode_entries(entries):
+        """Convert the in-memory entries to JSON serializable data."""
+        return entries
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self._load()
+        return self._entries
+
+    def _settled(self, mtimes):
+        """Determine if the given mtimes are old enough to be recorded.
+
+        :param mtimes: iterable of mtimes in nanoseconds, None for missing paths
+        """
+        racy = (time.time() - self.racy_window) * 1e9
+        return all(x is None or x < racy for x in mtimes)
+
+    def _modified(self):
+        if not self._dirty:
+            self._dirty = True
+            atexit.register(self.flush)
+
+    def flush(self):
+        """Write the cache to disk if it was modified."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._write()
+
+    def _write(self):
+        data = self._header()
+        data['entries'] = self._encode_entries(self._entries)
+        cache = None
+        try:
+            dirname = os.path.dirname(self.path)
+            if not os.path.isdir(dirname):
+                ensure_dirs(dirname, mode=0o755, minimal=True)
+            cache = AtomicWriteFile(self.path, binary=False, perms=self.perms)
+            json.dump(data, cache)
+            cache.close()
+        except EnvironmentError as e:
+            # it's only an optimization, don't nag if the location isn't writable
+            logger.debug('failed writing %s %r: %s', self.description, self.path, e)
+        finally:
+            if cache is not None:
+                cache.discard()
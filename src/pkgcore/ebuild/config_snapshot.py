@@ -0,0 +1,151 @@
+# License: GPL2/BSD
+
+"""
+persistent snapshot of parsed config files
+
+Every domain instantiation reads and parses the user's package.* files, with
+most of the time going into parsing each line's atom. The snapshot stores the
+parsed entries of each file (or directory of files) along with a stamp of all
+the paths contributing to it so later runs can rebuild the entries directly
+when nothing changed.
+
+Atoms are stored as their parsed attributes and rebuilt without parsing,
+entries using other restrictions, e.g. globs, are stored as their source line
+and reparsed on load. Files with lines failing to parse aren't stored so the
+related warnings keep being shown.
+"""
+
+__all__ = ("ConfigSnapshot",)
+
+import os
+
+from snakeoil.demandload import demandload
+from snakeoil.osutils import pjoin
+
+from pkgcore import __version__
+from pkgcore.cache.stamped import StampedCache
+from pkgcore.ebuild.atom import atom
+from pkgcore.ebuild.cpv import _Revision
+
+demandload('pkgcore.log:logger')
+
+# atom attributes set during parsing, the hash is regenerated on load
+_atom_attrs = tuple(x for x in atom.__slots__ if x != '_hash')
+_use_idx = _atom_attrs.index('use')
+_revision_idx = _atom_attrs.index('revision')
+
+
+def _encode_atom(a):
+    """Return the attributes of an atom as JSON serializable data, None if unsupported."""
+    if type(a) is not atom or hash(str(a)) != a._hash:
+        # transitive use atoms and atoms hashed on differing strings get reparsed
+        return None
+    state = [getattr(a, x) for x in _atom_attrs]
+    if state[_revision_idx] is not None:
+        state[_revision_idx] = state[_revision_idx].data
+    return [str(a)] + state
+
+
+def _decode_atom(state):
+    sf = object.__setattr__
+    a = object.__new__(atom)
+    state = list(state)
+    if state[_use_idx + 1] is not None:
+        state[_use_idx + 1] = tuple(state[_use_idx + 1])
+    if state[_revision_idx + 1] is not None:
+        state[_revision_idx + 1] = _Revision(state[_revision_idx + 1])
+    for attr, value in zip(_atom_attrs, state[1:]):
+        sf(a, attr, value)
+    sf(a, '_hash', hash(state[0]))
+    return a
+
+
+class ConfigSnapshot(StampedCache):
+    """On-disk snapshot of parsed config files.
+
+    Entries map a parser and config path to the stamp of the path, the files
+    the lines were read from, and the encoded, parsed entries.
+    """
+
+    description = 'config snapshot'
+
+    def _header(self):
+        return dict(super()._header(), pkgcore=__version__, atom=list(_atom_attrs))
+
+    @staticmethod
+    def stamp(path):
+        """Return the stamp of a config file or all the files under a config dir."""
+        stamp = []
+
+        def add(p, rel):
+            st = os.stat(p)
+            stamp.append([rel, st.st_mtime_ns, st.st_size, st.st_ino])
+
+        add(path, '')
+        for root, dirs, files in os.walk(path, followlinks=True):
+            dirs.sort()
+            for name in dirs + sorted(files):
+                p = pjoin(root, name)
+                try:
+                    add(p, os.path.relpath(p, path))
+                except FileNotFoundError:
+                    # dangling symlinks are skipped during reading as well
+                    pass
+        return stamp
+
+    def load(self, path, read_func, parse_func):
+        """Return the parsed entries of a config path.
+
+        :param path: config file or directory
+        :param read_func: invokable yielding ``(line, lineno, path)`` tuples
+            for the lines of the config path
+        :param parse_func: invokable converting the lines into entries, each a
+            tuple with the restriction of the line as its first item
+        :return: tuple of parsed entries
+        """
+        key = f'{parse_func.__module__}.{parse_func.__qualname__}:{path}'
+        try:
+            stamp = self.stamp(path)
+        except FileNotFoundError:
+            stamp = None
+        entries = self.entries
+        entry = entries.get(key)
+        if stamp is not None and entry is not None and entry[0] == stamp:
+            try:
+                return tuple(self._decode(*entry[1:], parse_func))
+            except (ValueError, TypeError, IndexError) as e:
+                logger.warning('ignoring invalid config snapshot entry %r: %s', key, e)
+
+        lines = list(read_func(path))
+        data = tuple(parse_func(iter(lines)))
+        if (stamp is not None and len(data) == len(lines) and
+                self._settled(x[1] for x in stamp)):
+            encoded = self._encode(data, lines)
+            if encoded is not None:
+                with self._lock:
+                    entries[key] = [stamp, *encoded]
+                    self._modified()
+        return data
+
+    @staticmethod
+    def _encode(data, lines):
+        files = {}
+        encoded = []
+        for item, (line, lineno, path) in zip(data, lines):
+            if item[-3:] != (line, lineno, path):
+                # entries don't end with their source line, can't be stored
+                return None
+            file_idx = files.setdefault(path, len(files))
+            state = _encode_atom(item[0])
+            encoded.append([line, lineno, file_idx, state, list(item[1:-3])])
+        return list(files), encoded
+
+    @staticmethod
+    def _decode(files, encoded, parse_func):
+        for line, lineno, file_idx, state, extra in encoded:
+            path = files[file_idx]
+            if state is None:
+                yield from parse_func(iter([(line, lineno, path)]))
+            else:
+                extra = tuple(tuple(x) if isinstance(x, list) else x for x in extra)
+                yield (_decode_atom(state),) + extra + (line, lineno, path)
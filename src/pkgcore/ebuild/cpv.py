@@ -134,7 +134,7 @@ class _native_CPV(object):
 
     __slots__ = (
         "__weakref__", "cpvstr", "key", "category", "package",
-        "version", "revision", "fullver",
+        "version", "revision", "fullver", "_version_key",
     )
 
     # if native is being used, forget trying to reuse strings.
@@ -243,16 +243,66 @@ class _native_CPV(object):
             if self.package and other.package and self.package != other.package:
                 return cmp(self.package, other.package)
 
-            # note I chucked out valueerror, none checks on versions
-            # passed in. I suck, I know.
-            # ~harring
-            # fails in doing comparison of unversioned atoms against
-            # versioned atoms
-            return native_ver_cmp(
-                self.version, self.revision, other.version, other.revision)
+            other_key = getattr(other, 'version_key', None)
+            if self.version is None or other_key is None:
+                # note I chucked out valueerror, none checks on versions
+                # passed in. I suck, I know.
+                # ~harring
+                # fails in doing comparison of unversioned atoms against
+                # versioned atoms
+                return native_ver_cmp(
+                    self.version, self.revision, other.version, other.revision)
+            return cmp(self.version_key, other_key)
         except AttributeError:
             return 1
 
+    @property
+    def version_key(self):
+        """Sort key of the version and revision, see :func:`ver_key`."""
+        try:
+            return self._version_key
+        except AttributeError:
+            key = None if self.version is None else ver_key(self.version, self.revision)
+            object.__setattr__(self, '_version_key', key)
+            return key
+
+
+def ver_key(ver, rev=None):
+    """Generate a key sorting versions in the same order as :func:`native_ver_cmp`.
+
+    Keys consist of nested tuples of ints and strings, so comparisons don't
+    have to reparse the versions. The first element of the key covers the
+    version alone while the second is the revision.
+
+    :param ver: version string
+    :param rev: revision, None or 0 for no revision
+    """
+    parts = ver.split("_")
+    ver_parts = parts[0].split(".")
+
+    letter = ver_parts[-1][-1]
+    if letter.isalpha():
+        ver_parts[-1] = ver_parts[-1][:-1]
+        letter = ord(letter)
+    else:
+        letter = -1
+
+    # Components beginning with a "0" are compared as floats so that
+    # 1.1 > 1.02 and sort before any integer components.
+    components = tuple(
+        (0, x.rstrip("0")) if x[0] == "0" else (1, int(x))
+        for x in ver_parts)
+
+    suffixes = []
+    for suffix in parts[1:]:
+        match = suffix_regexp.match(suffix)
+        suffixes.append((suffix_value[match.group(1)], int("0" + match.group(2))))
+    # No suffix value is 0, so the terminator sorts between the suffixes
+    # that are lower than a release and those that are higher.
+    suffixes.append((0, 0))
+
+    return (components, letter, tuple(suffixes)), int(rev) if rev else 0
+
 
 def native_ver_cmp(ver1, rev1, ver2, rev2):
     # If the versions are the same, comparing revisions will suffice.
@@ -421,6 +471,13 @@ def mk_cpv_cls(base_cls):
         def __reduce__(self):
             return (self.__class__, (self.cpvstr,), None, None, None)
 
+        if not hasattr(base_cls, 'version_key'):
+            @property
+            def version_key(self):
+                if self.version is None:
+                    return None
+                return ver_key(self.version, self.revision)
+
     return CPV
 
 native_CPV = mk_cpv_cls(_native_CPV)
@@ -33,13 +33,14 @@ from pkgcore.ebuild.misc import (
 from pkgcore.ebuild.repo_objs import OverlayedLicenses
 from pkgcore.repository import filtered, errors as repo_errors
 from pkgcore.repository.util import RepositoryGroup
-from pkgcore.restrictions import packages, values
+from pkgcore.restrictions import packages, restriction, values
 from pkgcore.restrictions.delegated import delegate
 from pkgcore.util.parserestrict import parse_match, ParseError
 
 demandload(
     'collections:defaultdict',
     'copy',
+    'hashlib',
     'multiprocessing:cpu_count',
     'operator:itemgetter',
     're',
@@ -50,6 +51,7 @@ demandload(
     'pkgcore.binpkg:repository@binary_repo',
     'pkgcore.cache.flat_hash:md5_cache',
     'pkgcore.ebuild:repository@ebuild_repo',
+    'pkgcore.ebuild.config_snapshot:ConfigSnapshot',
     'pkgcore.ebuild.portage_conf:PortageConfig',
     'pkgcore.ebuild.repo_objs:RepoConfig',
     'pkgcore.ebuild.triggers:GenerateTriggers',
@@ -113,7 +115,61 @@ def make_mask_filter(masks, negate=False):
     return delegate(partial(apply_mask_filter, globs, atoms), negate=negate)
 
 
+class visibility_filter(restriction.base):
+    """Restriction matching visible pkgs, memoizing the verdict per package.
+
+    Verdicts are stored as the tuple of reasons a package is filtered by, e.g.
+    ``('package.mask', 'keywords')``, empty if it's visible. They're kept for
+    the lifetime of the filter, i.e. until the domain config it was generated
+    from changes.
+    """
+
+    __slots__ = ('filters', '_verdicts')
+    __inst_caching__ = False
+
+    type = packages.package_type
+
+    def __init__(self, filters):
+        """
+        :param filters: sequence of (reason, restriction) pairs with each
+            restriction matching pkgs that aren't filtered for that reason
+        """
+        object.__setattr__(self, 'filters', tuple(filters))
+        object.__setattr__(self, '_verdicts', {})
+
+    def reasons(self, pkg):
+        """Return the reasons a package is filtered by, empty if it's visible."""
+        key = (pkg.repo, pkg.cpvstr)
+        verdict = self._verdicts.get(key)
+        if verdict is None:
+            verdict = self._verdicts[key] = tuple(
+                reason for reason, r in self.filters if not r.match(pkg))
+        return verdict
+
+    def match(self, pkg):
+        return not self.reasons(pkg)
+
+    # mode is ignored; none of the filters are influenced by conditionals.
+    force_True = force_False = match
+
+    def __str__(self):
+        return ' && '.join(f'{reason}: {r}' for reason, r in self.filters)
+
+
 def generate_filter(masks, unmasks, *extra):
+    """Generate a visibility filter.
+
+    Unlike a plain AndRestriction of the filters, all filters are evaluated
+    the first time a pkg is checked in order to record every reason it's
+    filtered by. Therefore masked pkgs get checked against the license
+    filter as well, pulling their LICENSE metadata.
+
+    :param masks: restrictions masking pkgs
+    :param unmasks: restrictions unmasking masked pkgs
+    :param extra: additional filters, either (reason, restriction) pairs or
+        bare restrictions which are reported as the 'visibility' reason
+    :return: :obj:`visibility_filter` instance
+    """
     # note that we ignore unmasking if masking isn't specified.
     # no point, mainly
     masking = make_mask_filter(masks, negate=True)
@@ -121,10 +177,14 @@ def generate_filter(masks, unmasks, *extra):
     r = ()
     if masking:
         if unmasking:
-            r = (packages.OrRestriction(masking, unmasking, disable_inst_caching=True),)
+            r = (('package.mask', packages.OrRestriction(
+                masking, unmasking, disable_inst_caching=True)),)
         else:
-            r = (masking,)
-    return packages.AndRestriction(disable_inst_caching=True, finalize=True, *(r + extra))
+            r = (('package.mask', masking),)
+    extra = tuple(
+        ('visibility', x) if isinstance(x, restriction.base) else x
+        for x in extra)
+    return visibility_filter(r + extra)
 
 
 def _read_config_file(path):
@@ -143,13 +203,15 @@ def _read_config_file(path):
 
 
 def load_property(filename, *, read_func=_read_config_file,
-                  parse_func=lambda x: x, fallback=()):
+                  parse_func=lambda x: x, fallback=(), snapshot=False):
     """Decorator for parsing files using specified read/parse methods.
 
     :param filename: The filename to parse within the config directory.
     :keyword read_func: An invokable used to read the specified file.
     :keyword parse_func: An invokable used to parse the data.
     :keyword fallback: What to return if the file does not exist.
+    :keyword snapshot: Whether the parsed data can be stored in the domain's
+        config snapshot, see :obj:`pkgcore.ebuild.config_snapshot`.
     :return: A :py:`klass.jit.attr_named` property instance.
     """
     def f(func):
@@ -160,10 +222,12 @@ def load_property(filename, *, read_func=_read_config_file,
             else:
                 # assume relative files are inside the config dir
                 path = pjoin(self.config_dir, filename)
-            if os.path.exists(path):
-                data = parse_func(read_func(path))
-            else:
+            if not os.path.exists(path):
                 data = fallback
+            elif snapshot and self.config_snapshot is not None:
+                data = self.config_snapshot.load(path, read_func, parse_func)
+            else:
+                data = parse_func(read_func(path))
             return func(self, data, *args, **kwargs)
         doc = getattr(func, '__doc__', None)
         jit_attr_named = klass.jit_attr_named(f'_jit_{func.__name__}', doc=doc)
@@ -185,8 +249,8 @@ class domain(config_domain):
         'profile': 'ref:profile', 'fetcher': 'ref:fetcher',
         'repos': 'lazy_refs:repo', 'vdb': 'lazy_refs:repo', 'name': 'str',
     }
-    for _thing in ('root', 'config_dir', 'CHOST', 'CBUILD', 'CTARGET', 'CFLAGS', 'PATH',
-                   'PORTAGE_TMPDIR', 'DISTCC_PATH', 'DISTCC_DIR', 'CCACHE_DIR'):
+    for _thing in ('root', 'config_dir', 'config_snapshot', 'CHOST', 'CBUILD',
+                   'CTARGET', 'CFLAGS', 'PATH', 'PORTAGE_TMPDIR', 'DISTCC_PATH', 'DISTCC_DIR', 'CCACHE_DIR'):
         _types[_thing] = 'str'
 
     # TODO this is missing defaults
@@ -199,10 +263,13 @@ class domain(config_domain):
 
     def __init__(self, profile, repos, vdb, name=None,
                  root='/', config_dir='/etc/portage', prefix='/', *,
-                 fetcher, **settings):
+                 fetcher, config_snapshot=None, **settings):
         self.name = name
         self.root = settings["ROOT"] = root
         self.config_dir = config_dir
+        self.config_snapshot = None
+        if config_snapshot is not None:
+            self.config_snapshot = ConfigSnapshot(config_snapshot)
         self.prefix = prefix
         self.ebuild_hook_dir = pjoin(self.config_dir, 'env')
         self.profile = profile
@@ -348,38 +415,38 @@ class domain(config_domain):
         use.freeze()
         return use
 
-    @load_property("package.mask", parse_func=package_masks)
+    @load_property("package.mask", parse_func=package_masks, snapshot=True)
     def pkg_masks(self, data, debug=False):
         if debug:
             return tuple(data)
         return tuple(x[0] for x in data)
 
-    @load_property("package.unmask", parse_func=package_masks)
+    @load_property("package.unmask", parse_func=package_masks, snapshot=True)
     def pkg_unmasks(self, data, debug=False):
         if debug:
             return tuple(data)
         return tuple(x[0] for x in data)
 
     # TODO: deprecated, remove in 0.11
-    @load_property("package.keywords", parse_func=package_keywords_splitter)
+    @load_property("package.keywords", parse_func=package_keywords_splitter, snapshot=True)
     def pkg_keywords(self, data, debug=False):
         if debug:
             return tuple(data)
         return tuple((x[0], stable_unique(x[1])) for x in data)
 
-    @load_property("package.accept_keywords", parse_func=package_keywords_splitter)
+    @load_property("package.accept_keywords", parse_func=package_keywords_splitter, snapshot=True)
     def pkg_accept_keywords(self, data, debug=False):
         if debug:
             return tuple(data)
         return tuple((x[0], stable_unique(x[1])) for x in data)
 
-    @load_property("package.license", parse_func=package_keywords_splitter)
+    @load_property("package.license", parse_func=package_keywords_splitter, snapshot=True)
     def pkg_licenses(self, data, debug=False):
         if debug:
             return tuple(data)
         return tuple((x[0], stable_unique(x[1])) for x in data)
 
-    @load_property("package.use", parse_func=package_keywords_splitter)
+    @load_property("package.use", parse_func=package_keywords_splitter, snapshot=True)
     def pkg_use(self, data, debug=False):
         if debug:
             return tuple(data)
@@ -393,6 +460,40 @@ class domain(config_domain):
             return tuple(data)
         return tuple((x[0], x[1]) for x in data)
 
+    @klass.jit_attr
+    def config_hash(self):
+        """Hash identifying the configuration pkgs are filtered and configured by.
+
+        Covers the domain settings along with the mtimes of the files in the
+        profile stack and config dir, used to validate persistent caches.
+        """
+        h = hashlib.sha1()
+        for k, v in sorted(self.settings.items()):
+            if isinstance(v, (set, frozenset)) or (
+                    k in const.incrementals and k not in ('USE', 'ACCEPT_LICENSE')):
+                # stored in arbitrary order
+                v = sorted(v)
+            h.update(f'{k}={v!r}\n'.encode())
+        h.update(f'USE={sorted(self.use)!r}\n'.encode())
+
+        def stamp(path):
+            try:
+                h.update(f'{path}={os.stat(path).st_mtime_ns}\n'.encode())
+            except FileNotFoundError:
+                pass
+
+        # child profiles are subdirs of profile dirs, don't descend into them
+        for node in self.profile.stack:
+            stamp(node.path)
+            if os.path.isdir(node.path):
+                for entry in sorted(os.listdir(node.path)):
+                    stamp(pjoin(node.path, entry))
+        for root, dirs, files in os.walk(self.config_dir):
+            dirs.sort()
+            for name in sorted(files):
+                stamp(pjoin(root, name))
+        return h.hexdigest()
+
     @klass.jit_attr
     def bashrcs(self):
         files = sorted_scan(pjoin(self.config_dir, 'bashrc'), follow_symlinks=True)
@@ -415,9 +516,9 @@ class domain(config_domain):
         # create keyword filters
         accept_keywords = (
             pkg_keywords + pkg_accept_keywords + self.profile.accept_keywords)
-        vfilters = [self._make_keywords_filter(
+        vfilters = [('keywords', self._make_keywords_filter(
             default_keywords, accept_keywords,
-            incremental="package.keywords" in const.incrementals)]
+            incremental="package.keywords" in const.incrementals))]
 
         # add license filters
         master_license = []
@@ -425,7 +526,7 @@ class domain(config_domain):
         if master_license or self.pkg_licenses:
             # restrict that matches iff the licenses are allowed
             restrict = delegate(partial(self._apply_license_filter, master_license))
-            vfilters.append(restrict)
+            vfilters.append(('license', restrict))
 
         return tuple(vfilters)
 
@@ -726,6 +827,24 @@ class domain(config_domain):
         filtered_repo = filtered.tree(repo, filter, True)
         return filtered_repo
 
+    def mask_reasons(self, pkg):
+        """Return the reasons a package is filtered from the domain's repos.
+
+        Uses the verdicts cached while matching against the filtered repos,
+        e.g. by the resolver, only evaluating the filters for unseen pkgs.
+
+        :return: tuple of reasons, e.g. ``('package.mask', 'keywords')``,
+            empty if the package is visible; None if its repo isn't filtered
+        """
+        for repo in self.source_repos:
+            if not isinstance(repo, filtered.tree):
+                continue
+            # match both configured and raw pkgs
+            raw_repo = repo.raw_repo
+            if pkg.repo is raw_repo or pkg.repo is getattr(raw_repo, 'raw_repo', None):
+                return repo.restrict.reasons(pkg)
+        return None
+
     @klass.jit_attr_named('_jit_reset_tmpdir', uncached_val=None)
     def tmpdir(self):
         """Temporary directory for the system.
@@ -34,6 +34,7 @@ from snakeoil.process.spawn import (
 
 from pkgcore import const
 from pkgcore.ebuild import ebd_ipc, ebuild_built, errors
+from pkgcore.ebuild.env_snapshot import EnvSnapshot
 from pkgcore.ebuild.processor import (
     request_ebuild_processor, release_ebuild_processor, ProcessorError,
     expected_ebuild_env, chuck_UnhandledCommand, inherit_handler)
@@ -264,6 +265,7 @@ class ebd(object):
             with open(fp, "wb") as f:
                 f.write(data)
             del data
+            EnvSnapshot(self.env["T"]).invalidate()
 
     def _set_per_phase_env(self, phase, env):
         self._setup_merge_type(phase, env)
@@ -338,10 +340,22 @@ class ebd(object):
         extra_handlers.update(self._ipc_helpers)
         if not suppress_bashrc:
             extra_handlers.setdefault("request_bashrcs", self._request_bashrcs)
-        return run_generic_phase(
+
+        # saved envs dumped by previous phases don't need to be scrubbed again
+        snapshot = EnvSnapshot(self.env["T"])
+        stamp = snapshot.stamp()
+        if snapshot.trusted(stamp):
+            self.env["PKGCORE_TRUSTED_ENV"] = snapshot.env_path
+        else:
+            self.env.pop("PKGCORE_TRUSTED_ENV", None)
+
+        ret = run_generic_phase(
             self.pkg, phase, self.env, userpriv, sandbox,
             extra_handlers=extra_handlers, failure_allowed=failure_allowed,
             logging=self.logging)
+        if ret:
+            snapshot.update(stamp)
+        return ret
 
     def _request_bashrcs(self, ebd):
         for source in self.domain.get_package_bashrcs(self.pkg):
@@ -7,6 +7,7 @@ package class for buildable ebuilds
 
 __all__ = ("base", "package", "package_factory")
 
+from collections import Counter
 from functools import partial
 from itertools import chain
 import os
@@ -16,6 +17,7 @@ from pkgcore.cache import errors as cache_errors
 from pkgcore.ebuild import conditionals, processor
 from pkgcore.ebuild import errors as ebuild_errors
 from pkgcore.ebuild.atom import atom
+from pkgcore.ebuild.metadata_table import MetadataTable
 from pkgcore.ebuild.misc import sort_keywords
 from pkgcore.package import errors as metadata_errors
 from pkgcore.package import metadata
@@ -388,6 +390,8 @@ class package_factory(metadata.factory):
         super().__init__(parent, *args, **kwargs)
         self._cache = cachedb
         self._ecache = eclass_cache
+        # cache entries preloaded in bulk via validate_metadata()
+        self._table = MetadataTable()
 
         if mirrors:
             mirrors = {k: fetch.mirror(v, k) for k, v in mirrors.items()}
@@ -407,10 +411,83 @@ class package_factory(metadata.factory):
     def _get_ebuild_mtime(self, pkg):
         return os.stat(self._get_ebuild_path(pkg)).st_mtime
 
+    def validate_metadata(self, ebuild_hashes, preload=False):
+        """Validate the cached metadata for multiple packages at once.
+
+        :param ebuild_hashes: mapping of cpv to the ebuild hash object
+            for each package to check
+        :param preload: store the valid cache entries in a compact table
+            backing the metadata of the related packages, skipping
+            revalidation for later metadata requests
+        :return: tuple of the sets of cpvs with valid and stale metadata
+        """
+        valid = set()
+        remaining = ebuild_hashes
+        eclass_results = {}
+        for cache in self._cache:
+            if cache is None or not remaining:
+                continue
+            entries, stale = cache.validate_entries(
+                remaining, self._ecache, eclass_results)
+            valid.update(entries)
+            if preload:
+                for cpv, data in entries.items():
+                    # drop the cache specific chksum entries
+                    self._table.add(cpv, {
+                        k: v for k, v in data.items()
+                        if k[0] != '_' or k == '_eclasses_'})
+            remaining = {k: remaining[k] for k in stale}
+        return valid, set(remaining)
+
+    def eclass_stats(self):
+        """Count the pkgs inheriting each eclass.
+
+        Only pkgs with metadata preloaded via :obj:`validate_metadata` are
+        counted.
+
+        :return: :obj:`collections.Counter` mapping eclass names to pkg counts
+        """
+        stats = Counter()
+        for eclasses, count in self._table.value_counts('_eclasses_'):
+            for eclass in eclasses:
+                stats[eclass] += count
+        return stats
+
+    def _cached_eclasses(self, pkg):
+        """Return the eclasses a pkg inherited according to its cache entry.
+
+        The entry isn't validated, so for stale entries these are the
+        eclasses inherited when it was last generated.
+        """
+        for cache in self._cache:
+            if cache is not None:
+                try:
+                    # unvalidated entries hold (eclass, chksums) pairs
+                    eclasses = cache[pkg.cpvstr].get('_eclasses_', ())
+                    return frozenset(eclass for eclass, _ in eclasses)
+                except KeyError:
+                    continue
+                except cache_errors.CacheError as e:
+                    logger.warning("caught cache error: %s", e)
+                    continue
+        return frozenset()
+
     def _get_metadata(self, pkg, ebp=None, force_regen=False):
+        data = self._get_cached_metadata(pkg, force_regen=force_regen)
+        if data is not None:
+            return data
+        # no cache entries, regen
+        return self._update_metadata(pkg, ebp=ebp)
+
+    def _get_cached_metadata(self, pkg, force_regen=False):
         caches = self._cache
         if force_regen:
             caches = ()
+            self._table.discard(pkg.cpvstr)
+        else:
+            data = self._table.get(pkg.cpvstr)
+            if data is not None:
+                return data
         ebuild_hash = chksum.LazilyHashedPath(pkg.path)
         for cache in caches:
             if cache is not None:
@@ -426,9 +503,7 @@ class package_factory(metadata.factory):
                     logger.warning("caught cache error: %s", e)
                     del e
                     continue
-
-        # no cache entries, regen
-        return self._update_metadata(pkg, ebp=ebp)
+        return None
 
     def _update_metadata(self, pkg, ebp=None):
         parsed_eapi = pkg.eapi
@@ -442,6 +517,55 @@ class package_factory(metadata.factory):
                 raise metadata_errors.MetadataException(
                     pkg, 'data', 'failed sourcing ebuild', e)
 
+        return self._store_metadata(pkg, mydata)
+
+    def _get_metadata_batch(self, pkgs, ebp, force_regen=False):
+        """Get the metadata of multiple pkgs, regenerating it in batches as needed.
+
+        :param pkgs: sequence of pkgs
+        :param ebp: :obj:`pkgcore.ebuild.processor.EbuildProcessor` instance
+            used for regeneration
+        :return: iterator of (pkg, metadata) pairs in the order pkgs were
+            given, metadata being a
+            :obj:`pkgcore.package.errors.MetadataException` instance on
+            failure; iteration stops early if the processor died
+        """
+        cached = {}
+        stale = []
+        for pkg in pkgs:
+            data = self._get_cached_metadata(pkg, force_regen=force_regen)
+            if data is None:
+                if pkg.eapi.is_supported:
+                    stale.append(pkg)
+                    continue
+                data = {'EAPI': str(pkg.eapi)}
+            cached[id(pkg)] = data
+
+        regen = ebp.get_keys_batch(stale, self._ecache)
+        try:
+            for pkg in pkgs:
+                data = cached.get(id(pkg))
+                if data is None:
+                    try:
+                        _, mydata = next(regen)
+                    except StopIteration:
+                        # processor died
+                        return
+                    if isinstance(mydata, processor.ProcessorError):
+                        data = metadata_errors.MetadataException(
+                            pkg, 'data', 'failed sourcing ebuild', mydata)
+                    else:
+                        try:
+                            data = self._store_metadata(pkg, mydata)
+                        except metadata_errors.MetadataException as e:
+                            data = e
+                yield pkg, data
+        finally:
+            regen.close()
+
+    def _store_metadata(self, pkg, mydata):
+        """Finalize regenerated metadata and write it to the cache."""
+        parsed_eapi = pkg.eapi
         inherited = mydata.pop("INHERITED", None)
         # Rewrite defined_phases as needed, since we now know the EAPI.
         eapi = get_eapi(mydata["EAPI"])
@@ -0,0 +1,78 @@
+# License: GPL2/BSD
+
+"""
+tracking of saved build environments dumped by the ebd
+
+Phases loading a saved environment run it through filter-env and a scrubbing
+dump in a subshell first since it may come from an arbitrary source, e.g. a
+binpkg or a vdb entry. Most of the time though it's the environment the ebd
+itself dumped at the end of the previous phase of the same build, which is
+already filtered.
+
+The snapshot records the stamp of the environment file after a phase dumped
+it so the following phases, including ones run by later pebuild invocations
+on the same build dir, can load it directly as long as it wasn't modified
+since.
+"""
+
+__all__ = ("EnvSnapshot",)
+
+import os
+
+from snakeoil.osutils import pjoin
+
+from pkgcore.cache.stamped import StampedCache
+
+
+class EnvSnapshot(StampedCache):
+    """Snapshot of the saved environment of a build.
+
+    The snapshot is always read from and written to disk directly since
+    multiple processes work on the same build dir.
+
+    :ivar env_path: location of the saved environment
+    """
+
+    format_version = 2
+    description = 'env snapshot'
+    perms = 0o664
+
+    def __init__(self, tmpdir):
+        """
+        :param tmpdir: temporary dir (``$T``) of the build
+        """
+        super().__init__(pjoin(tmpdir, '.environment.snapshot'))
+        self.env_path = pjoin(tmpdir, 'environment')
+
+    def stamp(self):
+        """Return the current stamp of the saved environment, None if missing."""
+        try:
+            st = os.stat(self.env_path)
+        except FileNotFoundError:
+            return None
+        return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+    def trusted(self, stamp):
+        """Determine if the saved environment was dumped by the ebd.
+
+        :param stamp: stamp of the saved environment from :meth:`stamp`
+        """
+        return stamp is not None and stamp == self._load().get('stamp')
+
+    def update(self, previous):
+        """Record the saved environment if a phase dumped it.
+
+        :param previous: stamp of the saved environment before the phase ran
+        """
+        stamp = self.stamp()
+        if stamp is None or stamp == previous:
+            return
+        self._entries = {'stamp': stamp}
+        self._write()
+
+    def invalidate(self):
+        """Drop the snapshot, e.g. when the saved environment is replaced."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
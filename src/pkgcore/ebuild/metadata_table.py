@@ -0,0 +1,175 @@
+# License: GPL2/BSD
+
+"""
+compact columnar storage for package metadata
+
+Full repo scans otherwise keep a separate metadata dict for every package
+with its own copies of mostly identical strings (descriptions, licenses, and
+dependencies are usually shared between versions). Here each metadata key is
+stored as an array of indexes into a per-key pool of unique values and
+packages are handed lightweight row views instead.
+"""
+
+__all__ = ("MetadataTable", "MetadataRow")
+
+from array import array
+from collections import Counter
+from sys import intern
+
+# index of unset values in all columns
+_MISSING = 0
+
+
+class MetadataTable(object):
+    """Table of package metadata keyed by cpv."""
+
+    def __init__(self):
+        self._rows = {}
+        self._size = 0
+        self._columns = {}
+        self._pools = {}
+        self._pool_indexes = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, cpv):
+        return cpv in self._rows
+
+    @staticmethod
+    def _pool_key(val):
+        if hasattr(val, 'items'):
+            # e.g. _eclasses_, which maps eclass names to chksum objects
+            return tuple(sorted(val.items()))
+        return val
+
+    def _add_column(self, key):
+        self._columns[key] = array('I', [_MISSING]) * self._size
+        self._pools[key] = [None]
+        self._pool_indexes[key] = {}
+
+    def add(self, cpv, data):
+        """Add or replace the metadata for a package.
+
+        :param cpv: package cpv string
+        :param data: mapping of metadata keys to values
+        """
+        for key in data.keys():
+            if key not in self._columns:
+                self._add_column(key)
+
+        for key, column in self._columns.items():
+            val = data.get(key)
+            if val is None:
+                column.append(_MISSING)
+                continue
+            if isinstance(val, str):
+                val = intern(val)
+            pool_key = self._pool_key(val)
+            index = self._pool_indexes[key].get(pool_key)
+            if index is None:
+                pool = self._pools[key]
+                index = self._pool_indexes[key][pool_key] = len(pool)
+                pool.append(val)
+            column.append(index)
+
+        self._rows[cpv] = self._size
+        self._size += 1
+
+    def get(self, cpv):
+        """Return a :obj:`MetadataRow` for a package or None if it's missing."""
+        row = self._rows.get(cpv)
+        if row is None:
+            return None
+        return MetadataRow(self, row)
+
+    def discard(self, cpv):
+        """Drop a package from the table.
+
+        Its storage isn't reclaimed, use :obj:`clear` for that.
+        """
+        self._rows.pop(cpv, None)
+
+    def clear(self):
+        """Remove all packages."""
+        self.__init__()
+
+    def value_counts(self, key):
+        """Count the packages sharing each distinct value of a metadata key.
+
+        :return: list of (value, count) pairs, packages lacking the key
+            aren't counted
+        """
+        column = self._columns.get(key)
+        if column is None:
+            return []
+        counts = Counter(column[row] for row in self._rows.values())
+        counts.pop(_MISSING, None)
+        pool = self._pools[key]
+        return [(pool[index], count) for index, count in counts.items()]
+
+    def _value(self, row, key):
+        column = self._columns.get(key)
+        if column is None:
+            return None
+        index = column[row]
+        if index == _MISSING:
+            return None
+        return self._pools[key][index]
+
+    def _keys(self, row):
+        return [k for k, column in self._columns.items() if column[row] != _MISSING]
+
+
+class MetadataRow(object):
+    """Read-only mapping view of a package's row in a :obj:`MetadataTable`.
+
+    Package attribute generation pops the raw values it consumes from its
+    metadata; since rows are shared, :obj:`pop` doesn't remove anything.
+    """
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        val = self._table._value(self._row, key)
+        if val is None:
+            raise KeyError(key)
+        return val
+
+    def get(self, key, default=None):
+        val = self._table._value(self._row, key)
+        if val is None:
+            return default
+        return val
+
+    pop = get
+
+    def __contains__(self, key):
+        return self._table._value(self._row, key) is not None
+
+    def keys(self):
+        return iter(self._table._keys(self._row))
+
+    __iter__ = keys
+
+    def values(self):
+        return (self[k] for k in self.keys())
+
+    def items(self):
+        return ((k, self[k]) for k in self.keys())
+
+    def __len__(self):
+        return len(self._table._keys(self._row))
+
+    def __eq__(self, other):
+        try:
+            return dict(self.items()) == dict(other.items())
+        except AttributeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({dict(self.items())!r})'
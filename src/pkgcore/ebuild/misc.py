@@ -17,13 +17,15 @@ from collections import defaultdict, namedtuple
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from itertools import chain
+from operator import attrgetter, itemgetter
 
 from snakeoil import mappings
+from snakeoil.compatibility import IGNORED_EXCEPTIONS
 from snakeoil.klass import generic_equality, alias_method
 from snakeoil.sequences import iflatten_instance
 
-from pkgcore.ebuild import atom
-from pkgcore.restrictions import packages, restriction, boolean
+from pkgcore.ebuild import atom, restricts
+from pkgcore.restrictions import packages, restriction, boolean, values
 
 restrict_payload = namedtuple("restrict_data", ["restrict", "data"])
 chunked_data = namedtuple("chunked_data", ("key", "neg", "pos"))
@@ -160,6 +162,70 @@ class IncrementalsDict(mappings.DictMixin):
     del x, s
 
 
+# pkg attributes restrictions depend on, mapped to the attributes used to key
+# memoized lookups
+_memo_attrs = {
+    'category': 'key', 'package': 'key', 'key': 'key',
+    'fullver': 'fullver', 'version': 'fullver', 'revision': 'fullver',
+    'slot': 'slot', 'subslot': 'subslot', 'repo.repo_id': 'repo.repo_id',
+}
+
+# restrictions on attributes that can be indexed by value
+_indexed_attrs = {
+    'category': attrgetter('category'),
+    'package': attrgetter('package'),
+    'repo.repo_id': attrgetter('repo.repo_id'),
+}
+
+
+def _restrict_attrs(restrict):
+    """Determine the pkg attributes a restriction's result depends on.
+
+    :return: set of attributes, None if they can't be determined
+    """
+    if isinstance(restrict, atom.atom):
+        if restrict.use is not None or restrict.blocks:
+            return None
+        attrs = {'key'}
+        if restrict.op:
+            attrs.add('fullver')
+        if restrict.slot is not None:
+            attrs.add('slot')
+        if restrict.subslot is not None:
+            attrs.add('subslot')
+        if restrict.repo_id is not None:
+            attrs.add('repo.repo_id')
+        return attrs
+    elif isinstance(restrict, restriction.AlwaysBool):
+        return set()
+    elif isinstance(restrict, restricts.VersionMatch):
+        return {'fullver'}
+    elif isinstance(restrict, boolean.base):
+        attrs = set()
+        for r in restrict.restrictions:
+            r_attrs = _restrict_attrs(r)
+            if r_attrs is None:
+                return None
+            attrs.update(r_attrs)
+        return attrs
+    elif isinstance(restrict, packages.PackageRestriction) and \
+            not isinstance(restrict, packages.PackageRestrictionMulti):
+        attr = _memo_attrs.get(restrict.attr)
+        if attr is not None:
+            return {attr}
+    return None
+
+
+def _indexed_value(restrict):
+    """Return the attribute and value a restriction exactly matches, None if it doesn't."""
+    if (type(restrict) in (restricts.CategoryDep, restricts.PackageDep, restricts.RepositoryDep)
+            and not restrict.negate and restrict.attr in _indexed_attrs):
+        r = restrict.restriction
+        if isinstance(r, values.StrExactMatch) and not r.negate and r.case_sensitive:
+            return restrict.attr, r.exact
+    return None
+
+
 class collapsed_restrict_to_data(object, metaclass=generic_equality):
 
     __attr_comparison__ = ('defaults', 'freeform', 'atoms', '__class__')
@@ -226,17 +292,82 @@ class collapsed_restrict_to_data(object, metaclass=generic_equality):
         self.defaults_finalized = set(x for x in self.defaults if not x.startswith("-"))
         self.freeform = tuple(x for x in (repo, cat, pkg, multi) if x)
         self.atoms = atom_d
+        self._compile()
+
+    def _compile(self):
+        """Generate the lookup tables used to match pkgs."""
+        # Exact category, package, and repo restrictions are bucketed by the
+        # value they match, the rest is matched against every pkg. Indexes
+        # preserve the original ordering which matters for the incremental
+        # expansion of the matched data.
+        self._freeform_index = []
+        for specific in self.freeform:
+            getter, buckets, rest = None, {}, []
+            for i, (restrict, data) in enumerate(specific):
+                indexed = _indexed_value(restrict)
+                if indexed is not None and getter in (None, _indexed_attrs[indexed[0]]):
+                    getter = _indexed_attrs[indexed[0]]
+                    buckets.setdefault(indexed[1], []).append((i, data))
+                else:
+                    rest.append((i, restrict, data))
+            self._freeform_index.append((getter, buckets, rest))
+
+        # Matches are memoized by the pkg attributes the restrictions depend
+        # on if they can all be determined, e.g. use deps can't be supported.
+        attrs = set()
+        restrictions = chain(
+            (r for specific in self.freeform for r, _ in specific),
+            (r for atoms in self.atoms.values() for r, _ in atoms))
+        for restrict in restrictions:
+            r_attrs = _restrict_attrs(restrict)
+            if r_attrs is None:
+                self._memo_key = None
+                break
+            attrs.update(r_attrs)
+        else:
+            attrs.add('key')
+            self._memo_key = attrgetter(*sorted(attrs))
+        self._memo = {}
+
+    def _pull_matches(self, pkg):
+        """Return the data of all restrictions matching a pkg, in order."""
+        key = None
+        if self._memo_key is not None:
+            try:
+                key = self._memo_key(pkg)
+            except IGNORED_EXCEPTIONS:
+                raise
+            except Exception:
+                # let the restrictions handle missing attrs
+                pass
+            else:
+                l = self._memo.get(key)
+                if l is not None:
+                    return l
 
-    def pull_data(self, pkg, force_copy=False, pre_defaults=()):
         l = []
-        for specific in self.freeform:
-            for restrict, data in specific:
-                if restrict.match(pkg):
-                    l.append(data)
+        for getter, buckets, rest in self._freeform_index:
+            matched = []
+            if buckets:
+                try:
+                    matched.extend(buckets.get(getter(pkg), ()))
+                except AttributeError:
+                    pass
+            matched.extend((i, data) for i, restrict, data in rest if restrict.match(pkg))
+            if matched:
+                matched.sort(key=itemgetter(0))
+                l.extend(data for i, data in matched)
         for atom, data in self.atoms.get(pkg.key, ()):
             if atom.match(pkg):
                 l.append(data)
 
+        if key is not None:
+            self._memo[key] = l = tuple(l)
+        return l
+
+    def pull_data(self, pkg, force_copy=False, pre_defaults=()):
+        l = self._pull_matches(pkg)
+
         if pre_defaults:
             s = set(pre_defaults)
             incremental_expansion(s, self.defaults)
@@ -252,28 +383,15 @@ class collapsed_restrict_to_data(object, metaclass=generic_equality):
             yield item
         for item in self.defaults:
             yield item
-        for specific in self.freeform:
-            for restrict, data in specific:
-                if restrict.match(pkg):
-                    for item in data:
-                        yield item
-        for atom, data in self.atoms.get(pkg.key, ()):
-            if atom.match(pkg):
-                for item in data:
-                    yield item
+        for data in self._pull_matches(pkg):
+            for item in data:
+                yield item
 
 
 class non_incremental_collapsed_restrict_to_data(collapsed_restrict_to_data):
 
     def pull_data(self, pkg, force_copy=False):
-        l = []
-        for specific in self.freeform:
-            for restrict, data in specific:
-                if restrict.match(pkg):
-                    l.append(data)
-        for atom, data in self.atoms.get(pkg.key, ()):
-            if atom.match(pkg):
-                l.append(data)
+        l = self._pull_matches(pkg)
         if not l:
             if force_copy:
                 return set(self.defaults)
@@ -284,11 +402,7 @@ class non_incremental_collapsed_restrict_to_data(collapsed_restrict_to_data):
 
     def iter_pull_data(self, pkg):
         l = [self.defaults]
-        for specific in self.freeform:
-            l.extend(data for restrict, data in specific if restrict.match(pkg))
-        for atom, data in self.atoms.get(pkg.key, ()):
-            if atom.match(pkg):
-                l.append(data)
+        l.extend(self._pull_matches(pkg))
         if len(l) == 1:
             return iter(self.defaults)
         return iflatten_instance(l)
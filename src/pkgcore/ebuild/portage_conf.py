@@ -32,7 +32,9 @@ from pkgcore.pkgsets.glsa import SecurityUpgrades
 demandload(
     'errno',
     'pkgcore.config:errors',
+    'pkgcore.ebuild.profile_cache:ProfileCache',
     'pkgcore.log:logger',
+    'pkgcore:os_data',
 )
 
 
@@ -190,6 +192,9 @@ class PortageConfig(DictMixin):
         # XXX: Hack for portage-2 profile format support. We need to figure out how
         # to dynamically create this from the config at runtime on attr access.
         profiles.ProfileNode._repo_map = ImmutableDict(repo_map)
+        if profiles.ProfileNode._parse_cache is None:
+            profiles.ProfileNode._parse_cache = ProfileCache(
+                self._make_cache_path('profile-cache'))
 
         self._make_repo_syncers(repos_conf, make_conf)
         repos = [name for name in repos_conf.keys()]
@@ -232,6 +237,8 @@ class PortageConfig(DictMixin):
             'name': 'livefs',
             'root': self.root,
             'config_dir': self.dir,
+            'config_snapshot': self._make_cache_path(
+                'domains', self.dir.lstrip('/'), 'config-snapshot'),
         })
 
         self['livefs'] = basics.FakeIncrementalDictConfigSection(
@@ -504,13 +511,20 @@ class PortageConfig(DictMixin):
         fetchcommand = make_conf.pop("FETCHCOMMAND")
         resumecommand = make_conf.pop("RESUMECOMMAND", fetchcommand)
 
+        distdir = normpath(os.environ.get("DISTDIR", make_conf.pop("DISTDIR")))
         fetcher_dict = {
             "class": "pkgcore.fetch.custom.fetcher",
-            "distdir": normpath(os.environ.get("DISTDIR", make_conf.pop("DISTDIR"))),
+            "distdir": distdir,
             "command": fetchcommand,
             "resume_command": resumecommand,
             "attempts": make_conf.pop("FETCH_ATTEMPTS", '10'),
+            # kept outside the distdir since it's commonly shared
+            "stamps_path": self._make_cache_path(
+                'distfiles', distdir.lstrip('/'), 'verified'),
         }
+        mirror_jobs = make_conf.pop("FETCH_MIRROR_JOBS", None)
+        if mirror_jobs is not None:
+            fetcher_dict["mirror_jobs"] = mirror_jobs
         self["fetcher"] = basics.AutoConfigSection(fetcher_dict)
 
     def _isolate_rsync_opts(self, options):
@@ -573,6 +587,35 @@ class PortageConfig(DictMixin):
             'readonly': readonly
         })
 
+    @staticmethod
+    def _make_sqlite_cache(repo_path):
+        """Configure single file md5 cache if one was generated for the repo."""
+        sqlite_cache = pjoin(repo_path, 'metadata', 'md5-cache.sqlite')
+        if not os.path.exists(sqlite_cache):
+            return None
+        # sqlite requires write access to the db and its dir for journaling
+        readonly = not (
+            access(sqlite_cache, os.W_OK) and
+            access(os.path.dirname(sqlite_cache), os.W_OK | os.X_OK))
+        return basics.AutoConfigSection({
+            'class': 'pkgcore.cache.sqlite.md5_cache',
+            'location': repo_path,
+            'readonly': readonly
+        })
+
+    @staticmethod
+    def _make_cache_path(*paths):
+        """Determine the location of a file under the cache dir."""
+        if os_data.uid in (os_data.root_uid, os_data.portage_uid):
+            cache_dir = const.SYSTEM_CACHE_PATH
+        else:
+            cache_dir = const.USER_CACHE_PATH
+        return pjoin(cache_dir, *paths)
+
+    def _make_repo_index(self, repo_path, name):
+        """Determine the location of a repo index, e.g. the layout index."""
+        return self._make_cache_path('repos', repo_path.lstrip('/'), name)
+
     def _register_repo_type(supported_repo_types):
         """Decorator to register supported repo types."""
         def _wrap_func(func):
@@ -615,6 +658,19 @@ class PortageConfig(DictMixin):
             cache_name = 'cache:' + repo_name
             self[cache_name] = self._make_cache(repo_obj.cache_format, repo_path)
             repo['cache'] = cache_name
+            # single file caches, e.g. generated via pclonecache, aren't
+            # updated on sync so they're only used for entries the regular
+            # cache doesn't have valid
+            sqlite_cache = self._make_sqlite_cache(repo_path)
+            if sqlite_cache is not None:
+                self['cache-sqlite:' + repo_name] = sqlite_cache
+                repo['cache'] = f'{cache_name} cache-sqlite:{repo_name}'
+
+        repo['layout_index'] = self._make_repo_index(repo_path, 'layout-index')
+        # the metadata index is validated via dir mtimes that don't change
+        # when ebuilds are edited in place, so it's only used if requested
+        if basics.str_to_bool(repo_opts.get('metadata-index', 'false')):
+            repo['metadata_index'] = self._make_repo_index(repo_path, 'metadata-index')
 
         if repo_name == defaults['main-repo']:
             repo_conf['default'] = True
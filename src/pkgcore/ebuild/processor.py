@@ -19,12 +19,14 @@ design) reduces regen time by over 40% compared to portage-2.1
 
 __all__ = (
     "request_ebuild_processor", "release_ebuild_processor", "EbuildProcessor",
-    "UnhandledCommand", "expected_ebuild_env")
+    "ProcessorPool", "UnhandledCommand", "expected_ebuild_env")
 
 import contextlib
 import errno
 from functools import partial, wraps
 import os
+import re
+import select
 import signal
 import sys
 import threading
@@ -39,7 +41,7 @@ from pkgcore.exceptions import PkgcoreException, PkgcoreUserException
 
 demandload(
     'logging',
-    'itertools:chain',
+    'itertools:chain,islice',
     'traceback',
     'snakeoil:bash',
     'snakeoil:fileutils',
@@ -52,6 +54,9 @@ _global_ebp_lock = threading.Lock()
 inactive_ebp_list = []
 active_ebp_list = []
 
+# bash variable names, sent verbatim in framed env transfers
+_valid_env_key = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$').match
+
 
 def _single_thread_allowed(functor):
     """Decorator that forces method to run under single thread."""
@@ -183,6 +188,97 @@ def reuse_or_request(ebp=None, **kwargs):
             release_ebuild_processor(ebp)
 
 
+class ProcessorPool(object):
+    """Pool of processors routing requests by their preloaded eclasses.
+
+    Processors are requested up front and can be warmed up by preloading
+    commonly inherited eclasses into all of them. Requests are handed the
+    idle processor with the most of their eclasses already preloaded so
+    processors don't all end up loading the same eclasses on first use.
+
+    :ivar size: number of processors in the pool
+    """
+
+    def __init__(self, size, eclass_cache=None, preload=(), **kwargs):
+        """
+        :param size: number of processors to request
+        :param eclass_cache: :obj:`pkgcore.ebuild.eclass_cache` instance used
+            for eclass preloading, if None eclasses aren't cached
+        :param preload: names of the eclasses to preload into every processor
+        :param kwargs: passed through to :obj:`request_ebuild_processor`
+        """
+        self.size = max(size, 1)
+        self._eclass_cache = eclass_cache
+        self._preload = ()
+        if eclass_cache is not None:
+            self._preload = tuple(x for x in preload if x in eclass_cache.eclasses)
+        self._kwargs = kwargs
+        self._cond = threading.Condition()
+        self._idle = [self._request(warm=False) for x in range(self.size)]
+        # preload in parallel, the daemons handle their requests concurrently
+        for ebp in self._idle:
+            self._warm_up(ebp, async_req=True)
+        for ebp in self._idle:
+            ebp._consume_async_expects()
+
+    def _request(self, warm=True):
+        ebp = request_ebuild_processor(**self._kwargs)
+        if self._eclass_cache is not None:
+            ebp.allow_eclass_caching()
+            if warm:
+                self._warm_up(ebp)
+        return ebp
+
+    def _warm_up(self, ebp, async_req=False):
+        if self._preload:
+            ebp.preload_eclasses(
+                self._eclass_cache, limited_to=self._preload, async_req=async_req)
+
+    def acquire(self, eclasses=()):
+        """Acquire an idle processor, blocking until one is available.
+
+        :param eclasses: names of the eclasses the processor is expected to
+            load, used to pick the processor with most of them preloaded
+        :return: :obj:`EbuildProcessor` instance
+        """
+        eclasses = frozenset(eclasses)
+        with self._cond:
+            while not self._idle:
+                self._cond.wait()
+            ebp = max(
+                reversed(self._idle),
+                key=lambda x: len(eclasses.intersection(x._preloaded_eclasses)))
+            self._idle.remove(ebp)
+        return ebp
+
+    def release(self, ebp):
+        """Return an acquired processor to the pool, replacing it if it died."""
+        if ebp.pid is None:
+            drop_ebuild_processor(ebp)
+            ebp = self._request()
+        with self._cond:
+            self._idle.append(ebp)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def processor(self, eclasses=()):
+        """Context manager acquiring and releasing a processor, see :obj:`acquire`."""
+        ebp = self.acquire(eclasses)
+        try:
+            yield ebp
+        finally:
+            self.release(ebp)
+
+    def close(self):
+        """Release all processors in the pool."""
+        with self._cond:
+            processors, self._idle = self._idle, []
+        for ebp in processors:
+            if self._eclass_cache is not None:
+                ebp.disable_eclass_caching()
+            release_ebuild_processor(ebp)
+
+
 class ProcessingInterruption(PkgcoreException):
     """Generic processor exception."""
 
@@ -304,14 +400,21 @@ class EbuildProcessor(object):
     """Abstraction of a running ebd instance.
 
     Contains the env, functions, etc that ebuilds expect.
+
+    :cvar env_transfer: how envs are sent to the daemon, either ``export`` for
+        bash export statements evaluated by the daemon or ``framed`` for
+        length-prefixed frames read verbatim into variables
     """
 
+    env_transfer = 'export'
+
     def __init__(self, userpriv, sandbox, fd_pipes=None):
         """
         :param sandbox: enables a sandboxed processor
         :param userpriv: enables a userpriv'd processor
         :param fd_pipes: mapping from existing fd to fd inside the ebd process
         """
+        self._owner_pid = os.getpid()
         self.lock()
         self.ebd = e_const.EBUILD_DAEMON_PATH
         spawn_opts = {'umask': 0o002}
@@ -484,33 +587,27 @@ class EbuildProcessor(object):
         self._outstanding_expects = []
         return ret
 
-    def _timeout_ebp(self, signum, frame):
-        raise TimeoutError("ebp for pid '%i' appears dead, timing out" % self.pid)
-
     def expect(self, want, async_req=False, flush=False, timeout=0):
         """Read from the daemon, check if the returned string is expected.
 
         :param want: string we're expecting
+        :param timeout: if nonzero, the number of seconds to wait for a
+            response before treating the daemon as dead
         :return: boolean, was what was read == want?
         """
-        if timeout:
-            signal.signal(signal.SIGALRM, self._timeout_ebp)
-            signal.setitimer(signal.ITIMER_REAL, timeout)
-
         if async_req:
             self._outstanding_expects.append((flush, want))
             return True
         if flush:
             self.ebd_write.flush()
         if not self._outstanding_expects:
-            try:
-                return want == self.read().rstrip('\n')
-            except TimeoutError:
+            # Poll the pipe instead of using alarm signals for timeouts since
+            # signal handlers can only be set from the main thread while
+            # processors are used from build and regen threads as well.
+            if timeout and not select.select([self.ebd_read], [], [], timeout)[0]:
+                logger.debug(f"ebp for pid '{self.pid}' appears dead, timing out")
                 return False
-            finally:
-                if timeout:
-                    signal.setitimer(signal.ITIMER_REAL, 0)
-                    signal.signal(signal.SIGALRM, signal.SIG_DFL)
+            return want == self.read().rstrip('\n')
 
         self._outstanding_expects.append((flush, want))
         return self._consume_async_expects()
@@ -697,8 +794,8 @@ class EbuildProcessor(object):
         # which isn't always true.
         self.pid = None
 
-    def _generate_env_str(self, env_dict):
-        data = []
+    def _env_items(self, env_dict):
+        """Yield the validated (key, value) pairs of an env to transfer."""
         for key, val in sorted(env_dict.items()):
             if key in self._readonly_vars:
                 continue
@@ -707,7 +804,11 @@ class EbuildProcessor(object):
             if not isinstance(val, (str, list, tuple)):
                 raise ValueError(
                     f"_generate_env_str was fed a bad value; key={key}, val={val}")
+            yield key, val
 
+    def _generate_env_str(self, env_dict):
+        data = []
+        for key, val in self._env_items(env_dict):
             if isinstance(val, (list, tuple)):
                 data.append("%s=(%s)" % (key, ' '.join(
                     f'[{i}]="{value}"' for i, value in enumerate(val))))
@@ -723,12 +824,48 @@ class EbuildProcessor(object):
         # currently using pkgcore-ebuild-helper.
         return f"export {' '.join(data)}"
 
+    def _generate_env_frames(self, env_dict):
+        """Generate the length-prefixed frames of an env.
+
+        The header lists ``KEY SIZE`` for scalars and ``KEY[] COUNT SIZE...``
+        for arrays, sizes being in UTF-8 encoded bytes, and is followed by
+        the concatenated values. Values are sent verbatim so the daemon
+        doesn't have to parse or eval them.
+
+        :return: (header, values) tuple
+        """
+        header = []
+        data = []
+        for key, val in self._env_items(env_dict):
+            if not _valid_env_key(key):
+                raise KeyError(f"{key}: invalid bash variable name")
+            if isinstance(val, (list, tuple)):
+                header.extend((f"{key}[]", str(len(val))))
+                values = val
+            else:
+                header.append(key)
+                values = (val,)
+            header.extend(str(len(x.encode())) for x in values)
+            data.extend(values)
+        return ' '.join(header), ''.join(data)
+
     def send_env(self, env_dict, async_req=False, tmpdir=None):
         """Transfer the ebuild's desired env (env_dict) to the running daemon.
 
+        Depending on the processor's :attr:`env_transfer` mode, the env is
+        sent as bash export statements, through a file in tmpdir if
+        specified, or as length-prefixed frames.
+
         :type env_dict: mapping with string keys and values.
         :param env_dict: the bash env.
         """
+        if self.env_transfer == 'framed':
+            header, data = self._generate_env_frames(env_dict)
+            self.write(
+                f"start_receiving_env frames\n{header}\n{data}",
+                append_newline=False)
+            return self.expect("env_received", async_req=async_req, flush=True)
+
         data = self._generate_env_str(env_dict)
         old_umask = os.umask(0o002)
         if tmpdir:
@@ -753,6 +890,10 @@ class EbuildProcessor(object):
         return self.expect("logging_ack")
 
     def __del__(self):
+        # Processors inherited across fork() are still owned by the parent
+        # process, leave their daemons alone.
+        if getattr(self, '_owner_pid', None) != os.getpid():
+            return
         # Simply attempts to notify the daemon to die. If a processor reaches
         # this state it shouldn't be in the active or inactive lists anymore so
         # no need to try to remove itself from them.
@@ -787,6 +928,13 @@ class EbuildProcessor(object):
         updates = None
         if self._eclass_caching:
             updates = set()
+        self._handle_depend_like_phase(command, eclass_cache, updates, extra_commands)
+
+        if updates:
+            self.preload_eclasses(eclass_cache, limited_to=updates, async_req=True)
+
+    def _handle_depend_like_phase(self, command, eclass_cache, updates=None,
+                                  extra_commands={}):
         commands = extra_commands.copy()
         commands["request_inherit"] = partial(inherit_handler, eclass_cache, updates=updates)
         val = self.generic_handler(additional_commands=commands)
@@ -794,9 +942,6 @@ class EbuildProcessor(object):
         if not val:
             raise ProcessorError(f"returned val from {command} was '{val}'")
 
-        if updates:
-            self.preload_eclasses(eclass_cache, limited_to=updates, async_req=True)
-
     def get_ebuild_environment(self, package_inst, eclass_cache):
         """Request a dump of the ebuild environ for a package.
 
@@ -840,25 +985,85 @@ class EbuildProcessor(object):
         :return: dict when successful, None when failed
         """
         metadata_keys = {}
+        self._run_depend_like_phase(
+            'gen_metadata', package_inst, eclass_cache,
+            env=self._metadata_env(package_inst),
+            extra_commands={'key': partial(_receive_key, metadata_keys)})
+        return metadata_keys
+
+    def get_keys_batch(self, pkgs, eclass_cache, batch_size=16):
+        """Request the metadata be regenerated from multiple ebuilds.
+
+        Instead of waiting for the results of each ebuild before sending the
+        next one, ebuilds are queued to the daemon in batches which it works
+        through while the results are streamed back.
+
+        The daemon is killed if an ebuild calls die() during sourcing, in
+        which case iteration stops early after yielding the error; the
+        remaining pkgs have to be requested from a new processor.
+
+        :param pkgs: iterable of :obj:`pkgcore.ebuild.ebuild_src.package`
+            instances to regenerate
+        :param eclass_cache: :obj:`pkgcore.ebuild.eclass_cache` instance to use
+            for eclass access
+        :param batch_size: max number of ebuilds queued to the daemon at once
+        :return: iterator of (pkg, metadata) pairs in the order pkgs were
+            given, metadata being a :obj:`ProcessorError` instance on failure
+        """
+        self._ensure_metadata_paths(("/dev/null",))
+        pkgs = iter(pkgs)
+        while True:
+            batch = list(islice(pkgs, batch_size))
+            if not batch:
+                return
+
+            data = []
+            for pkg in batch:
+                env = expected_ebuild_env(pkg, self._metadata_env(pkg), depends=True)
+                env_str = self._generate_env_str(env)
+                data.append(f"{len(env_str)}\n{env_str}")
+            self.write(
+                f"gen_metadata_batch {len(batch)}\n{''.join(data)}",
+                append_newline=False)
+
+            # the daemon reads the rest of the batch ahead, so eclasses can't
+            # be preloaded until it's done
+            updates = None
+            if self._eclass_caching:
+                updates = set()
+            remaining = len(batch)
+            try:
+                for pkg in batch:
+                    metadata_keys = {}
+                    try:
+                        self._handle_depend_like_phase(
+                            'gen_metadata', eclass_cache, updates,
+                            {'key': partial(_receive_key, metadata_keys)})
+                    except ProcessorError as e:
+                        metadata_keys = e
+                    remaining -= 1
+                    yield pkg, metadata_keys
+                    if self.pid is None:
+                        # processor died
+                        return
+            finally:
+                if remaining:
+                    # unread results would desync later requests
+                    drop_ebuild_processor(self)
+                    if self.pid is not None:
+                        self.shutdown_processor(force=True)
 
-        def receive_key(self, line):
-            line = line.split("=", 1)
-            if len(line) != 2:
-                raise FinishedProcessing(True)
-            metadata_keys[line[0]] = line[1]
+            if updates:
+                self.preload_eclasses(eclass_cache, limited_to=updates, async_req=True)
 
+    @staticmethod
+    def _metadata_env(package_inst):
         # pass down phase and metadata key lists to avoid hardcoding them on the bash side
-        env = {
+        return {
             'PKGCORE_EBUILD_PHASES': tuple(package_inst.eapi.phases.values()),
             'PKGCORE_METADATA_KEYS': tuple(package_inst.eapi.metadata_keys),
         }
 
-        self._run_depend_like_phase(
-            'gen_metadata', package_inst, eclass_cache, env=env,
-            extra_commands={'key': receive_key})
-
-        return metadata_keys
-
     # this basically handles all hijacks from the daemon, whether
     # confcache or portageq.
     def generic_handler(self, additional_commands=None):
@@ -930,6 +1135,15 @@ class EbuildProcessor(object):
         finally:
             self.unlock()
 
+
+def _receive_key(metadata_keys, ebp, line):
+    """Callback storing a metadata key sent during metadata generation."""
+    line = line.split("=", 1)
+    if len(line) != 2:
+        raise FinishedProcessing(True)
+    metadata_keys[line[0]] = line[1]
+
+
 def inherit_handler(ecache, ebp, line=None, updates=None):
     """Callback for implementing inherit digging into eclass_cache.
 
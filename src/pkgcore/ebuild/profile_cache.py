@@ -0,0 +1,90 @@
+# License: GPL2/BSD
+
+"""
+persistent cache of atoms parsed from profile files
+
+Collapsing a profile stack parses every atom in the package.* files of all
+its nodes, which makes up most of the time spent loading a profile. The cache
+records the atoms parsed from each file of a profile node, tied to the stamps
+of the files they were read from, so later runs and other profiles sharing the
+same nodes can rebuild them without parsing.
+
+Lines failing to parse aren't recorded so the related errors keep being
+reported. Files modified within the last couple of seconds aren't recorded
+either since they could be modified again without changing their stamp.
+"""
+
+__all__ = ("ProfileCache",)
+
+import os
+
+from snakeoil.demandload import demandload
+
+from pkgcore import __version__
+from pkgcore.cache.stamped import StampedCache
+from pkgcore.ebuild.config_snapshot import _atom_attrs, _decode_atom, _encode_atom
+
+demandload('pkgcore.log:logger')
+
+
+class ProfileCache(StampedCache):
+    """On-disk cache of atoms parsed from profile files.
+
+    Entries map a profile node file to the stamps of the files it was read
+    from, the node's EAPI, and the atoms parsed from it.
+    """
+
+    description = 'profile cache'
+
+    def _header(self):
+        return dict(super()._header(), pkgcore=__version__, atom=list(_atom_attrs))
+
+    @staticmethod
+    def stamp(files, eapi):
+        """Return the stamp of a profile node file.
+
+        :param files: paths the file's data is read from
+        :param eapi: EAPI of the profile node
+        """
+        stamp = [str(eapi)]
+        for path in files:
+            st = os.stat(path)
+            stamp.append([path, st.st_mtime_ns, st.st_size, st.st_ino])
+        return stamp
+
+    def get(self, key, stamp):
+        """Return the cached atoms of a profile node file.
+
+        :param key: identifier of the profile node file
+        :param stamp: current stamp of the file from :meth:`stamp`
+        :return: mapping of ``(atom string, negate_vers)`` to atoms, None if
+            the file isn't cached or was modified since
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != stamp:
+            return None
+        try:
+            return {(text, negate_vers): _decode_atom(state)
+                    for text, negate_vers, state in entry[1]}
+        except (ValueError, TypeError, IndexError) as e:
+            logger.warning('ignoring invalid profile cache entry %r: %s', key, e)
+        return None
+
+    def update(self, key, stamp, atoms):
+        """Record the atoms parsed from a profile node file.
+
+        :param key: identifier of the profile node file
+        :param stamp: stamp of the file from :meth:`stamp`
+        :param atoms: mapping of ``(atom string, negate_vers)`` to atoms
+        """
+        if not self._settled(x[1] for x in stamp[1:]):
+            return
+        encoded = []
+        for (text, negate_vers), a in atoms.items():
+            state = _encode_atom(a)
+            if state is not None:
+                encoded.append([text, negate_vers, state])
+        entries = self.entries
+        with self._lock:
+            entries[key] = [stamp, encoded]
+            self._modified()
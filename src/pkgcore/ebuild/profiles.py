@@ -67,7 +67,7 @@ def _read_profile_files(files, allow_line_cont=False):
 
 def load_property(filename, *, read_func=_read_profile_files, fallback=(),
                   parse_func=lambda x: x, allow_line_cont=False, allow_recurse=False,
-                  eapi_optional=None):
+                  eapi_optional=None, parse_atoms=False):
     """Decorator simplifying parsing profile files to generate a profile property.
 
     :param filename: The filename to parse within that profile directory.
@@ -81,17 +81,35 @@ def load_property(filename, *, read_func=_read_profile_files, fallback=(),
     :keyword eapi_optional: If given, the EAPI for this profile node is checked to see if
         the given optional evaluates to True; if so, then parsing occurs.  If False, then
         the fallback is returned and no ondisk activity occurs.
+    :keyword parse_atoms: Controls whether the atoms parsed via
+        :py:`ProfileNode.eapi_atom` while generating the property are cached
+        in the profile cache, if enabled.
     :return: A :py:`klass.jit.attr_named` property instance.
     """
     def f(func):
         f2 = klass.jit_attr_named(f'_{func.__name__}')
         return f2(partial(
             _load_and_invoke, func, filename, read_func, fallback,
-            allow_recurse, allow_line_cont, parse_func, eapi_optional))
+            allow_recurse, allow_line_cont, parse_func, eapi_optional,
+            parse_atoms))
     return f
 
+def _invoke_with_cache(cache, func, self, filename, files, data):
+    key = pjoin(self.path.rstrip('/'), filename)
+    stamp = cache.stamp(files, self.eapi)
+    cached = cache.get(key, stamp)
+    previous = self._atoms
+    self._atoms = atoms = (cached or {}, {})
+    try:
+        result = func(self, data)
+    finally:
+        self._atoms = previous
+    if cached is None:
+        cache.update(key, stamp, atoms[1])
+    return result
+
 def _load_and_invoke(func, filename, read_func, fallback, allow_recurse,
-                     allow_line_cont, parse_func, eapi_optional, self):
+                     allow_line_cont, parse_func, eapi_optional, parse_atoms, self):
     if eapi_optional is not None and not getattr(self.eapi.options, eapi_optional, None):
         return fallback
 
@@ -114,6 +132,9 @@ def _load_and_invoke(func, filename, read_func, fallback, allow_recurse,
             else:
                 data = parse_func(read_func(
                     files, allow_line_cont=allow_line_cont))
+            if parse_atoms and self._parse_cache is not None:
+                return _invoke_with_cache(
+                    self._parse_cache, func, self, filename, files, data)
         else:
             data = fallback
         return func(self, data)
@@ -134,6 +155,10 @@ class ProfileNode(object, metaclass=caching.WeakInstMeta):
 
     __inst_caching__ = True
     _repo_map = None
+    # optional ProfileCache shared by all nodes
+    _parse_cache = None
+    # cached and parsed atoms of the property being generated
+    _atoms = None
 
     def __init__(self, path, pms_strict=True):
         self.path = path
@@ -156,7 +181,7 @@ class ProfileNode(object, metaclass=caching.WeakInstMeta):
     def name(self):
         return self.path.split('/profiles/')[-1]
 
-    @load_property("packages")
+    @load_property("packages", parse_atoms=True)
     def packages(self, data):
         repo_config = self.repoconfig
         profile_set = repo_config is not None and 'profile-set' in repo_config.profile_formats
@@ -246,12 +271,12 @@ class ProfileNode(object, metaclass=caching.WeakInstMeta):
         data = (x[0] for x in data)
         return split_negations(data, _parse_cpv)
 
-    @load_property("package.mask", allow_recurse=True)
+    @load_property("package.mask", allow_recurse=True, parse_atoms=True)
     def masks(self, data):
         data = (x[0] for x in data)
         return split_negations(data, self.eapi_atom)
 
-    @load_property("package.unmask", allow_recurse=True)
+    @load_property("package.unmask", allow_recurse=True, parse_atoms=True)
     def unmasks(self, data):
         data = (x[0] for x in data)
         return split_negations(data, self.eapi_atom)
@@ -266,7 +291,7 @@ class ProfileNode(object, metaclass=caching.WeakInstMeta):
     def accept_keywords(self, data):
         return tuple((x[0], tuple(stable_unique(x[1]))) for x in data)
 
-    @load_property("package.use", allow_recurse=True)
+    @load_property("package.use", allow_recurse=True, parse_atoms=True)
     def pkg_use(self, data):
         c = misc.ChunkedDataDict()
         c.update_from_stream(
@@ -305,7 +330,7 @@ class ProfileNode(object, metaclass=caching.WeakInstMeta):
                 continue
             d[a.key].append(misc.chunked_data(a, *split_negations(l[1:])))
 
-        return ImmutableDict((k, misc._build_cp_atom_payload(v, atom(k)))
+        return ImmutableDict((k, misc._build_cp_atom_payload(v, self.eapi_atom(k)))
                              for k, v in d.items())
 
     def _parse_use(self, data):
@@ -326,12 +351,12 @@ class ProfileNode(object, metaclass=caching.WeakInstMeta):
     def use_stable_force(self, data):
         return self._parse_use(data)
 
-    @load_property("package.use.force", allow_recurse=True)
+    @load_property("package.use.force", allow_recurse=True, parse_atoms=True)
     def pkg_use_force(self, data):
         return self._parse_package_use(data)
 
     @load_property("package.use.stable.force", allow_recurse=True,
-                   eapi_optional='profile_stable_use')
+                   eapi_optional='profile_stable_use', parse_atoms=True)
     def pkg_use_stable_force(self, data):
         return self._parse_package_use(data)
 
@@ -344,12 +369,12 @@ class ProfileNode(object, metaclass=caching.WeakInstMeta):
     def use_stable_mask(self, data):
         return self._parse_use(data)
 
-    @load_property("package.use.mask", allow_recurse=True)
+    @load_property("package.use.mask", allow_recurse=True, parse_atoms=True)
     def pkg_use_mask(self, data):
         return self._parse_package_use(data)
 
     @load_property("package.use.stable.mask", allow_recurse=True,
-                   eapi_optional='profile_stable_use')
+                   eapi_optional='profile_stable_use', parse_atoms=True)
     def pkg_use_stable_mask(self, data):
         return self._parse_package_use(data)
 
@@ -431,7 +456,17 @@ class ProfileNode(object, metaclass=caching.WeakInstMeta):
             raise ProfileError(self.path, 'eapi', f'unsupported EAPI: {str(eapi)!r}')
         return eapi
 
-    eapi_atom = klass.alias_attr("eapi.atom_kls")
+    def eapi_atom(self, text, negate_vers=False):
+        """Parse an atom according to the profile's EAPI."""
+        if self._atoms is None:
+            return self.eapi.atom_kls(text, negate_vers=negate_vers)
+        cached, parsed = self._atoms
+        key = (text, negate_vers)
+        a = cached.get(key)
+        if a is None:
+            a = self.eapi.atom_kls(text, negate_vers=negate_vers)
+        parsed[key] = a
+        return a
 
     @klass.jit_attr
     def repoconfig(self):
@@ -7,6 +7,7 @@ Ebuild repository, specific to gentoo ebuild trees.
 
 __all__ = ("UnconfiguredTree", "ConfiguredTree", "ProvidesRepo", "tree")
 
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial, wraps
 from itertools import chain, filterfalse
 import os
@@ -15,6 +16,7 @@ from sys import intern
 
 from snakeoil import klass
 from snakeoil.bash import iter_read_bash, read_dict
+from snakeoil.compatibility import IGNORED_EXCEPTIONS
 from snakeoil.containers import InvertedContains
 from snakeoil.demandload import demandload
 from snakeoil.fileutils import readlines
@@ -45,6 +47,8 @@ demandload(
     'pkgcore.fs.livefs:sorted_scan',
     'pkgcore.log:logger',
     'pkgcore.package:errors@pkg_errors',
+    'pkgcore.repository.layout_index:LayoutIndex',
+    'pkgcore.repository.metadata_index:MetadataIndex',
     'pkgcore.restrictions:packages',
     'pkgcore.util.packages:groupby_pkg',
 )
@@ -144,11 +148,17 @@ class repo_operations(_repo_ops.operations):
                 continue
 
             # calculate checksums for fetched distfiles
+            def get_chksums(fetchable):
+                return chksum.get_chksums(
+                    pjoin(distdir, fetchable.filename), *write_chksums,
+                    parallelize=False)
+
             try:
-                for fetchable in fetchables.values():
-                    chksums = chksum.get_chksums(
-                        pjoin(distdir, fetchable.filename), *write_chksums)
-                    fetchable.chksums = dict(zip(write_chksums, chksums))
+                with ThreadPoolExecutor() as executor:
+                    for fetchable, chksums in zip(
+                            fetchables.values(),
+                            executor.map(get_chksums, fetchables.values())):
+                        fetchable.chksums = dict(zip(write_chksums, chksums))
             except chksum.MissingChksumHandler as e:
                 observer.error(f'failed generating chksum: {e}')
                 ret.add(key_query)
@@ -256,10 +266,12 @@ class ProvidesRepo(util.SimpleTree):
         'repo_config': 'ref:repo_config', 'cache': 'refs:cache',
         'eclass_cache': 'ref:eclass_cache',
         'default_mirrors': 'list',
-        'allow_missing_manifests': 'bool'},
+        'allow_missing_manifests': 'bool',
+        'layout_index': 'str', 'metadata_index': 'str'},
     requires_config='config')
 def tree(config, repo_config, cache=(), eclass_cache=None,
-         default_mirrors=None, allow_missing_manifests=False):
+         default_mirrors=None, allow_missing_manifests=False, layout_index=None,
+         metadata_index=None):
     """Initialize an unconfigured ebuild repository."""
     repo_id = repo_config.repo_id
     repo_path = repo_config.location
@@ -294,7 +306,8 @@ def tree(config, repo_config, cache=(), eclass_cache=None,
         repo_config.location, eclass_cache=eclass_cache, masters=masters, cache=cache,
         default_mirrors=default_mirrors,
         allow_missing_manifests=allow_missing_manifests,
-        repo_config=repo_config)
+        repo_config=repo_config, layout_index=layout_index,
+        metadata_index=metadata_index)
 
 
 class UnconfiguredTree(prototype.tree):
@@ -313,6 +326,8 @@ class UnconfiguredTree(prototype.tree):
     package_factory = staticmethod(ebuild_src.generate_new_factory)
     enable_gpg = False
     extension = '.ebuild'
+    # files under metadata/ updated by syncing the repo
+    _sync_markers = ('timestamp', 'timestamp.chk', 'timestamp.commit', 'timestamp.x')
 
     operations_kls = repo_operations
 
@@ -324,11 +339,14 @@ class UnconfiguredTree(prototype.tree):
         'default_mirrors': 'list',
         'allow_missing_manifests': 'bool',
         'repo_config': 'ref:repo_config',
+        'layout_index': 'str',
+        'metadata_index': 'str',
         },
         typename='repo')
 
     def __init__(self, location, eclass_cache=None, masters=(), cache=(),
-                 default_mirrors=None, allow_missing_manifests=False, repo_config=None):
+                 default_mirrors=None, allow_missing_manifests=False, repo_config=None,
+                 layout_index=None, metadata_index=None):
         """
         :param location: on disk location of the tree
         :param cache: sequence of :obj:`pkgcore.cache.template.database` instances
@@ -339,6 +357,10 @@ class UnconfiguredTree(prototype.tree):
             if None, generates the eclass_cache itself
         :param default_mirrors: Either None, or sequence of mirrors to try
             fetching from first, then falling back to other uri
+        :param layout_index: If not None, path to a file caching the repo's
+            category, package, and version listings between runs
+        :param metadata_index: If not None, path to a file storing indexes
+            of package metadata used to speed up metadata queries
         """
         super().__init__()
         self.base = self.location = location
@@ -400,6 +422,10 @@ class UnconfiguredTree(prototype.tree):
             self, cache, self.eclass_cache, self.mirrors, self.default_mirrors)
         self._shared_pkg_cache = WeakValCache()
         self._masked = RestrictionRepo(repo_id='masked')
+        if layout_index is not None:
+            self.layout_index = LayoutIndex(layout_index)
+        if metadata_index is not None:
+            self.metadata_index = MetadataIndex(metadata_index)
 
     repo_id = klass.alias_attr("config.repo_id")
     repo_name = klass.alias_attr("config.repo_name")
@@ -477,6 +503,39 @@ class UnconfiguredTree(prototype.tree):
             categories = tuple(map(intern, categories))
         return categories
 
+    def _layout_paths(self, kind, key=None):
+        if kind == 'categories':
+            return [self.base] + [
+                pjoin(repo.base, 'profiles', 'categories') for repo in self.trees]
+        elif kind == 'packages':
+            return [pjoin(self.base, key.lstrip(os.path.sep))]
+        return [pjoin(self.base, *key)]
+
+    def _metadata_index_paths(self, category):
+        # package dirs change when ebuilds or metadata.xml files are replaced,
+        # cache category dirs when regenerated entries are written
+        paths = [pjoin(self.base, category)]
+        paths.extend(pjoin(self.base, category, pkg) for pkg in self.packages.get(category, ()))
+        for cache in self.cache:
+            location = getattr(cache, 'location', None)
+            if location is not None:
+                if os.path.isdir(location):
+                    location = pjoin(location, category)
+                paths.append(location)
+        return paths
+
+    def _generation_paths(self):
+        paths = [self.base, pjoin(self.base, 'profiles')]
+        # Synced repos update their timestamp files on every sync, so avoid
+        # statting all their pkg dirs which can cost more than the queries
+        # cached using the generation.
+        markers = [pjoin(self.base, 'metadata', x) for x in self._sync_markers]
+        if any(os.path.exists(x) for x in markers):
+            return paths + markers
+        for category in self.categories:
+            paths.extend(self._metadata_index_paths(category))
+        return paths
+
     def _get_categories(self, *optional_category):
         # why the auto return? current porttrees don't allow/support
         # categories deeper then one dir.
@@ -525,6 +584,44 @@ class UnconfiguredTree(prototype.tree):
                 "failed fetching versions for package %s: %s" %
                 (pjoin(self.base, '/'.join(catpkg)), str(e))) from e
 
+    def _get_ebuild_hashes(self, category):
+        """Stat all ebuilds in a category, scanning each package dir once.
+
+        :return: dict mapping cpv to ebuild hash objects
+        """
+        d = {}
+        extension = self.extension
+        ext_len = -len(extension)
+        for package in self.packages.get(category, ()):
+            versions = frozenset(self.versions.get((category, package), ()))
+            pkg = f'{package}-'
+            lp = len(pkg)
+            try:
+                with os.scandir(pjoin(self.base, category, package)) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if (name[ext_len:] != extension or name[:lp] != pkg or
+                                name[lp:ext_len] not in versions):
+                            continue
+                        d[f'{category}/{name[:ext_len]}'] = chksum.LazilyHashedPath(
+                            entry.path, mtime=entry.stat()[stat.ST_MTIME])
+            except FileNotFoundError:
+                continue
+        return d
+
+    def validate_cache(self, *categories, preload=False):
+        """Validate the metadata cache entries of multiple packages in bulk.
+
+        :param categories: categories to check, all categories by default
+        :param preload: keep the valid entries around for subsequent
+            package metadata requests
+        :return: tuple of the sets of cpvs with valid and stale metadata
+        """
+        ebuild_hashes = {}
+        for category in (categories or self.categories):
+            ebuild_hashes.update(self._get_ebuild_hashes(category))
+        return self.package_class.validate_metadata(ebuild_hashes, preload=preload)
+
     def _pkg_filter(self, pkgs):
         """Filter packages with bad metadata."""
         for pkg in pkgs:
@@ -625,34 +722,75 @@ class UnconfiguredTree(prototype.tree):
     def _regen_operation_helper(self, **kwds):
         return _RegenOpHelper(
             self, force=bool(kwds.get('force', False)),
-            eclass_caching=bool(kwds.get('eclass_caching', True)))
+            eclass_caching=bool(kwds.get('eclass_caching', True)),
+            threads=kwds.get('threads', 1),
+            preload_eclasses=kwds.get('preload_eclasses', 20))
 
 
 class _RegenOpHelper(object):
+    """Regenerate pkg metadata using a pool of ebuild processors.
+
+    The helper is shared by all threads of a regen run, each call acquires
+    the processor best suited for the pkgs being regenerated from the pool.
+    """
+
+    # number of pkgs regenerated per batch, see batch()
+    batch_size = 8
 
-    def __init__(self, repo, force=False, eclass_caching=True):
+    def __init__(self, repo, force=False, eclass_caching=True, threads=1,
+                 preload_eclasses=20):
+        """
+        :param threads: number of processors to run
+        :param preload_eclasses: number of the most commonly inherited
+            eclasses to preload into all processors up front
+        """
+        self.repo = repo
         self.force = force
         self.eclass_caching = eclass_caching
-        self.ebp = self.request_ebp()
-
-    def request_ebp(self):
-        ebp = processor.request_ebuild_processor()
-        if self.eclass_caching:
-            ebp.allow_eclass_caching()
-        return ebp
+        preload = ()
+        if eclass_caching and preload_eclasses > 0:
+            stats = repo.package_class.eclass_stats()
+            preload = [x for x, _ in stats.most_common(preload_eclasses)]
+        self.pool = processor.ProcessorPool(
+            threads, repo.eclass_cache if eclass_caching else None, preload=preload)
+
+    def _eclasses(self, pkgs):
+        """Return the eclasses the given pkgs are expected to inherit."""
+        return frozenset().union(
+            *map(self.repo.package_class._cached_eclasses, pkgs))
 
     def __call__(self, pkg):
-        try:
-            return pkg._fetch_metadata(ebp=self.ebp, force_regen=self.force)
-        except MetadataException as e:
-            # ebuild processor is dead, so force a replacement request
-            self.ebp = self.request_ebp()
-            raise
+        with self.pool.processor(self._eclasses([pkg])) as ebp:
+            return pkg._fetch_metadata(ebp=ebp, force_regen=self.force)
+
+    def batch(self, pkgs):
+        """Regenerate the metadata of multiple pkgs, pipelining the requests.
+
+        :return: iterator of (pkg, exception) pairs for failed pkgs
+        """
+        pkgs = list(pkgs)
+        while pkgs:
+            finished = set()
+            # dead processors are replaced on release
+            with self.pool.processor(self._eclasses(pkgs)) as ebp:
+                try:
+                    for pkg, data in self.repo.package_class._get_metadata_batch(
+                            pkgs, ebp, force_regen=self.force):
+                        finished.add(id(pkg))
+                        if isinstance(data, Exception):
+                            yield pkg, data
+                except IGNORED_EXCEPTIONS:
+                    raise
+                except Exception as e:
+                    # results are returned in order, so the first unfinished
+                    # pkg is the one that failed
+                    pkg = next(x for x in pkgs if id(x) not in finished)
+                    finished.add(id(pkg))
+                    yield pkg, e
+            pkgs = [x for x in pkgs if id(x) not in finished]
 
     def __del__(self):
-        if self.eclass_caching:
-            self.ebp.disable_eclass_caching()
-        processor.release_ebuild_processor(self.ebp)
+        self.pool.close()
 
 
 class ConfiguredTree(configured.tree):
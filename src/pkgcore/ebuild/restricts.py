@@ -10,6 +10,7 @@ atom version restrict
 
 __all__ = ("VersionMatch",)
 
+from snakeoil.compatibility import cmp
 from snakeoil.klass import generic_equality
 
 from pkgcore.ebuild import cpv, errors
@@ -27,7 +28,7 @@ class VersionMatch(restriction.base, metaclass=generic_equality):
     self.vals, see intersect for reason why. vals also must be a tuple.
     """
 
-    __slots__ = ("ver", "rev", "vals", "droprev", "negate")
+    __slots__ = ("ver", "rev", "vals", "droprev", "negate", "_key")
 
     __inst_caching__ = True
     __attr_comparison__ = ('negate', 'rev', 'droprev', 'vals')
@@ -77,17 +78,31 @@ class VersionMatch(restriction.base, metaclass=generic_equality):
             sf(self, "droprev", False)
             sf(self, "vals", self._convert_str2op[operator])
 
-    def match(self, pkginst):
-        if self.droprev:
-            r1, r2 = None, None
-        else:
-            r1, r2 = self.rev, pkginst.revision
+    @property
+    def key(self):
+        """Version sort key compared against, see :func:`cpv.ver_key`."""
+        try:
+            return self._key
+        except AttributeError:
+            key = cpv.ver_key(self.ver, self.rev)
+            object.__setattr__(self, "_key", key)
+            return key
 
+    def match(self, pkginst):
         if pkginst.version is None:
             return False
 
-        return (cpv.ver_cmp(pkginst.version, r2, self.ver, r1) in self.vals) \
-            != self.negate
+        try:
+            key = pkginst.version_key
+        except AttributeError:
+            key = cpv.ver_key(pkginst.version, pkginst.revision)
+
+        if self.droprev:
+            c = cmp(key[0], self.key[0])
+        else:
+            c = cmp(key, self.key)
+
+        return (c in self.vals) != self.negate
 
     def __str__(self):
         s = self._convert_op2str[self.vals]
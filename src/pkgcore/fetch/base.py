@@ -7,6 +7,7 @@ prototype fetcher class, all fetchers should derive from this
 
 __all__ = ("fetcher",)
 
+from concurrent.futures import ThreadPoolExecutor
 import os
 
 from snakeoil.chksum import get_handlers, get_chksums, MissingChksumHandler
@@ -16,7 +17,14 @@ from pkgcore.fetch import errors
 
 class fetcher(object):
 
-    def _verify(self, file_location, target, all_chksums=True, handlers=None):
+    # :obj:`pkgcore.fetch.stamps.VerifiedStamps` instance used to skip
+    # rehashing unchanged files, None if disabled
+    stamps = None
+    # ignore stamps, always verifying the chksums of files
+    force_verify = False
+
+    def _verify(self, file_location, target, all_chksums=True, handlers=None,
+                parallelize=True):
         """Internal function for derivatives.
 
         Digs through chksums, and either returns None, or throws an
@@ -30,6 +38,12 @@ class fetcher(object):
 
         if all_chksums is True, all chksums must be verified; if false, all
         a handler can be found for are used.
+
+        With the default handlers, the file is read once (mmapped if
+        possible) and fed to all chksum handlers; if parallelize is True
+        each handler runs in its own thread. Files recorded in the fetcher's
+        stamps as verified against the same chksums aren't rehashed unless
+        force_verify is set.
         """
 
         nondefault_handlers = handlers
@@ -70,12 +84,47 @@ class fetcher(object):
                     raise errors.ChksumFailure(
                         file_location, chksum=x, expected=target.chksums[x], value=val)
         else:
-            desired_vals = [target.chksums[x] for x in chfs]
-            calced = get_chksums(file_location, *chfs)
-            for desired, got, chf in zip(desired_vals, calced, chfs):
-                if desired != got:
+            desired = {x: target.chksums[x] for x in chfs}
+            stamps = self.stamps
+            if stamps is not None and not self.force_verify:
+                if stamps.check(file_location, desired):
+                    return
+            calced = get_chksums(file_location, *chfs, parallelize=parallelize)
+            for got, chf in zip(calced, chfs):
+                if desired[chf] != got:
                     raise errors.ChksumFailure(
-                        file_location, chksum=chf, expected=desired, value=got)
+                        file_location, chksum=chf, expected=desired[chf], value=got)
+            if stamps is not None:
+                stamps.add(file_location, desired)
+
+    def verify_all(self, targets, jobs=None, all_chksums=True):
+        """Verify multiple files concurrently.
+
+        Files are verified across a thread pool instead of running the
+        chksum handlers of a single file in parallel, since hashing releases
+        the GIL this scales with the number of files.
+
+        :param targets: iterable of (file_location, fetchable) pairs
+        :param jobs: maximum number of files verified concurrently, by
+            default based on the number of CPUs
+        :param all_chksums: see :meth:`_verify`
+        :return: iterator of (file_location, fetchable, exception) tuples in
+            the order of the targets, exception is the
+            :obj:`pkgcore.fetch.errors.FetchError` raised while verifying or
+            None if the file is valid
+        """
+        def verify(target):
+            file_location, fetchable = target
+            try:
+                self._verify(
+                    file_location, fetchable, all_chksums=all_chksums,
+                    parallelize=False)
+            except errors.FetchError as e:
+                return file_location, fetchable, e
+            return file_location, fetchable, None
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            yield from executor.map(verify, targets)
 
     def __call__(self, fetchable):
         if not fetchable.uri:
@@ -8,12 +8,15 @@ fetcher class that pulls files via executing another program to do the fetching
 __all__ = ("MalformedCommand", "fetcher",)
 
 import os
+import threading
+from urllib.parse import urlsplit
 
 from snakeoil.osutils import ensure_dirs, pjoin
 from snakeoil.process.spawn import spawn_bash, is_userpriv_capable
 
 from pkgcore.os_data import portage_uid, portage_gid
 from pkgcore.fetch import errors, base, fetchable
+from pkgcore.fetch.stamps import VerifiedStamps
 from pkgcore.config import ConfigHint
 
 
@@ -24,16 +27,30 @@ class MalformedCommand(errors.FetchError):
         self.command = command
 
 
+class _NullSlot(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_null_slot = _NullSlot()
+
+
 class fetcher(base.fetcher):
 
     pkgcore_config_type = ConfigHint(
         {'userpriv': 'bool', 'required_chksums': 'list',
-         'distdir': 'str', 'command': 'str', 'resume_command': 'str'},
+         'distdir': 'str', 'command': 'str', 'resume_command': 'str',
+         'mirror_jobs': 'int', 'stamps_path': 'str'},
         allow_unknowns=True)
 
     def __init__(self, distdir, command, resume_command=None,
                  required_chksums=None, userpriv=True, attempts=10,
-                 readonly=False, **extra_env):
+                 readonly=False, mirror_jobs=None, stamps_path=None,
+                 **extra_env):
         """
         :param distdir: directory to download files to
         :type distdir: string
@@ -47,6 +64,10 @@ class fetcher(base.fetcher):
         :param userpriv: depriv for fetching?
         :param attempts: max number of attempts before failing the fetch
         :param readonly: controls whether fetching is allowed
+        :param mirror_jobs: if not None, the maximum number of concurrent
+            downloads from the same host when fetching from multiple threads
+        :param stamps_path: if not None, location of the file recording
+            verified files to avoid rehashing them if they're unchanged
         """
         super().__init__()
         self.distdir = distdir
@@ -84,10 +105,35 @@ class fetcher(base.fetcher):
         self.userpriv = userpriv
         self.readonly = readonly
         self.extra_env = extra_env
+        if mirror_jobs is not None and mirror_jobs < 1:
+            raise ValueError(f'invalid number of mirror jobs: {mirror_jobs}')
+        self.mirror_jobs = mirror_jobs
+        if stamps_path is not None:
+            self.stamps = VerifiedStamps(stamps_path)
+        self._lock = threading.Lock()
+        self._file_locks = {}
+        self._host_slots = {}
+
+    def _file_lock(self, filename):
+        # distfiles are commonly shared between pkgs, only fetch them once
+        with self._lock:
+            return self._file_locks.setdefault(filename, threading.Lock())
+
+    def _host_slot(self, uri):
+        if self.mirror_jobs is None:
+            return _null_slot
+        host = urlsplit(uri).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.mirror_jobs)
+        return slot
 
     def fetch(self, target):
         """Fetch a file.
 
+        Safe to be called from multiple threads.
+
         :type target: :obj:`pkgcore.fetch.fetchable` instance
         :return: None if fetching failed,
             else on disk location of the copied file
@@ -95,6 +141,10 @@ class fetcher(base.fetcher):
         if not isinstance(target, fetchable):
             raise TypeError(
                 f"target must be fetchable instance/derivative: {target}")
+        with self._file_lock(target.filename):
+            return self._fetch(target)
+
+    def _fetch(self, target):
 
         kw = {"mode": 0o775}
         if self.readonly:
@@ -138,12 +188,14 @@ class fetcher(base.fetcher):
             # the loop handles this. In other words, don't trust the external
             # fetcher's exit code, trust our chksums instead.
             try:
-                spawn_bash(
-                    command % {"URI": next(uris), "FILE": target.filename},
-                    **spawn_opts)
+                uri = next(uris)
             except StopIteration:
                 raise errors.FetchFailed(
                     target.filename, "ran out of urls to fetch from")
+            with self._host_slot(uri):
+                spawn_bash(
+                    command % {"URI": uri, "FILE": target.filename},
+                    **spawn_opts)
         else:
             raise last_exc
 
@@ -0,0 +1,85 @@
+# License: GPL2/BSD
+
+"""
+persistent record of verified distfiles
+
+Verifying a distfile requires hashing the entire file, which is done every
+time a pkg is fetched or built even if the file hasn't changed since it was
+last verified. Stamps record the size, mtime, ctime, inode, and device of
+verified files along with the chksums they matched so unchanged files can be
+accepted without rehashing them. Since the ctime can't be set from userspace,
+a file being modified and having its mtime restored still changes its stamp.
+"""
+
+__all__ = ("VerifiedStamps",)
+
+import os
+
+from pkgcore.cache.stamped import StampedCache
+
+
+class VerifiedStamps(StampedCache):
+    """On-disk record of files verified against their chksums."""
+
+    format_version = 2
+    description = 'verified stamps'
+
+    @staticmethod
+    def _decode_entries(entries):
+        return {
+            k: (tuple(stamp), chksums)
+            for k, (stamp, chksums) in entries.items()}
+
+    @staticmethod
+    def _encode_entries(entries):
+        return {
+            k: [list(stamp), chksums]
+            for k, (stamp, chksums) in entries.items()
+            # drop entries for files that were removed
+            if os.path.exists(k)}
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino, st.st_dev)
+
+    def check(self, path, chksums):
+        """Determine if a file was verified against the given chksums.
+
+        :param path: location of the file
+        :param chksums: mapping of chksum types to expected values
+        :return: True if the file is unchanged since it was last verified
+            and its chksums matched the given values, False otherwise
+        """
+        entry = self.entries.get(path)
+        if entry is None:
+            return False
+        stamp, verified = entry
+        if self._stamp(path) != stamp:
+            return False
+        if 'size' in chksums and chksums['size'] != stamp[0]:
+            return False
+        return all(
+            verified.get(chf) == val
+            for chf, val in chksums.items() if chf != 'size')
+
+    def add(self, path, chksums):
+        """Record a file as verified against the given chksums.
+
+        :param path: location of the file
+        :param chksums: mapping of chksum types to verified values
+        """
+        stamp = self._stamp(path)
+        if stamp is None or not self._settled([stamp[1]]):
+            return
+        chksums = {k: v for k, v in chksums.items() if k != 'size'}
+        entries = self.entries
+        with self._lock:
+            entry = entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                chksums = dict(entry[1], **chksums)
+            entries[path] = (stamp, chksums)
+            self._modified()
@@ -39,6 +39,7 @@ class fetch_base(object):
 
     def fetch_all(self, observer):
         # TODO: add parallel fetch support
+        self._verify_existing()
         failures = []
         for fetchable in self.fetchables:
             if not self.fetch_one(fetchable, observer):
@@ -48,6 +49,25 @@ class fetch_base(object):
             return False
         return True
 
+    def _verify_existing(self):
+        """Concurrently verify distfiles that are already present."""
+        verify_all = getattr(self.fetcher, 'verify_all', None)
+        distdir = self.fetcher.get_storage_path()
+        if verify_all is None or distdir is None:
+            return
+        targets = []
+        for fetchable in self.fetchables:
+            path = pjoin(distdir, fetchable.filename)
+            if fetchable.filename not in self._basenames and os.path.exists(path):
+                targets.append((path, fetchable))
+        if len(targets) < 2:
+            return
+        # files failing verification are handled by fetch_one()
+        for path, fetchable, exc in verify_all(targets):
+            if exc is None:
+                self.verified_files[path] = fetchable
+                self._basenames.add(fetchable.filename)
+
     def fetch_one(self, fetchable, observer, retry=False):
         if fetchable.filename in self._basenames:
             return True
@@ -1,13 +1,29 @@
 # Copyright: 2011 Brian Harring <ferringb@gmail.com>
 # License: GPL2/BSD 3 clause
 
+from collections import defaultdict
+from itertools import islice
+
 from snakeoil.compatibility import IGNORED_EXCEPTIONS
+from snakeoil.demandload import demandload
 
+from pkgcore.exceptions import PkgcoreException
 from pkgcore.package.errors import MetadataException
 from pkgcore.util.thread_pool import map_async
 
+demandload(
+    'multiprocessing',
+    'multiprocessing:connection@mp_connection',
+    'os',
+    'pickle',
+    'pkgcore.ebuild:processor',
+)
+
 
 def regen_iter(iterable, regen_func, observer):
+    if getattr(regen_func, 'batch', None) is not None:
+        yield from _regen_iter_batched(iterable, regen_func)
+        return
     for pkg in iterable:
         try:
             regen_func(pkg)
@@ -23,21 +39,196 @@ def regen_iter(iterable, regen_func, observer):
             yield pkg, e
 
 
-def regen_repository(repo, pkgs, observer, threads=1, pkg_attr='keywords', **kwargs):
-    helpers = []
+def _regen_iter_batched(iterable, helper):
+    """Regenerate pkgs in batches via helpers supporting pipelined requests."""
+    iterable = iter(iterable)
+    while True:
+        pkgs = list(islice(iterable, helper.batch_size))
+        if not pkgs:
+            return
+        try:
+            for pkg, e in helper.batch(pkgs):
+                # metadata failures are handled at a higher level, see regen_iter()
+                if not isinstance(e, MetadataException):
+                    yield pkg, e
+        except IGNORED_EXCEPTIONS as e:
+            if isinstance(e, KeyboardInterrupt):
+                return
+            raise
+
 
-    def _get_repo_helper():
-        if not hasattr(repo, '_regen_operation_helper'):
-            return lambda pkg: getattr(pkg, 'keywords')
-        # for an actual helper, track it and invoke .finish if it exists.
-        helper = repo._regen_operation_helper(**kwargs)
-        helpers.append(helper)
-        return helper
+def _get_repo_helper(repo, helpers, **kwargs):
+    if not hasattr(repo, '_regen_operation_helper'):
+        return lambda pkg: getattr(pkg, 'keywords')
+    # for an actual helper, track it and invoke .finish if it exists.
+    helper = repo._regen_operation_helper(**kwargs)
+    helpers.append(helper)
+    return helper
+
+
+def regen_repository(repo, pkgs, observer, threads=1, pkg_attr='keywords',
+                     engine='thread', **kwargs):
+    """Regenerate the metadata of the given packages.
+
+    :param threads: number of threads (or worker processes) to use
+    :param engine: either 'thread' to regen using a thread pool sharing the
+        parent interpreter or 'process' to shard packages across forked
+        worker processes, see :func:`regen_repository_procs`
+    :return: iterable of (pkg, exception) pairs for failed packages
+    """
+    if engine == 'process':
+        yield from regen_repository_procs(
+            repo, pkgs, observer, procs=threads, **kwargs)
+        return
+    elif engine != 'thread':
+        raise ValueError(f'unknown regen engine: {engine!r}')
+
+    if hasattr(pkgs, '__len__'):
+        threads = min(len(pkgs), threads)
+    helpers = []
+    shared = []
 
     def get_args():
-        return (_get_repo_helper(), observer)
+        # a single helper is shared by all threads
+        if not shared:
+            shared.append(_get_repo_helper(repo, helpers, threads=threads, **kwargs))
+        return (shared[0], observer)
 
     errors = map_async(pkgs, regen_iter, threads=threads, per_thread_args=get_args)
 
     # yield any errors that occurred during metadata generation
     yield from errors
+
+
+def _shard_pkgs(pkgs):
+    """Split packages into per category/package shards.
+
+    Versions of the same package share a directory, eclasses and usually
+    inherits so keeping them on the same worker keeps its caches warm.
+    """
+    shards = defaultdict(list)
+    for i, pkg in enumerate(pkgs):
+        shards[pkg.key].append(i)
+    return list(shards.values())
+
+
+def _portable_exception(e):
+    """Return an exception that can be sent back to the parent process."""
+    try:
+        pickle.loads(pickle.dumps(e))
+    except Exception:
+        return Exception(f'{e.__class__.__name__}: {e}')
+    return e
+
+
+class RegenWorkerDied(PkgcoreException):
+    """Regen worker process died before finishing a package."""
+
+    def __init__(self, pkg):
+        super().__init__('regen worker died, metadata may not have been regenerated')
+        self.pkg = pkg
+
+
+def _regen_worker(repo, pkgs, shards, work_q, conn, kwargs):
+    # processors inherited from the parent are still owned by it
+    processor.forget_all_processors()
+
+    helpers = []
+    try:
+        helper = _get_repo_helper(repo, helpers, **kwargs)
+        for shard_idx in iter(work_q.get, None):
+            # results are sent synchronously so they aren't lost if the
+            # worker gets killed afterwards
+            for pkg, e in regen_iter((pkgs[i] for i in shards[shard_idx]), helper, None):
+                conn.send((shard_idx, pkg.cpvstr, _portable_exception(e)))
+            conn.send((shard_idx, None, None))
+    finally:
+        # release processors before exiting since atexit hooks aren't run
+        del helpers[:]
+        helper = None
+        processor.shutdown_all_processors()
+        conn.close()
+
+
+def regen_repository_procs(repo, pkgs, observer, procs=None, **kwargs):
+    """Regenerate metadata using a pool of forked worker processes.
+
+    Packages are sharded by category/package and handed out to workers on
+    demand; each worker runs its own ebuild processors and writes its results
+    directly to the repo's cache so only failures are sent back.
+
+    This requires caches that commit each entry as it's written, otherwise
+    worker updates are lost when the worker exits.
+
+    Packages of shards that weren't finished due to workers dying are
+    reported with :class:`RegenWorkerDied` errors.
+
+    :param procs: number of worker processes, defaults to the number of CPUs
+    :return: iterable of (pkg, exception) pairs for failed packages
+    """
+    ctx = multiprocessing.get_context('fork')
+    shards = _shard_pkgs(pkgs)
+    if procs is None:
+        procs = ctx.cpu_count()
+    procs = max(min(len(shards), procs), 0)
+    if not procs:
+        return
+
+    work_q = ctx.Queue()
+    cpvs = {pkg.cpvstr: pkg for pkg in pkgs}
+
+    # result pipes of the running workers
+    running = {}
+    # shards that haven't been finished by a worker
+    unfinished = set(range(len(shards)))
+    abandoned = False
+    try:
+        for x in range(procs):
+            reader, writer = ctx.Pipe(duplex=False)
+            worker = ctx.Process(
+                target=_regen_worker, args=(repo, pkgs, shards, work_q, writer, kwargs))
+            worker.start()
+            # drop the parent's write end so EOF is seen when the worker exits
+            writer.close()
+            running[reader] = worker
+        for shard_idx in range(len(shards)):
+            work_q.put(shard_idx)
+        for x in range(procs):
+            work_q.put(None)
+
+        while running:
+            for reader in mp_connection.wait(list(running)):
+                try:
+                    shard_idx, cpv, e = reader.recv()
+                except EOFError:
+                    worker = running.pop(reader)
+                    reader.close()
+                    worker.join()
+                    if worker.exitcode != 0:
+                        observer.error(
+                            f'regen worker {worker.pid} died with exit code {worker.exitcode}')
+                        abandoned = True
+                    continue
+                if cpv is None:
+                    unfinished.discard(shard_idx)
+                else:
+                    yield cpvs[cpv], e
+
+        # report the pkgs of shards held by dead workers or left queued if
+        # all of them died
+        for shard_idx in sorted(unfinished):
+            for i in shards[shard_idx]:
+                yield pkgs[i], RegenWorkerDied(pkgs[i])
+    finally:
+        for reader, worker in running.items():
+            worker.terminate()
+            worker.join()
+            reader.close()
+        # Make sure the queue's feeder thread is gone so it can't be holding
+        # locks during later forks; if workers were killed, unread work would
+        # block it forever so it's abandoned instead.
+        work_q.close()
+        if running or abandoned:
+            work_q.cancel_join_thread()
+        else:
+            work_q.join_thread()
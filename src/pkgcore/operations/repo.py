@@ -249,7 +249,21 @@ class operations(sync_operations):
             # as EBADF since the repo iterator isn't thread-safe.
             pkgs = list(self.repo.itermatch(packages.AlwaysTrue, pkg_filter=None))
 
+            # Skip pkgs with valid cache entries, the preloaded entries are
+            # used when reporting bad metadata below.
+            validate_cache = getattr(self.repo, 'validate_cache', None)
+            if validate_cache is not None and not kwargs.get('force', False):
+                _valid, stale = validate_cache(preload=True)
+                pkgs = [pkg for pkg in pkgs if pkg.cpvstr in stale]
+
             observer = self._get_observer(observer)
+            if kwargs.get('engine') == 'process' and not all(
+                    x.autocommits for x in self._get_caches() if not x.readonly):
+                # forked workers can't flush queued updates back to the parent
+                logger.warning(
+                    "repo %r cache doesn't autocommit, falling back to thread regen engine",
+                    self.repo)
+                kwargs['engine'] = 'thread'
             for pkg, e in regen.regen_repository(
                     self.repo, pkgs, observer=observer, threads=threads, **kwargs):
                 observer.error(f'caught exception {e} while processing {pkg.cpvstr}')
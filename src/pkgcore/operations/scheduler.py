@@ -0,0 +1,236 @@
+# License: GPL2/BSD
+
+"""
+parallel execution of resolved merge plans
+
+Resolver plans are a flat sequence of ops; running them strictly in order
+leaves most cores idle while single threaded builds run. Here ops are built
+concurrently as soon as the ops they depend on are merged, while merges
+themselves are run serially by the calling thread in the order builds
+finish. Distfiles can be fetched for all ops in the background, so builds
+only have to wait on their own distfiles.
+"""
+
+__all__ = ("FetchScheduler", "MergeScheduler", "op_dependencies")
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+
+
+def op_dependencies(ops, pkg_deps):
+    """Determine which ops of a plan each op has to wait for.
+
+    Each op depends on the preceding ops providing the packages its package's
+    build and runtime deps were resolved against. Packages without ops in the
+    sequence, e.g. old-style virtuals, are followed through to the packages
+    they were resolved against. Removals are barriers, they depend on all
+    preceding ops and all following ops depend on them.
+
+    :param ops: sequence of resolver ops in plan order
+    :param pkg_deps: mapping of packages to the packages their deps were
+        resolved against, see :obj:`pkgcore.resolver.state.plan_state`
+    :return: list of frozensets of the indexes of the ops each op depends on
+    """
+    index = {op.pkg: i for i, op in enumerate(ops)}
+    deps = []
+    barrier = None
+    for i, op in enumerate(ops):
+        if op.desc == 'remove':
+            deps.append(frozenset(range(i)))
+            barrier = i
+            continue
+        s = set()
+        if barrier is not None:
+            s.add(barrier)
+        seen = set()
+        pkgs = list(pkg_deps.get(op.pkg, ()))
+        while pkgs:
+            pkg = pkgs.pop()
+            if pkg in seen:
+                continue
+            seen.add(pkg)
+            j = index.get(pkg)
+            if j is None:
+                pkgs.extend(pkg_deps.get(pkg, ()))
+            elif j < i:
+                # deps on later ops come from cycles, they're ignored
+                s.add(j)
+        deps.append(frozenset(s))
+    return deps
+
+
+class MergeScheduler(object):
+    """Run the build and merge steps of a plan's ops.
+
+    With multiple jobs builds run in a thread pool while merges are run by
+    the thread calling :meth:`run`, so at most one merge happens at a time.
+    With a single job, ops are built and merged in plan order by the calling
+    thread, leaving signal handling (e.g. for ctrl+c) to work as usual.
+
+    :ivar failed: ops that failed to build or merge
+    :ivar skipped: ops that weren't run since ops they depend on failed
+    """
+
+    def __init__(self, ops, build, merge, jobs=1, load_average=None, deps=None):
+        """
+        :param ops: sequence of resolver ops in plan order
+        :param build: callable run for each op, in worker threads if multiple
+            jobs are used; its result is passed to ``merge``, returning False
+            marks the op as failed
+        :param merge: callable taking an op and its build result, returning
+            False if merging failed
+        :param jobs: maximum number of concurrent builds
+        :param load_average: if not None, don't start further builds while
+            others are running and the system load is at or above it
+        :param deps: op dependencies as returned by :func:`op_dependencies`,
+            by default each op depends on all preceding ops
+        """
+        if jobs < 1:
+            raise ValueError(f'invalid number of jobs: {jobs}')
+        self.ops = ops
+        self.build = build
+        self.merge = merge
+        self.jobs = jobs
+        self.load_average = load_average
+        if deps is None:
+            deps = [frozenset(range(i)) for i in range(len(ops))]
+        self.deps = deps
+        self.failed = []
+        self.skipped = []
+
+    def _overloaded(self):
+        if self.load_average is None:
+            return False
+        return os.getloadavg()[0] >= self.load_average
+
+    def run(self, ignore_failures=False):
+        """Build and merge all ops.
+
+        :param ignore_failures: keep going if ops fail, skipping the ops
+            depending on them; by default no further builds are started
+            after a failure
+        :return: True if all ops were built and merged, False otherwise
+        """
+        if self.jobs == 1:
+            return self._run_serially(ignore_failures)
+        ops, deps = self.ops, self.deps
+        pending = list(range(len(ops)))
+        merged = set()
+        failed = set()
+        running = {}
+        aborted = False
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            try:
+                while pending or running:
+                    throttled = False
+                    for i in list(pending):
+                        if len(running) >= self.jobs:
+                            break
+                        if deps[i] & failed:
+                            pending.remove(i)
+                            failed.add(i)
+                            self.skipped.append(ops[i])
+                            continue
+                        if not deps[i] <= merged:
+                            continue
+                        if running and self._overloaded():
+                            throttled = True
+                            break
+                        pending.remove(i)
+                        running[executor.submit(self.build, ops[i])] = i
+
+                    if not running:
+                        break
+                    # recheck the load regularly when throttled
+                    done, _ = wait(
+                        running, timeout=(1 if throttled else None),
+                        return_when=FIRST_COMPLETED)
+                    for future in sorted(done, key=running.get):
+                        i = running.pop(future)
+                        result = future.result()
+                        if aborted:
+                            # builds finishing after a failure aren't merged
+                            continue
+                        if result is not False:
+                            result = self.merge(ops[i], result)
+                        if result is False:
+                            failed.add(i)
+                            self.failed.append(ops[i])
+                            if not ignore_failures:
+                                aborted = True
+                                pending = []
+                        else:
+                            merged.add(i)
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+        return not (aborted or self.failed or self.skipped)
+
+    def _run_serially(self, ignore_failures):
+        failed = set()
+        for i, op in enumerate(self.ops):
+            if self.deps[i] & failed:
+                failed.add(i)
+                self.skipped.append(op)
+                continue
+            result = self.build(op)
+            if result is not False:
+                result = self.merge(op, result)
+            if result is False:
+                failed.add(i)
+                self.failed.append(op)
+                if not ignore_failures:
+                    return False
+        return not (self.failed or self.skipped)
+
+
+class FetchScheduler(object):
+    """Fetch the distfiles of a plan's ops in the background.
+
+    Fetches for all ops except removals are queued in plan order on
+    :meth:`start`, results are retrieved per op via :meth:`result`.
+    """
+
+    def __init__(self, ops, fetch, jobs=1):
+        """
+        :param ops: sequence of resolver ops in plan order
+        :param fetch: callable run in worker threads for each op
+        :param jobs: maximum number of concurrent fetches
+        """
+        if jobs < 1:
+            raise ValueError(f'invalid number of jobs: {jobs}')
+        self.ops = ops
+        self.fetch = fetch
+        self.jobs = jobs
+        self._executor = None
+        self._futures = {}
+
+    def start(self):
+        """Queue fetching for all ops."""
+        self._executor = ThreadPoolExecutor(max_workers=self.jobs)
+        for op in self.ops:
+            if op.desc != 'remove':
+                self._futures[id(op)] = self._executor.submit(self.fetch, op)
+
+    def result(self, op):
+        """Return the result of fetching for an op, waiting for it to finish.
+
+        Exceptions raised while fetching are reraised.
+        """
+        return self._futures[id(op)].result()
+
+    def shutdown(self):
+        """Cancel queued fetches, waiting for running ones to finish."""
+        for future in self._futures.values():
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
@@ -0,0 +1,71 @@
+# License: GPL2/BSD
+
+"""
+persistent index of a repository's category/package/version layout
+
+Walking the category and package dirs of large repos on every run is slow,
+especially on network filesystems. The index stores the listings along with
+the mtimes of the paths they were generated from so subsequent runs only
+need to stat those paths, rescanning the ones that changed.
+"""
+
+__all__ = ("LayoutIndex",)
+
+import os
+from sys import intern
+
+from pkgcore.cache.stamped import StampedCache
+
+
+class LayoutIndex(StampedCache):
+    """On-disk cache of directory listings validated via path mtimes."""
+
+    description = 'layout index'
+
+    def _decode_entries(self, entries):
+        return {
+            k: (tuple(stamp), self._decode(vals))
+            for k, (stamp, vals) in entries.items()}
+
+    @staticmethod
+    def _encode_entries(entries):
+        return {k: [list(stamp), vals] for k, (stamp, vals) in entries.items()}
+
+    @staticmethod
+    def _encode(vals):
+        """Convert an entry to the form stored in memory and on disk."""
+        return tuple(vals)
+
+    @staticmethod
+    def _decode(vals):
+        """Convert an entry loaded from disk to the form stored in memory."""
+        return tuple(map(intern, vals))
+
+    @staticmethod
+    def _stamp(paths):
+        stamp = []
+        for path in paths:
+            try:
+                stamp.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def lookup(self, key, paths, func):
+        """Return the listing for a key, regenerating it if it's stale.
+
+        :param key: string identifying the listing
+        :param paths: paths the listing is generated from
+        :param func: callable generating the listing
+        """
+        entries = self.entries
+        stamp = self._stamp(paths)
+        entry = entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        vals = func()
+        if vals is not None and self._settled(stamp):
+            with self._lock:
+                entries[key] = (stamp, self._encode(vals))
+                self._modified()
+        return vals
@@ -0,0 +1,119 @@
+# License: GPL2/BSD
+
+"""
+persistent cache of repo query results
+
+Resolving similar targets repeatedly, e.g. regular world updates, matches
+mostly the same atoms against unchanged repos. The cache records the sorted
+packages matching each atom per repo so later runs can pull the known
+matches directly instead of matching and sorting every version of a package.
+
+Cached results are tied to the repo stack they were generated from, the
+mtimes of the paths its raw repos depend on (see
+:meth:`pkgcore.repository.prototype.tree._generation_paths`), the sorting
+strategy, and a hash of the configuration affecting pkg visibility.
+"""
+
+__all__ = ("MatchCache",)
+
+import hashlib
+import os
+
+from pkgcore.cache.stamped import StampedCache
+from pkgcore.repository import multiplex
+from pkgcore.repository.util import get_raw_repos
+
+
+def _wrapper_chain(repo):
+    chain = []
+    while repo is not None:
+        chain.append(f'{repo.__class__.__module__}.{repo.__class__.__name__}')
+        if isinstance(repo, multiplex.tree):
+            chain.append(f"[{','.join(map(_wrapper_chain, repo.trees))}]")
+            break
+        repo = getattr(repo, 'raw_repo', None)
+    return '>'.join(chain)
+
+
+class MatchCache(StampedCache):
+    """On-disk cache of atom matches per repo.
+
+    Entries map repo stacks to their sections, each mapping atoms to
+    ``(complete, [(repo_id, cpvstr), ...])`` where complete denotes whether
+    all matches were recorded or just the leading ones that were pulled.
+    """
+
+    format_version = 2
+    description = 'match cache'
+
+    def __init__(self, path, config_hash=''):
+        """
+        :param path: location of the cache file
+        :param config_hash: string identifying the configuration used to
+            filter and configure pkgs, cached results are only valid for
+            the same configuration
+        """
+        super().__init__(path)
+        self.config_hash = config_hash
+
+    @staticmethod
+    def _generation(repo):
+        """Return the mtime based generation of a repo, None if unsupported."""
+        h = hashlib.sha1()
+        for raw_repo in get_raw_repos(repo):
+            paths = getattr(raw_repo, '_generation_paths', lambda: None)()
+            if paths is None:
+                return None
+            h.update(f'{raw_repo.repo_id}\0'.encode())
+            for path in paths:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    mtime = None
+                h.update(f'{path}\0{mtime}\0'.encode())
+        return h.hexdigest()
+
+    def section(self, repo, strategy):
+        """Return the cached entries for a repo.
+
+        :param repo: repo stack being queried
+        :param strategy: sorting strategy applied to the results
+        :return: entries of the repo keyed by atom strings, supporting
+            ``get(key)`` and ``update(key, complete, matches)``, None if the
+            repo doesn't support persistent caching
+        """
+        generation = self._generation(repo)
+        if generation is None:
+            return None
+        key = '%s:%s.%s' % (
+            _wrapper_chain(repo), getattr(strategy, '__module__', ''),
+            getattr(strategy, '__qualname__', strategy))
+        sections = self.entries
+        with self._lock:
+            section = sections.get(key)
+            if section is None or section['stamp'] != [generation, self.config_hash]:
+                section = sections[key] = {
+                    'stamp': [generation, self.config_hash], 'entries': {}}
+        return _Section(self, section['entries'])
+
+
+class _Section(object):
+    """Cached entries of a single repo stack."""
+
+    __slots__ = ('_cache', '_entries')
+
+    def __init__(self, cache, entries):
+        self._cache = cache
+        self._entries = entries
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        complete, matches = entry
+        return complete, [tuple(x) for x in matches]
+
+    def update(self, key, complete, matches):
+        # matches is stored as is, so callers can extend it in place
+        self._entries[key] = [complete, matches]
+        self._cache._modified()
@@ -0,0 +1,244 @@
+# License: GPL2/BSD
+
+"""
+persistent secondary indexes of package metadata
+
+Queries on package metadata (e.g. ``pquery --maintainer``) otherwise have
+to pull the metadata of every package in a repo and match it. The index
+maps the distinct values of indexed attributes to the packages having them,
+so restrictions on those attributes only need to be evaluated against the
+distinct values, with the full restriction applied to the remaining
+candidates afterwards. Index data is generated per category and validated
+against the mtimes of the paths it depends on, see
+:obj:`pkgcore.repository.layout_index.LayoutIndex`.
+
+Since directory mtimes don't change when files are edited in place, the
+index is only enabled for repos that opt in to it via the ``metadata-index``
+repos.conf setting.
+"""
+
+__all__ = ("Indexer", "MetadataIndex", "default_indexers")
+
+import json
+from functools import reduce
+from itertools import chain
+
+from snakeoil.demandload import demandload
+from snakeoil.sequences import iflatten_instance
+
+from pkgcore.package.errors import MetadataException
+from pkgcore.repository.layout_index import LayoutIndex
+from pkgcore.restrictions import boolean, packages, values
+
+demandload(
+    'pkgcore.ebuild.atom:atom',
+    'pkgcore.ebuild.eapi:get_eapi',
+    'pkgcore.ebuild.repo_objs:Maintainer',
+)
+
+# token for packages whose values couldn't be indexed, always a candidate
+_UNINDEXED = '\0unindexed'
+# token for unset scalar values
+_NONE = '\0none'
+
+
+class Indexer(object):
+    """Extracts the index tokens of a package attribute.
+
+    :ivar attr: package attribute to index
+    :ivar multi: values are sequences with a token per item, otherwise
+        the whole value is a single token
+    """
+
+    __slots__ = ('attr', 'multi', '_tokens', '_load')
+
+    def __init__(self, attr, multi=False, tokens=None, load=None):
+        """
+        :param attr: package attribute to index
+        :param multi: whether the attribute is a sequence of values
+        :param tokens: callable returning the string tokens of an attribute
+            value, by default the string form of the value (or its items)
+        :param load: callable converting tokens back to the value (or item)
+            restrictions are matched against, by default the token itself
+        """
+        self.attr = attr
+        self.multi = multi
+        self._tokens = tokens
+        self._load = load
+
+    def tokens(self, pkg):
+        """Return the tokens of a package, None if they can't be determined."""
+        try:
+            val = getattr(pkg, self.attr)
+        except (AttributeError, MetadataException):
+            return None
+        if not self.multi and val is None:
+            return (_NONE,)
+        if self._tokens is not None:
+            val = self._tokens(val)
+        elif not self.multi:
+            val = (val,)
+        return tuple(map(str, val))
+
+    def load(self, token):
+        """Return the value or item a token represents."""
+        if token == _NONE:
+            return None
+        if self._load is not None:
+            return self._load(token)
+        return token
+
+
+def _maintainer_tokens(maintainers):
+    return (json.dumps([m.email, m.name, m.description]) for m in maintainers)
+
+
+default_indexers = (
+    Indexer('eapi', load=lambda x: get_eapi(x)),
+    Indexer('description'),
+    Indexer('longdescription'),
+    Indexer('license', multi=True, tokens=iflatten_instance),
+    Indexer('keywords', multi=True),
+    Indexer('inherited', multi=True),
+    Indexer('maintainers', multi=True, tokens=_maintainer_tokens,
+            load=lambda x: Maintainer(*json.loads(x))),
+)
+
+
+class MetadataIndex(LayoutIndex):
+    """Inverted indexes of package metadata for a repo.
+
+    Repos using an index must implement ``_metadata_index_paths(category)``
+    returning the paths the metadata of a category depends on.
+    """
+
+    format_version = 1
+    description = 'metadata index'
+
+    def __init__(self, path, indexers=default_indexers):
+        """
+        :param path: location of the index file
+        :param indexers: sequence of :obj:`Indexer` instances for the
+            package attributes to index
+        """
+        super().__init__(path)
+        self.indexers = {x.attr: x for x in indexers}
+        self._key = ','.join(sorted(self.indexers))
+        self._postings = None
+
+    @staticmethod
+    def _encode(vals):
+        return vals
+
+    @staticmethod
+    def _decode(vals):
+        return vals
+
+    def _generate(self, repo, category):
+        postings = {attr: {} for attr in self.indexers}
+        restrict = packages.PackageRestriction(
+            'category', values.StrExactMatch(category))
+        for pkg in repo.itermatch(restrict):
+            key = f'{pkg.category}/{pkg.package}/{pkg.fullver}'
+            for attr, indexer in self.indexers.items():
+                tokens = indexer.tokens(pkg)
+                if tokens is None:
+                    tokens = (_UNINDEXED,)
+                d = postings[attr]
+                for token in tokens:
+                    d.setdefault(token, []).append(key)
+        return postings
+
+    def _load_postings(self, repo):
+        if self._postings is None:
+            postings = {attr: {} for attr in self.indexers}
+            for category in repo.categories:
+                data = self.lookup(
+                    f'{category}:{self._key}', repo._metadata_index_paths(category),
+                    lambda: self._generate(repo, category))
+                for attr, d in data.items():
+                    merged = postings[attr]
+                    for token, cpvs in d.items():
+                        merged.setdefault(token, []).extend(cpvs)
+            self._postings = postings
+        return self._postings
+
+    def invalidate(self):
+        """Drop the in-memory index data, e.g. after repo modifications."""
+        self._postings = None
+
+    def match(self, repo, restrict):
+        """Determine the packages of a repo that may match a restriction.
+
+        :param repo: repo the index belongs to
+        :param restrict: package restriction to plan the lookup for
+        :return: frozenset of candidate package keys in the form of
+            ``category/package/fullver``, None if the restriction can't be
+            answered from the index
+        """
+        return self._candidates(repo, restrict)
+
+    def _candidates(self, repo, restrict):
+        if isinstance(restrict, atom):
+            return None
+        elif isinstance(restrict, boolean.AndRestriction):
+            if restrict.negate:
+                return None
+            # intersect what can be looked up, the rest is left to matching
+            results = [
+                x for x in (self._candidates(repo, r) for r in restrict.restrictions)
+                if x is not None]
+            if not results:
+                return None
+            return reduce(frozenset.intersection, results)
+        elif isinstance(restrict, boolean.OrRestriction):
+            if restrict.negate:
+                return None
+            results = []
+            for r in restrict.restrictions:
+                result = self._candidates(repo, r)
+                if result is None:
+                    return None
+                results.append(result)
+            return frozenset().union(*results)
+        elif isinstance(restrict, packages.PackageRestriction):
+            if restrict.negate or restrict.conditional:
+                return None
+            indexer = self.indexers.get(restrict.attr)
+            if indexer is None:
+                return None
+            lookup = self._value_lookup(indexer, restrict.restriction)
+            if lookup is None:
+                return None
+            postings = self._load_postings(repo)[indexer.attr]
+            return lookup(postings).union(postings.get(_UNINDEXED, ()))
+        return None
+
+    @staticmethod
+    def _value_lookup(indexer, restrict):
+        """Return a function pulling the postings matching a value restriction.
+
+        Scalar values are matched directly, for sequences only restrictions
+        applying to their items can be looked up.
+        """
+        if not indexer.multi:
+            match = restrict.match
+        elif isinstance(restrict, values.AnyMatch) and not restrict.negate:
+            match = restrict.restriction.match
+        elif isinstance(restrict, values.ContainmentMatch2) and not restrict.negate:
+            if not restrict.vals:
+                return None
+            def lookup(postings):
+                sets = [frozenset(postings.get(x, ())) for x in restrict.vals]
+                if restrict.all:
+                    return reduce(frozenset.intersection, sets)
+                return frozenset().union(*sets)
+            return lookup
+        else:
+            return None
+
+        def lookup(postings):
+            return frozenset(chain.from_iterable(
+                cpvs for token, cpvs in postings.items()
+                if token != _UNINDEXED and match(indexer.load(token))))
+        return lookup
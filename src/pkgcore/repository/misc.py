@@ -6,6 +6,7 @@ __all__ = ("nodeps_repo", "caching_repo")
 from snakeoil.iterables import caching_iter, iter_sort
 from snakeoil.klass import GetAttrProxy, DirProxy
 
+from pkgcore.ebuild.atom import atom, MalformedAtom
 from pkgcore.ebuild.conditionals import DepSet
 from pkgcore.operations.repo import operations_proxy
 from pkgcore.package.mutated import MutatedPkg
@@ -86,29 +87,96 @@ class caching_repo(object):
     in memory till the cache is cleared.  General use, not usually what
     you want- if you're making a lot of random queries that are duplicates
     (resolver does this for example), caching helps.
+
+    Optionally, atom matches are recorded in a persistent
+    :obj:`pkgcore.repository.match_cache.MatchCache` so later runs can pull
+    the recorded pkgs directly, skipping matching and sorting all versions.
     """
 
     operations_kls = operations_proxy
 
-    def __init__(self, db, strategy):
+    def __init__(self, db, strategy, match_cache=None, profile=None):
         """
         :param db: an instance supporting the repository protocol to cache
           queries from.
         :param strategy: forced sorting strategy for results.  If you don't
           need sorting, pass in iter.
+        :param match_cache: optional
+          :obj:`pkgcore.repository.match_cache.MatchCache` instance
+        :param profile: optional
+          :obj:`pkgcore.resolver.profile.ResolverProfile` instance recording
+          queries and cache hits
         """
         self.__db__ = db
         self.__strategy__ = strategy
         self.__cache__ = {}
+        if match_cache is not None:
+            match_cache = match_cache.section(db, strategy)
+        self.__match_cache__ = match_cache
+        self.__profile__ = profile
 
     def match(self, restrict):
         v = self.__cache__.get(restrict)
         if v is None:
-            v = self.__cache__[restrict] = \
-                caching_iter(
-                    self.__db__.itermatch(restrict, sorter=self.__strategy__))
+            it = self._itermatch(restrict)
+            if self.__profile__ is not None:
+                it = self.__profile__.repo_query(self.__db__, it)
+            v = self.__cache__[restrict] = caching_iter(it)
+        elif self.__profile__ is not None:
+            self.__profile__.repo_hit(self.__db__)
         return v
 
+    def _itermatch(self, restrict):
+        if self.__match_cache__ is not None and isinstance(restrict, atom):
+            return self._persistent_itermatch(restrict)
+        return self.__db__.itermatch(restrict, sorter=self.__strategy__)
+
+    def _persistent_itermatch(self, restrict):
+        key = str(restrict)
+        cache = self.__match_cache__
+        entry = cache.get(key)
+        complete, cached = entry if entry is not None else (False, ())
+        matches = []
+        if cached:
+            for k, pkg in zip(cached, self._cached_pkgs(restrict, cached)):
+                if pkg is None:
+                    # stale entry, fall back to matching
+                    complete = False
+                    break
+                matches.append(k)
+                yield pkg
+        if complete:
+            return
+
+        # the entry is extended in place as pkgs are pulled
+        cache.update(key, False, matches)
+        seen = frozenset(matches)
+        for pkg in self.__db__.itermatch(restrict, sorter=self.__strategy__):
+            k = (pkg.repo.repo_id, pkg.cpvstr)
+            if k not in seen:
+                matches.append(k)
+                yield pkg
+        cache.update(key, True, matches)
+
+    def _cached_pkgs(self, restrict, cached):
+        """Yield the pkgs of cached matches, None for ones that are missing."""
+        # the leading match is often the only one used, pull it on its own so
+        # the repo only has to check that version
+        repo_id, cpv = cached[0]
+        try:
+            pkgs = self.__db__.match(atom(f'={cpv}::{repo_id}'))
+        except MalformedAtom:
+            pkgs = ()
+        yield pkgs[0] if len(pkgs) == 1 else None
+        if len(cached) > 1:
+            # pull the remaining versions of the package in one go, skipping
+            # matching them against the atom and sorting them
+            pkgs = {
+                (pkg.repo.repo_id, pkg.cpvstr): pkg
+                for pkg in self.__db__.itermatch(atom(restrict.key))}
+            for k in cached[1:]:
+                yield pkgs.get(k)
+
     def itermatch(self, restrict):
         return iter(self.match(restrict))
 
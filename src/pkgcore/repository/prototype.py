@@ -10,10 +10,12 @@ __all__ = (
 )
 
 import os
+from functools import partial
 
 from snakeoil.mappings import LazyValDict, DictMixin
 from snakeoil.sequences import iflatten_instance
 
+from pkgcore.ebuild import restricts
 from pkgcore.ebuild.atom import atom
 from pkgcore.operations import repo
 from pkgcore.restrictions import values, boolean, restriction, packages
@@ -135,11 +137,19 @@ class tree(object):
         categories (dict): available categories in the repo
         packages (dict): mapping of packages to categories in the repo
         versions (dict): mapping of versions to packages in the repo
+        layout_index: optional :obj:`pkgcore.repository.layout_index.LayoutIndex`
+            caching the categories, packages, and versions listings,
+            requires ``_layout_paths()`` to be implemented
+        metadata_index: optional :obj:`pkgcore.repository.metadata_index.MetadataIndex`
+            used to narrow down the candidates for restrictions on package
+            metadata, requires ``_metadata_index_paths()`` to be implemented
         frozen (bool): repository mutability status
         lock: TODO
     """
 
     raw_repo = None
+    layout_index = None
+    metadata_index = None
     is_supported = True
     livefs = False
     package_class = None
@@ -150,14 +160,56 @@ class tree(object):
 
     def __init__(self, frozen=False):
         self.categories = CategoryIterValLazyDict(
-            self._get_categories, self._get_categories)
-        self.packages = PackageMapping(self.categories, self._get_packages)
-        self.versions = VersionMapping(self.packages, self._get_versions)
+            self._pull_categories, self._pull_categories)
+        self.packages = PackageMapping(self.categories, self._pull_packages)
+        self.versions = VersionMapping(self.packages, self._pull_versions)
 
         if self.frozen_settable:
             self.frozen = frozen
         self.lock = None
 
+    def _layout_paths(self, kind, key=None):
+        """Return the paths a categories/packages/versions listing depends on.
+
+        Used to validate :obj:`layout_index` entries, only called if set.
+        """
+        raise NotImplementedError(self, "_layout_paths")
+
+    def _metadata_index_paths(self, category):
+        """Return the paths the package metadata of a category depends on.
+
+        Used to validate :obj:`metadata_index` entries, only called if set.
+        """
+        raise NotImplementedError(self, "_metadata_index_paths")
+
+    def _generation_paths(self):
+        """Return the paths whose mtimes change when the repo's pkgs change.
+
+        Used to validate persistent caches of repo queries, None if
+        unsupported.
+        """
+        return None
+
+    def _pull_categories(self, *args):
+        if self.layout_index is None or args:
+            return self._get_categories(*args)
+        return self.layout_index.lookup(
+            'categories', self._layout_paths('categories'), self._get_categories)
+
+    def _pull_packages(self, category):
+        if self.layout_index is None:
+            return self._get_packages(category)
+        return self.layout_index.lookup(
+            f'packages:{category}', self._layout_paths('packages', category),
+            lambda: self._get_packages(category))
+
+    def _pull_versions(self, package):
+        if self.layout_index is None:
+            return self._get_versions(package)
+        return self.layout_index.lookup(
+            f"versions:{'/'.join(package)}", self._layout_paths('versions', package),
+            lambda: self._get_versions(package))
+
     def _get_categories(self, *args):
         """this must return a list, or sequence"""
         raise NotImplementedError(self, "_get_categories")
@@ -258,8 +310,21 @@ class tree(object):
 
         if isinstance(restrict, atom):
             candidates = [(restrict.category, restrict.package)]
+            if restrict.fullver is not None and pkg_filter is not iter:
+                # drop versions that can't match before filtering, filters
+                # may have to pull the metadata of every pkg
+                pkg_filter = partial(self._version_filter, restrict, pkg_filter)
         else:
-            candidates = self._identify_candidates(restrict, sorter)
+            keys = None
+            if self.metadata_index is not None and force is not False:
+                keys = self.metadata_index.match(self, restrict)
+            if keys is None:
+                candidates = self._identify_candidates(restrict, sorter)
+            else:
+                # only pull the packages the index matched, the restriction
+                # is still applied to them in full
+                candidates = {tuple(x.split('/', 2)[:2]) for x in keys}
+                pkg_filter = partial(self._index_filter, keys, pkg_filter)
 
         if force is None:
             match = restrict.match
@@ -271,6 +336,20 @@ class tree(object):
             candidates, match, pkg_klass_override,
             yield_none=yield_none, sorter=sorter, pkg_filter=pkg_filter)
 
+    @staticmethod
+    def _version_filter(restrict, pkg_filter, pkgs):
+        versions = [
+            x for x in restrict.restrictions
+            if isinstance(x, restricts.VersionMatch) or getattr(x, 'attr', None) == 'fullver']
+        return pkg_filter(
+            pkg for pkg in pkgs if all(x.match(pkg) for x in versions))
+
+    @staticmethod
+    def _index_filter(keys, pkg_filter, pkgs):
+        return pkg_filter(
+            pkg for pkg in pkgs
+            if f'{pkg.category}/{pkg.package}/{pkg.fullver}' in keys)
+
     def _internal_gen_candidates(self, candidates, sorter, pkg_filter):
         for cp in sorter(candidates):
             pkgs = (self.package_class(cp[0], cp[1], ver)
@@ -436,6 +515,8 @@ class tree(object):
 
         notify the repository that a pkg it provides is being removed
         """
+        if self.metadata_index is not None:
+            self.metadata_index.invalidate()
         ver_key = (pkg.category, pkg.package)
         l = [x for x in self.versions[ver_key] if x != pkg.fullver]
         if not l:
@@ -451,6 +532,8 @@ class tree(object):
 
         notify the repository that a pkg is being added to it
         """
+        if self.metadata_index is not None:
+            self.metadata_index.invalidate()
         ver_key = (pkg.category, pkg.package)
         s = set(self.versions.get(ver_key, ()))
         s.add(pkg.fullver)
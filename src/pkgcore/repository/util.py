@@ -3,7 +3,7 @@
 
 __all__ = (
     "SimpleTree", "RepositoryGroup",
-    "get_raw_repos", "get_virtual_repos",
+    "get_raw_repos", "get_virtual_repos", "preload_cache",
 )
 
 from snakeoil import klass
@@ -190,6 +190,18 @@ def get_raw_repos(repos):
     return [repos]
 
 
+def preload_cache(repos):
+    """Bulk validate and preload the metadata caches of repos.
+
+    Used before scanning all packages of repos, raw repos lacking support
+    for it are skipped.
+    """
+    for repo in get_raw_repos(repos):
+        validate_cache = getattr(repo, 'validate_cache', None)
+        if validate_cache is not None:
+            validate_cache(preload=True)
+
+
 def get_virtual_repos(repos, sentinel=True):
     """Select only virtual repos.
 
@@ -9,7 +9,6 @@ import operator
 from itertools import chain, islice, filterfalse
 import sys
 
-from snakeoil.compatibility import cmp, sort_cmp
 from snakeoil.iterables import caching_iter
 
 # XXX: hack; see insert_blockers
@@ -31,8 +30,22 @@ def dprint(handle, fmt, args=None, label=None):
 
 
 # iter/pkg sorting functions for selection strategy
-pkg_sort_highest = partial(sorted, reverse=True)
-pkg_sort_lowest = sorted
+def pkg_sort_key(pkg):
+    """Key sorting packages in the same order as comparing them.
+
+    Versions are compared via their cached sort keys, avoiding reparsing them
+    for every comparison.
+    """
+    return pkg.category, pkg.package, pkg.version_key
+
+
+def pkg_sort_highest(pkgs):
+    return sorted(pkgs, key=pkg_sort_key, reverse=True)
+
+
+def pkg_sort_lowest(pkgs):
+    return sorted(pkgs, key=pkg_sort_key)
+
 
 pkg_grabber = operator.itemgetter(0)
 
@@ -44,44 +57,29 @@ def highest_iter_sort(l, pkg_grabber=pkg_grabber):
     :param pkg_grabber: function to use as an attrgetter
     :return: sorted list of packages
     """
-    def f(x, y):
-        c = cmp(x, y)
-        if c:
-            return c
-        elif x.repo.livefs:
-            if y.repo.livefs:
-                return 0
-            return 1
-        elif y.repo.livefs:
-            return -1
-        return 0
-    sort_cmp(l, f, key=pkg_grabber, reverse=True)
+    def f(x):
+        pkg = pkg_grabber(x)
+        return pkg_sort_key(pkg), bool(pkg.repo.livefs)
+    l.sort(key=f, reverse=True)
     return l
 
 
 def downgrade_iter_sort(restrict, l, pkg_grabber=pkg_grabber):
     """Sort a list of packages from highest to lowest and prefer nonlivefs.
 
+    Nonlivefs packages not matching the restriction come first, followed by
+    the matching ones and finally the livefs packages.
+
     :param l: list of packages
     :param pkg_grabber: function to use as an attrgetter
     :return: sorted list of packages
     """
-    def f(x, y):
-        c = cmp(x, y)
-        if x.repo.livefs:
-            if y.repo.livefs:
-                return c
-            return -1
-        elif y.repo.livefs:
-            return 1
-        elif restrict.match(x):
-            if restrict.match(y):
-                return 1
-            return -1
-        elif restrict.match(y):
-            return 1
-        return c
-    sort_cmp(l, f, key=pkg_grabber, reverse=True)
+    def f(x):
+        pkg = pkg_grabber(x)
+        if pkg.repo.livefs:
+            return False, False, pkg_sort_key(pkg)
+        return True, not restrict.match(pkg), pkg_sort_key(pkg)
+    l.sort(key=f, reverse=True)
     return l
 
 
@@ -92,18 +90,10 @@ def lowest_iter_sort(l, pkg_grabber=pkg_grabber):
     :param pkg_grabber: function to use as an attrgetter
     :return: sorted list of packages
     """
-    def f(x, y):
-        c = cmp(x, y)
-        if c:
-            return c
-        elif x.repo.livefs:
-            if y.repo.livefs:
-                return 0
-            return -1
-        elif y.repo.livefs:
-            return 1
-        return 0
-    sort_cmp(l, f, key=pkg_grabber)
+    def f(x):
+        pkg = pkg_grabber(x)
+        return pkg_sort_key(pkg), not pkg.repo.livefs
+    l.sort(key=f)
     return l
 
 
@@ -254,7 +244,8 @@ class merge_plan(object):
 
     def __init__(self, dbs, per_repo_strategy, global_strategy=None,
                  depset_reorder_strategy=None, process_built_depends=False,
-                 drop_cycles=False, debug=False, debug_handle=None):
+                 drop_cycles=False, debug=False, debug_handle=None,
+                 match_cache=None, profile=None):
         if debug:
             if debug_handle is None:
                 debug_handle = sys.stdout
@@ -273,7 +264,10 @@ class merge_plan(object):
             depset_reorder_strategy = self.default_depset_reorder_strategy
 
         self.depset_reorder = depset_reorder_strategy
-        self.all_raw_dbs = [misc.caching_repo(x, per_repo_strategy) for x in dbs]
+        self.all_raw_dbs = [
+            misc.caching_repo(
+                x, per_repo_strategy, match_cache=match_cache, profile=profile)
+            for x in dbs]
         self.all_dbs = global_strategy(self.all_raw_dbs)
         self.default_dbs = self.all_dbs
 
@@ -296,6 +290,10 @@ class merge_plan(object):
             self._debugging_depth = 0
             self._debugging_drop_cycles = False
 
+        self.profile = profile
+        if profile is not None:
+            profile.instrument(self)
+
     @property
     def forced_restrictions(self):
         return frozenset(self.state.forced_restrictions)
@@ -362,21 +360,61 @@ class merge_plan(object):
             self._ensure_livefs_is_loaded_preloaded
 
     def add_atoms(self, restricts, finalize=False):
+        """Add atoms to the plan, resolving them in order.
+
+        Atoms that were already added are skipped. If an atom can't be
+        resolved, the plan is left as it was prior to adding it so resolution
+        can be resumed without it.
+
+        :return: the unresolvable atom stack and the related resolver events
+            if a solution can't be found, else an empty tuple
+        """
         if restricts:
-            stack = resolver_stack()
-            for restrict in restricts:
-                state.add_hardref_op(restrict).apply(self.state)
-            dbs = self.default_dbs
-            for restrict in restricts:
-                ret = self._add_atom(restrict, stack, dbs)
-                if ret:
-                    return ret
+            ret = self._add_atoms(restricts)
+            if ret:
+                return ret
         if finalize:
             # note via this being outside the recursion, backtracking
             # is excluded... inline it somehow.
             self.process_finalize()
         return ()
 
+    def _add_atoms(self, restricts):
+        stack = resolver_stack()
+        dbs = self.default_dbs
+        added = frozenset(x for x, _pos in self.state.checkpoints)
+        for restrict in restricts:
+            if restrict in added:
+                continue
+            point = self.state.checkpoint(restrict)
+            state.add_hardref_op(restrict).apply(self.state)
+            ret = self._add_atom(restrict, stack, dbs)
+            if ret:
+                self.state.backtrack(point)
+                return ret
+        return ()
+
+    def remove_atoms(self, restricts):
+        """Remove previously added atoms from the plan.
+
+        The resolution of atoms added prior to the removed ones is kept while
+        atoms added afterwards are resolved again since their resolution may
+        depend on the removed ones.
+
+        :return: same as :meth:`add_atoms` for the atoms resolved again
+        """
+        restricts = frozenset(restricts)
+        checkpoints = self.state.checkpoints
+        for i, (restrict, point) in enumerate(checkpoints):
+            if restrict in restricts:
+                break
+        else:
+            return ()
+        readd = [x for x, _pos in checkpoints[i:] if x not in restricts]
+        self.reset(point)
+        # the atoms were already processed by add_atoms() when first added
+        return self._add_atoms(readd)
+
     def process_finalize(self):
         pass
 
@@ -491,7 +529,10 @@ class merge_plan(object):
                 continue
             additions += new_additions
 
-            l = self.insert_choice(atom, stack, choices)
+            # record the pkgs the deps were resolved against for ordering
+            deps = frozenset(chain.from_iterable(
+                self.state.match_atom(x) for x in additions))
+            l = self.insert_choice(atom, stack, choices, deps)
             if l is False:
                 # this means somehow the node already slipped in.
                 # so we exit now, we are satisfied
@@ -727,12 +768,12 @@ class merge_plan(object):
                 c = choice_point(restrict, [pkg])
                 state.add_op(c, c.current_pkg, force=True).apply(self.state)
 
-    def insert_choice(self, atom, stack, choices):
+    def insert_choice(self, atom, stack, choices, deps=frozenset()):
         # first, check for conflicts.
         # lil bit fugly, but works for the moment
         if not choices.current_pkg.repo.livefs:
             self._ensure_livefs_is_loaded(choices.current_pkg.slotted_atom)
-        conflicts = state.add_op(choices, choices.current_pkg).apply(self.state)
+        conflicts = state.add_op(choices, choices.current_pkg, deps=deps).apply(self.state)
         if conflicts:
             # this means in this branch of resolution, someone slipped
             # something in already. cycle, basically.
@@ -769,7 +810,8 @@ class merge_plan(object):
                           "but current doesn't, bailing")
                     raise Exception("internal weirdness- vdb restrict matches ",
                                     "but current doesn't. bailing- run w/ --debug")
-                conflicts = state.replace_op(choices, choices.current_pkg).apply(self.state)
+                conflicts = state.replace_op(
+                    choices, choices.current_pkg, deps=deps).apply(self.state)
                 if not conflicts:
                     self._dprint(
                         "replacing vdb entry for '%s' with pkg '%s'",
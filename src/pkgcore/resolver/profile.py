@@ -0,0 +1,191 @@
+# License: GPL2/BSD
+
+"""
+resolver instrumentation
+
+Records where time is spent during resolution: the main steps and notify hooks
+of :obj:`pkgcore.resolver.plan.merge_plan`, the atoms being resolved, repo
+queries along with the hit rates of the resolver's query caches, and
+backtracking.
+
+Timings are recorded both in total, including any nested steps, and for the
+step itself, excluding time accounted to nested steps. For example, the total
+time of an atom includes resolving its dependencies while its own time only
+covers finding and inserting its matches.
+"""
+
+__all__ = ("ResolverProfile",)
+
+from collections import Counter, defaultdict
+import json
+from time import perf_counter
+
+
+def _timing():
+    # [count, total time, own time]
+    return [0, 0.0, 0.0]
+
+
+def _repo_stats():
+    return {'queries': 0, 'hits': 0, 'pkgs': 0, 'timing': _timing()}
+
+
+def _render_timing(timing):
+    count, total, own = timing
+    return {'count': count, 'time': round(total, 6), 'own_time': round(own, 6)}
+
+
+def _render_sorted(d, render=_render_timing):
+    # highest total time first, skipping unused entries
+    items = ((k, render(v)) for k, v in d.items())
+    return {
+        k: v for k, v in sorted(items, key=lambda x: x[1]['time'], reverse=True)
+        if v.get('count', 1)}
+
+
+class ResolverProfile(object):
+    """Collect statistics about a resolver run.
+
+    :ivar phases: mapping of resolver steps and hooks to their timings
+    :ivar atoms: mapping of atoms to the timings of resolving them
+    :ivar repos: mapping of repo ids to their query statistics
+    :ivar backtrack_depths: histogram of the resolver stack depths
+        backtracking occurred at
+    :ivar backtrack_sizes: histogram of the number of plan ops undone
+        per backtrack
+    """
+
+    format_version = 1
+
+    # resolver methods timed as phases of their own
+    phase_methods = (
+        'add_atoms', 'remove_atoms', 'load_vdb_state', '_viable',
+        'check_for_cycles', 'insert_choice', 'process_blocker',
+        'notify_starting_mode', 'notify_trying_choice', 'notify_choice_failed',
+        'notify_choice_succeeded', 'notify_viable',
+    )
+
+    def __init__(self):
+        self.phases = defaultdict(_timing)
+        self.atoms = defaultdict(_timing)
+        self.repos = defaultdict(_repo_stats)
+        self.backtrack_depths = Counter()
+        self.backtrack_sizes = Counter()
+        self._frames = []
+        self._depth = 0
+
+    def _call(self, timing, func, *args, **kwargs):
+        frame = [perf_counter(), 0.0]
+        self._frames.append(frame)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._frames.pop()
+            elapsed = perf_counter() - frame[0]
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] += elapsed - frame[1]
+            if self._frames:
+                self._frames[-1][1] += elapsed
+
+    def _wrap_phase(self, name, func):
+        timing = self.phases[name]
+        def wrapped(*args, **kwargs):
+            return self._call(timing, func, *args, **kwargs)
+        return wrapped
+
+    def instrument(self, resolver):
+        """Instrument a resolver instance, recording its activity.
+
+        :param resolver: :obj:`pkgcore.resolver.plan.merge_plan` instance
+        """
+        for name in self.phase_methods:
+            setattr(resolver, name, self._wrap_phase(name, getattr(resolver, name)))
+
+        process_dependencies = resolver.process_dependencies
+        def _process_dependencies(stack, choices, mode, *args):
+            return self._call(
+                self.phases[f'depset:{mode}'], process_dependencies,
+                stack, choices, mode, *args)
+        resolver.process_dependencies = _process_dependencies
+
+        rec_add_atom = resolver._rec_add_atom
+        def _rec_add_atom(atom, *args, **kwargs):
+            self._depth += 1
+            try:
+                return self._call(self.atoms[str(atom)], rec_add_atom, atom, *args, **kwargs)
+            finally:
+                self._depth -= 1
+        resolver._rec_add_atom = _rec_add_atom
+
+        plan_state = resolver.state
+        backtrack = plan_state.backtrack
+        def _backtrack(state_pos):
+            self.backtrack_depths[self._depth] += 1
+            self.backtrack_sizes[plan_state.current_state - state_pos] += 1
+            return self._call(self.phases['backtrack'], backtrack, state_pos)
+        plan_state.backtrack = _backtrack
+
+    def repo_hit(self, repo):
+        """Record a repo query answered from a resolver cache."""
+        stats = self.repos[self._repo_id(repo)]
+        stats['queries'] += 1
+        stats['hits'] += 1
+
+    def repo_query(self, repo, iterable):
+        """Record a repo query, timing the iteration over its results.
+
+        :param repo: repo queried
+        :param iterable: matches of the query
+        :return: iterator over the matches
+        """
+        stats = self.repos[self._repo_id(repo)]
+        stats['queries'] += 1
+        return self._iter_query(stats, iter(iterable))
+
+    def _iter_query(self, stats, iterator):
+        timing = stats['timing']
+        while True:
+            try:
+                pkg = self._call(timing, next, iterator)
+            except StopIteration:
+                return
+            stats['pkgs'] += 1
+            yield pkg
+
+    @staticmethod
+    def _repo_id(repo):
+        return str(getattr(repo, 'repo_id', repo))
+
+    def report(self):
+        """Return the collected statistics as JSON serializable data."""
+        def render_repo(stats):
+            d = _render_timing(stats['timing'])
+            queries, hits = stats['queries'], stats['hits']
+            d.update(
+                queries=queries, hits=hits, misses=queries - hits,
+                hit_rate=round(hits / queries, 4) if queries else None,
+                pkgs=stats['pkgs'])
+            # next() calls aren't meaningful on their own
+            del d['count']
+            return d
+
+        def histogram(counter):
+            return {str(k): v for k, v in sorted(counter.items())}
+
+        return {
+            'version': self.format_version,
+            'phases': _render_sorted(self.phases),
+            'atoms': _render_sorted(self.atoms),
+            'repos': _render_sorted(self.repos, render_repo),
+            'backtracks': {
+                'count': sum(self.backtrack_sizes.values()),
+                'depths': histogram(self.backtrack_depths),
+                'ops_undone': histogram(self.backtrack_sizes),
+            },
+        }
+
+    def dump(self, f):
+        """Write the collected statistics as JSON to a file object."""
+        json.dump(self.report(), f, indent=2)
+        f.write('\n')
@@ -18,11 +18,14 @@ class plan_state(object):
         self.state = PigeonHoledSlots()
         self.plan = []
         self.pkg_choices = {}
+        # pkg -> pkgs its build and runtime deps were resolved against
+        self.pkg_deps = {}
         self.rev_blockers = {}
         self.blockers_refcnt = RefCountingSet()
         self.match_atom = self.state.find_atom_matches
         self.vdb_filter = set()
         self.forced_restrictions = RefCountingSet()
+        self.checkpoints = []
 
     def add_blocker(self, choices, blocker, key=None):
         """Adds blocker, returning any packages blocked.
@@ -43,9 +46,25 @@ class plan_state(object):
         for blocker, key in l[:]:
             decref_forward_block_op(choices, blocker, key).apply(self)
 
+    def checkpoint(self, key):
+        """Record the current position of the plan.
+
+        Checkpoints are dropped once the plan is backtracked to or past them.
+
+        :param key: object identifying the checkpoint, e.g. the atom about to
+            be added
+        :return: the recorded position
+        """
+        pos = len(self.plan)
+        self.checkpoints.append((key, pos))
+        return pos
+
     def backtrack(self, state_pos):
         """Backtrack over a plan."""
         assert state_pos <= len(self.plan)
+        checkpoints = self.checkpoints
+        while checkpoints and checkpoints[-1][1] >= state_pos:
+            checkpoints.pop()
         if len(self.plan) == state_pos:
             return
 
@@ -105,13 +124,14 @@ class ops_sequence(object):
 
 class base_op_state(object):
 
-    __slots__ = ("pkg", "force", "choices")
+    __slots__ = ("pkg", "force", "choices", "deps")
     internal = False
 
-    def __init__(self, choices, pkg, force=False):
+    def __init__(self, choices, pkg, force=False, deps=frozenset()):
         self.choices = choices
         self.pkg = pkg
         self.force = force
+        self.deps = deps
 
     def __str__(self):
         s = ''
@@ -141,11 +161,13 @@ class add_op(base_op_state):
         if l and not self.force:
             return l
         plan.pkg_choices[self.pkg] = self.choices
+        plan.pkg_deps[self.pkg] = self.deps
         plan.plan.append(self)
 
     def revert(self, plan):
         plan.state.remove_slotting(self.pkg)
         del plan.pkg_choices[self.pkg]
+        del plan.pkg_deps[self.pkg]
 
 
 class add_hardref_op(base_op_state):
@@ -236,6 +258,7 @@ class replace_op(base_op_state):
         self.old_choices = old_choices
         del plan.pkg_choices[old]
         plan.pkg_choices[self.pkg] = self.choices
+        plan.pkg_deps[self.pkg] = self.deps
         plan.plan.append(self)
         plan.vdb_filter.add(old)
 
@@ -249,6 +272,7 @@ class replace_op(base_op_state):
                 "Internal error detected, unable to revert %s; got %s, "
                 "force_old=%s " % (self, l, self.force_old))
         del plan.pkg_choices[self.pkg]
+        del plan.pkg_deps[self.pkg]
         plan.pkg_choices[self.old_pkg] = self.old_choices
         plan.vdb_filter.remove(self.old_pkg)
 
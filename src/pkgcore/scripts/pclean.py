@@ -13,10 +13,9 @@ from snakeoil.demandload import demandload
 from snakeoil.mappings import DictMixin
 from snakeoil.strings import pluralism
 
-from pkgcore.ebuild.domain import domain as domain_cls
 from pkgcore.restrictions import boolean, packages
 from pkgcore.repository import multiplex
-from pkgcore.repository.util import get_virtual_repos
+from pkgcore.repository.util import get_virtual_repos, preload_cache
 from pkgcore.util.commandline import ArgumentParser, StoreRepoObject, convert_to_restrict
 
 demandload(
@@ -31,6 +30,7 @@ demandload(
     'snakeoil.sequences:iflatten_instance,split_negations',
     'pkgcore:fetch',
     'pkgcore.ebuild:atom@atom_mod',
+    'pkgcore.ebuild.domain:domain@domain_cls',
     'pkgcore.package:errors',
     'pkgcore.repository.util:SimpleTree',
     'pkgcore.util:parserestrict',
@@ -374,6 +374,7 @@ def _dist_validate_args(parser, namespace):
 
     # exclude distfiles for existing ebuilds or fetch restrictions
     if namespace.exclude_fetch_restricted or (namespace.exclude_exists and not namespace.restrict):
+        preload_cache(repo)
         for pkg in repo:
             exists_dist.update(iflatten_instance(getattr(pkg, '_raw_pkg', pkg).distfiles))
             if 'fetch' in pkg.restrict:
@@ -28,6 +28,16 @@ def main(options, out, err):
             (options.target,))
 
     source, target = options.source, options.target
+    if source.chf_type != target.chf_type:
+        argparser.error(
+            f"can't convert {source.chf_type} based cache entries "
+            f"to {target.chf_type} based entries")
+    missing = set(target.eclass_chf_types).difference(source.eclass_chf_types)
+    if missing:
+        argparser.error(
+            "source cache lacks eclass chksums required by the target: " +
+            ', '.join(sorted(missing)))
+
     if not target.autocommits:
         target.sync_rate = 1000
     if options.verbosity > 0:
@@ -37,11 +47,11 @@ def main(options, out, err):
     if options.verbosity > 0:
         for k, v in source.items():
             out.write(f"updating {k}")
-            target[k] = v
+            target[k] = source.export_entry(v)
             valid.add(k)
     else:
         for k, v in source.items():
-            target[k] = v
+            target[k] = source.export_entry(v)
             valid.add(k)
 
     for x in target.keys():
@@ -49,6 +59,7 @@ def main(options, out, err):
             if options.verbosity > 0:
                 out.write(f"deleting {x}")
             del target[x]
+    target.commit(force=True)
 
     if options.verbosity > 0:
         out.write("took %i seconds" % int(time.time() - start))
@@ -18,13 +18,13 @@ from snakeoil.demandload import demandload
 
 from pkgcore.config import errors, basics
 from pkgcore.ebuild import atom
-from pkgcore.plugin import get_plugins
 from pkgcore.util import commandline
 
 demandload(
     'textwrap',
     'traceback',
     'snakeoil.errors:dump_error',
+    'pkgcore.plugin:get_plugins',
 )
 
 
@@ -39,6 +39,7 @@ demandload(
     'snakeoil.sequences:iflatten_instance,unstable_unique',
     'pkgcore:fetch',
     'pkgcore.package:errors',
+    'pkgcore.repository.util:preload_cache',
     'pkgcore.restrictions:packages',
 )
 
@@ -166,6 +167,7 @@ class histo_data(arghparse.ArgparseCommand):
             position += 1
             out.write(out.bold, "repository", out.reset, ' ',
                       repr(repo_name), ':')
+            preload_cache(repo)
             data, repo_total = self.get_data(repo, opts)
             detail_data = self.transform_data_to_detail(data)
             if not opts.no_detail:
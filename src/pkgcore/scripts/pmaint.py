@@ -265,6 +265,15 @@ regen_opts.add_argument(
         option results in ~2x slower regeneration. Disable it only if you
         suspect the optimization is somehow causing issues.
     """)
+regen_opts.add_argument(
+    "--preload-eclasses", type=int, default=20, metavar='N',
+    help="number of eclasses to preload into ebuild processors",
+    docs="""
+        Number of the most commonly inherited eclasses, according to the
+        valid cache entries, that are preloaded into every ebuild processor
+        before regeneration starts. Other eclasses are cached as they're
+        inherited. Use 0 to disable preloading.
+    """)
 regen_opts.add_argument(
     "-t", "--threads", type=int,
     default=arghparse.DelayedValue(_get_default_jobs, 100),
@@ -273,6 +282,20 @@ regen_opts.add_argument(
         Number of threads to use for regeneration, defaults to using all
         available processors.
     """)
+regen_opts.add_argument(
+    "--engine", choices=("thread", "process"), default="thread",
+    help="parallelization method to use",
+    docs="""
+        Parallelization method used for regeneration. The default, thread,
+        runs all python-side work in a single process while only the bash
+        ebuild processors run in parallel. The process engine instead shards
+        packages across forked worker processes (see --threads for the
+        count), each with its own ebuild processors and cache writer, which
+        scales better on many-core systems.
+
+        The process engine requires a cache that writes entries individually
+        (e.g. flat_hash or md5-cache), other caches fall back to threads.
+    """)
 regen_opts.add_argument(
     "--force", action='store_true', default=False,
     help="force regeneration to occur regardless of staleness checks or repo settings")
@@ -300,9 +323,10 @@ def regen_main(options, out, err):
 
         start_time = time.time()
         ret.append(repo.operations.regen_cache(
-            threads=options.threads,
+            threads=options.threads, engine=options.engine,
             observer=observer.formatter_output(out), force=options.force,
-            eclass_caching=(not options.disable_eclass_caching)))
+            eclass_caching=(not options.disable_eclass_caching),
+            preload_eclasses=options.preload_eclasses))
         end_time = time.time()
 
         if options.verbosity > 0:
@@ -12,29 +12,36 @@ source or binary packages.
 # more should be doc'd...
 __all__ = ("AmbiguousQuery", "NoMatches")
 
+import argparse
 from functools import partial
+import importlib
 import sys
 from time import time
 
-from snakeoil.cli.exceptions import ExitException
 from snakeoil.demandload import demandload
 from snakeoil.sequences import iflatten_instance, stable_unique
 from snakeoil.strings import pluralism
 
-from pkgcore.ebuild import resolver, restricts
+from pkgcore.ebuild import restricts
 from pkgcore.ebuild.atom import atom
-from pkgcore.ebuild.misc import run_sanity_checks
 from pkgcore.merge import errors as merge_errors
 from pkgcore.operations import observer, format
 from pkgcore.repository.util import get_raw_repos
-from pkgcore.resolver.util import reduce_to_failures
 from pkgcore.restrictions import packages
 from pkgcore.restrictions.boolean import OrRestriction
 from pkgcore.util import commandline, parserestrict
 
 demandload(
     'textwrap:dedent',
+    'snakeoil.osutils:pjoin',
+    'pkgcore:const,os_data',
+    'pkgcore.ebuild:resolver',
+    'pkgcore.ebuild.misc:run_sanity_checks',
+    'pkgcore.operations.scheduler:FetchScheduler,MergeScheduler,op_dependencies',
+    'pkgcore.repository.match_cache:MatchCache',
     'pkgcore.repository.virtual:RestrictionRepo',
+    'pkgcore.resolver.profile:ResolverProfile',
+    'pkgcore.resolver.util:reduce_to_failures',
 )
 
 
@@ -115,6 +122,13 @@ resolution_options.add_argument(
         Only perform fetching of all targets from SRC_URI based on the current
         USE configuration.
     """)
+resolution_options.add_argument(
+    '--force-verify', action='store_true',
+    help="always verify the checksums of existing distfiles",
+    docs="""
+        Rehash existing distfiles to verify them against their checksums even
+        if they're recorded as already verified and haven't changed since.
+    """)
 resolution_options.add_argument(
     '-1', '--oneshot', action='store_true',
     help="do not record changes in the world file",
@@ -245,6 +259,60 @@ resolution_options.add_argument(
         to conflict with already installed dependencies that aren't involved in
         the graph of the requested operation.
     """)
+resolution_options.add_argument(
+    '--match-cache', action='store_true',
+    help="cache resolver repo queries across runs",
+    docs="""
+        Record the packages matched by the resolver's repo queries on disk
+        and reuse them in later runs while the repos and configuration are
+        unchanged, speeding up repeated resolutions of similar targets such
+        as regular world updates.
+    """)
+resolution_options.add_argument(
+    '--resolver-profile', type=argparse.FileType('w'), metavar='FILE',
+    help="write resolver statistics to a file",
+    docs="""
+        Record where time is spent during dependency resolution and write
+        the statistics to the given file as JSON once resolution finishes.
+
+        The report includes call counts and timings of the resolver's main
+        steps (e.g. matching, dependency and blocker processing, and
+        backtracking) and of each atom resolved, repo query counts and
+        timings along with the hit rates of the resolver's query caches, and
+        histograms of backtracking depths.
+    """)
+
+resolution_options.add_argument(
+    '-j', '--jobs', type=int, default=1,
+    help='number of packages to build concurrently',
+    docs="""
+        Build up to the given number of packages at the same time. Packages
+        are only built once the packages they depend on are merged and
+        merging is always done one package at a time. Defaults to 1.
+    """)
+resolution_options.add_argument(
+    '--load-average', type=float, metavar='LOAD',
+    help='limit concurrent builds based on the system load',
+    docs="""
+        Don't start further package builds while others are running and the
+        system load average is at or above the given value.
+    """)
+resolution_options.add_argument(
+    '--fetch-jobs', type=int, default=0, metavar='JOBS',
+    help='number of packages to fetch distfiles for concurrently',
+    docs="""
+        Fetch the distfiles for all packages to merge in the background as
+        soon as the plan is computed, using up to the given number of
+        concurrent fetches; builds only wait on their own distfiles. Defaults
+        to 0, fetching distfiles right before building each package.
+
+        Fetch restricted packages aren't handled in the background since
+        there's nothing to download for them, they're checked right before
+        building them instead.
+
+        The number of concurrent downloads from a single mirror can be
+        limited via FETCH_MIRROR_JOBS in make.conf.
+    """)
 
 output_options = argparser.add_argument_group("output options")
 output_options.add_argument(
@@ -482,6 +550,11 @@ def _validate(parser, namespace):
     elif namespace.nodeps and namespace.onlydeps:
         parser.error("-O/--nodeps cannot be used with -o/--onlydeps (it's a no-op)")
 
+    if namespace.jobs < 1:
+        parser.error(f"-j/--jobs must be a positive integer: {namespace.jobs}")
+    if namespace.fetch_jobs < 0:
+        parser.error(f"--fetch-jobs must be a non-negative integer: {namespace.fetch_jobs}")
+
     if namespace.sets:
         unknown_sets = set(namespace.sets).difference(namespace.config.pkgset)
         if unknown_sets:
@@ -680,6 +753,15 @@ def main(options, out, err):
         extra_kwargs['resolver_cls'] = resolver.empty_tree_merge_plan
     if options.debug:
         extra_kwargs['debug'] = True
+    if options.match_cache:
+        if os_data.uid in (os_data.root_uid, os_data.portage_uid):
+            cache_dir = const.SYSTEM_CACHE_PATH
+        else:
+            cache_dir = const.USER_CACHE_PATH
+        extra_kwargs['match_cache'] = MatchCache(
+            pjoin(cache_dir, 'match-cache'), domain.config_hash)
+    if options.resolver_profile is not None:
+        extra_kwargs['profile'] = ResolverProfile()
 
     # XXX: This should recurse on deep
     if options.newuse:
@@ -744,12 +826,16 @@ def main(options, out, err):
         failures.append(restrict)
         if not options.ignore_failures:
             break
-        out.write("restarting resolution")
+        out.write("resuming resolution")
+        # atoms resolved prior to the failure are kept
         atoms = [x for x in atoms if x != restrict]
-        resolver_inst.reset()
         ret = resolver_inst.add_atoms(atoms, finalize=True)
     resolve_time = time() - resolve_time
 
+    if options.resolver_profile is not None:
+        with options.resolver_profile as f:
+            resolver_inst.profile.dump(f)
+
     if failures:
         out.write()
         out.write('Failures encountered:')
@@ -884,65 +970,92 @@ def main(options, out, err):
         return
 
     change_count = len(changes)
+    op_index = {id(op): i for i, op in enumerate(changes)}
 
-    # left in place for ease of debugging.
-    cleanup = []
-    try:
-        for count, op in enumerate(changes):
-            for func in cleanup:
-                func()
+    def fetch(op):
+        """Fetch the distfiles for a pkg."""
+        pkg_ops = domain.pkg_operations(op.pkg, observer=build_obs)
+        return pkg_ops.run_if_supported("fetch", or_return=True), pkg_ops
 
-            cleanup = []
+    if options.force_verify:
+        domain.fetcher.force_verify = True
 
-            out.write(f"\nProcessing {count + 1} of {change_count}: "
-                      f"{op.pkg.cpvstr}::{op.pkg.repo}")
-            out.title(f"{count + 1}/{change_count}: {op.pkg.cpvstr}")
-            if op.desc != "remove":
-                cleanup.append(op.pkg.release_cached_data)
-
-                if not options.fetchonly and options.debug:
-                    out.write("Forcing a clean of workdir")
-
-                pkg_ops = domain.pkg_operations(op.pkg, observer=build_obs)
-                out.write(f"\n{len(op.pkg.distfiles)} file{pluralism(op.pkg.distfiles)} required-")
-                if not pkg_ops.run_if_supported("fetch", or_return=True):
-                    out.error(f"fetching failed for {op.pkg.cpvstr}")
-                    if not options.ignore_failures:
-                        return 1
-                    continue
-                if options.fetchonly:
-                    continue
-
-                buildop = pkg_ops.run_if_supported("build", or_return=None)
-                pkg = op.pkg
-                if buildop is not None:
-                    out.write(f"building {op.pkg.cpvstr}")
-                    result = False
-                    exc = None
-                    try:
-                        result = buildop.finalize()
-                    except format.BuildError as e:
-                        out.error(f"caught exception building {op.pkg.cpvstr}: {e}")
-                        exc = e
-                    else:
-                        if result is False:
-                            out.error(f"failed building {op.pkg.cpvstr}")
-                    if result is False:
-                        if not options.ignore_failures:
-                            raise ExitException(1) from exc
-                        continue
-                    pkg = result
-                    cleanup.append(pkg.release_cached_data)
-                    pkg_ops = domain.pkg_operations(pkg, observer=build_obs)
-                    cleanup.append(buildop.cleanup)
-
-                cleanup.append(partial(pkg_ops.run_if_supported, "cleanup"))
-                pkg = pkg_ops.run_if_supported("localize", or_return=pkg)
-                # wipe this to ensure we don't inadvertantly use it further down;
-                # we aren't resetting it after localizing, so could have the wrong
-                # set of ops.
-                del pkg_ops
+    def background_fetch(op):
+        """Fetch the distfiles for a pkg unless it's fetch restricted.
+
+        Fetch restricted pkgs have nothing to download while failing to fetch
+        them runs pkg_nofetch via ebd, so they're left to their builds.
+        """
+        if 'fetch' in op.pkg.restrict:
+            return None
+        return fetch(op)
 
+    if options.fetch_jobs:
+        fetcher = FetchScheduler(changes, background_fetch, jobs=options.fetch_jobs)
+    else:
+        fetcher = None
+
+    def build(op):
+        """Fetch, build, and localize a pkg for merging."""
+        cleanup = []
+        if op.desc == "remove":
+            return op.pkg, cleanup
+
+        count = op_index[id(op)]
+        out.write(f"\nProcessing {count + 1} of {change_count}: "
+                  f"{op.pkg.cpvstr}::{op.pkg.repo}")
+        out.title(f"{count + 1}/{change_count}: {op.pkg.cpvstr}")
+        cleanup.append(op.pkg.release_cached_data)
+
+        if not options.fetchonly and options.debug:
+            out.write("Forcing a clean of workdir")
+
+        out.write(f"\n{len(op.pkg.distfiles)} file{pluralism(op.pkg.distfiles)} required-")
+        result = fetcher.result(op) if fetcher is not None else None
+        if result is None:
+            result = fetch(op)
+        fetched, pkg_ops = result
+        if not fetched:
+            out.error(f"fetching failed for {op.pkg.cpvstr}")
+            for func in cleanup:
+                func()
+            return False
+        if options.fetchonly:
+            return None, cleanup
+
+        buildop = pkg_ops.run_if_supported("build", or_return=None)
+        pkg = op.pkg
+        if buildop is not None:
+            out.write(f"building {op.pkg.cpvstr}")
+            result = False
+            try:
+                result = buildop.finalize()
+            except format.BuildError as e:
+                out.error(f"caught exception building {op.pkg.cpvstr}: {e}")
+            else:
+                if result is False:
+                    out.error(f"failed building {op.pkg.cpvstr}")
+            if result is False:
+                for func in cleanup:
+                    func()
+                return False
+            pkg = result
+            cleanup.append(pkg.release_cached_data)
+            pkg_ops = domain.pkg_operations(pkg, observer=build_obs)
+            cleanup.append(buildop.cleanup)
+
+        cleanup.append(partial(pkg_ops.run_if_supported, "cleanup"))
+        pkg = pkg_ops.run_if_supported("localize", or_return=pkg)
+        return pkg, cleanup
+
+    def merge(op, build_result):
+        """Merge a built pkg, updating the world file as necessary."""
+        pkg, cleanup = build_result
+        try:
+            if pkg is None:
+                # fetch only
+                return True
+            if op.desc != "remove":
                 out.write()
                 if op.desc == "replace":
                     if op.old_pkg == pkg:
@@ -954,25 +1067,14 @@ def main(options, out, err):
                 else:
                     out.write(f">>> Installing {pkg.cpvstr}")
                     i = domain.install_pkg(pkg, repo_obs)
-
-                # force this explicitly- can hold onto a helluva lot more
-                # then we would like.
             else:
                 out.write(f">>> Removing {op.pkg.cpvstr}")
                 i = domain.uninstall_pkg(op.pkg, repo_obs)
             try:
-                ret = i.finish()
+                i.finish()
             except merge_errors.BlockModification as e:
                 out.error(f"Failed to merge {op.pkg}: {e}")
-                if not options.ignore_failures:
-                    return 1
-                continue
-
-            # while this does get handled through each loop, wipe it now; we don't need
-            # that data, thus we punt it now to keep memory down.
-            # for safety sake, we let the next pass trigger a release also-
-            # mainly to protect against any code following triggering reloads
-            # basically, be protective
+                return False
 
             if world_set is not None:
                 if op.desc == "remove":
@@ -986,25 +1088,31 @@ def main(options, out, err):
                         add_pkg = slotatom_if_slotted(
                             source_repos.combined, op.pkg.versioned_atom)
                         update_worldset(world_set, add_pkg)
+            return True
+        finally:
+            # release cached data as soon as possible, it can hold onto a
+            # lot more than we would like.
+            for func in cleanup:
+                func()
 
-
-#    again... left in place for ease of debugging.
-#    except KeyboardInterrupt:
-#        import pdb;pdb.set_trace()
-#    else:
-#        import pdb;pdb.set_trace()
+    if options.jobs > 1:
+        # ebd registers its signal handlers on import which fails outside the
+        # main thread, make sure that's done before builds run in threads
+        importlib.import_module('pkgcore.ebuild.processor')
+    scheduler = MergeScheduler(
+        changes, build, merge, jobs=options.jobs, load_average=options.load_average,
+        deps=op_dependencies(changes, resolver_inst.state.pkg_deps))
+    if fetcher is not None:
+        fetcher.start()
+    try:
+        success = scheduler.run(ignore_failures=options.ignore_failures)
     finally:
-        pass
-
-    # the final run from the loop above doesn't invoke cleanups;
-    # we could ignore it, but better to run it to ensure nothing is
-    # inadvertantly held on the way out of this function.
-    # makes heappy analysis easier if we're careful about it.
-    for func in cleanup:
-        func()
-
-    # and wipe the reference to the functions to allow things to fall out of
-    # memory.
-    cleanup = []
+        if fetcher is not None:
+            fetcher.shutdown()
+    if not success:
+        for op in scheduler.skipped:
+            out.error(f"skipped {op.pkg.cpvstr} due to failed dependencies")
+        if not options.ignore_failures:
+            return 1
 
     return 0
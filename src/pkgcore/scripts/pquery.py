@@ -23,8 +23,7 @@ from snakeoil.cli import arghparse
 from snakeoil.demandload import demandload
 from snakeoil.formatters import decorate_forced_wrapping
 
-from pkgcore.ebuild import conditionals, atom
-from pkgcore.repository.util import get_raw_repos, get_virtual_repos
+from pkgcore.ebuild import atom
 from pkgcore.restrictions import packages, values, boolean
 from pkgcore.util import commandline, parserestrict, packages as pkgutils
 
@@ -34,8 +33,10 @@ demandload(
     're',
     'snakeoil.osutils:sizeof_fmt',
     'snakeoil.sequences:iter_stable_unique',
+    'pkgcore.ebuild:conditionals',
     'pkgcore.fs:fs@fs_module,contents@contents_module',
     'pkgcore.repository:multiplex',
+    'pkgcore.repository.util:get_raw_repos,get_virtual_repos,preload_cache',
 )
 
 
@@ -103,6 +104,7 @@ printable_attrs += (
     'fullver',
     'longdescription',
     'maintainers',
+    'masked',
     'package',
     'path',
     'raw_alldepends',
@@ -117,7 +119,6 @@ printable_attrs = tuple(sorted(set(printable_attrs)))
 
 def stringify_attr(config, pkg, attr):
     """Grab a package attr and convert it to a string."""
-    # config is currently unused but may affect display in the future.
     if attr in ('files', 'uris'):
         data = get_pkg_attr(pkg, 'fetchables')
         if data is None:
@@ -138,6 +139,13 @@ def stringify_attr(config, pkg, attr):
         result = sorted(iuse & use) + sorted('-' + val for val in (iuse - use))
         return ' '.join(result)
 
+    if attr == 'masked':
+        # reuse the verdict cached while filtering the repos
+        reasons = config.domain.mask_reasons(pkg)
+        if reasons is None:
+            return 'MISSING'
+        return ' '.join(reasons)
+
     value = get_pkg_attr(pkg, attr)
     if value is None:
         return 'MISSING'
@@ -1013,6 +1021,9 @@ def main(options, out, err):
     if options.query is None:
         return 0
     for repo in options.repos:
+        if options.query is packages.AlwaysTrue:
+            # validate all cache entries in bulk when matching everything
+            preload_cache(repo)
         try:
             for pkgs in pkgutils.groupby_pkg(repo.itermatch(options.query, sorter=sorted)):
                 pkgs = list(pkgs)
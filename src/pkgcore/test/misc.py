@@ -3,6 +3,8 @@
 
 # misc things useful for tests.
 
+import os
+
 from snakeoil.mappings import AttrAccessible
 
 from pkgcore import plugin
@@ -66,6 +68,8 @@ class FakeProfile(object):
 
 class FakeRepo(object):
 
+    livefs = False
+
     def __init__(self, pkgs=(), repo_id='', location='', masks=(), **kwds):
         self.pkgs = pkgs
         self.repo_id = repo_id or location
@@ -224,3 +228,9 @@ def mk_glsa(*pkgs, **kwds):
                 '\n'.join(convert_range(x, 'unaffected', slot) for x in ranges[0]),
                 '\n'.join(convert_range(x, 'vulnerable', slot) for x in ranges[1]))
     return glsa_template % (id, id, horked)
+
+
+def backdate(path, secs=60):
+    """Move the mtime of a path into the past, e.g. out of a cache's racy window."""
+    st = os.stat(path)
+    os.utime(path, (st.st_atime - secs, st.st_mtime - secs))
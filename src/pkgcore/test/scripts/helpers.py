@@ -5,9 +5,13 @@
 """Helpers for testing scripts."""
 
 import argparse
+import os
+import subprocess
+import sys
 
 from snakeoil.test import argparse_helpers
 
+import pkgcore
 from pkgcore.config import central, basics, ConfigHint
 
 
@@ -57,3 +61,33 @@ class ArgParseMixin(argparse_helpers.ArgParseMixin):
     def assertOutAndErr(self, *args, **kwargs):
         options = argparse_helpers.ArgParseMixin.assertOutAndErr(self, *args, **kwargs)
         return options.config
+
+
+def import_times(module):
+    """Import a module in a fresh interpreter and return its ``-X importtime`` tree.
+
+    Modules imported during interpreter startup are skipped.
+
+    :param module: name of the module to import
+    :return: list of (module name, self time, cumulative time, depth) tuples in
+        import order with times in microseconds
+    """
+    env = os.environ.copy()
+    # make sure the same pkgcore install is used
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(pkgcore.__path__[0])] + env.get('PYTHONPATH', '').split(os.pathsep))
+    code = (
+        "import sys; sys.stderr.write('-- startup done\\n'); sys.stderr.flush(); "
+        f"import {module}")
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True).stderr.decode()
+    _startup, _sep, output = stderr.partition('-- startup done\n')
+    times = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((name.strip(), int(self_time), int(cumulative), depth))
+    return times
@@ -20,6 +20,7 @@ __all__ = (
 import argparse
 from functools import partial
 from importlib import import_module
+from importlib.util import find_spec
 import os
 import sys
 
@@ -535,6 +536,12 @@ def store_config(namespace, attr, global_config=()):
     setattr(namespace, attr, config)
 
 
+def _store_plugins_config(project, namespace, attr):
+    """Store the config using the global config plugins of a project."""
+    plugins = import_module('.plugins', project)
+    store_config(namespace, attr, global_config=get_plugins('global_config', plugins))
+
+
 def _mk_domain(parser):
     parser.add_argument(
         '--domain', get_default=True, config_type='domain',
@@ -588,13 +595,10 @@ class ArgumentParser(arghparse.ArgumentParser):
                     project = __name__.split('.')[0]
 
                 # TODO: figure out a better method for plugin registry/loading
-                try:
-                    plugins = import_module('.plugins', project)
-                    global_config = get_plugins('global_config', plugins)
+                if find_spec(f'{project}.plugins') is not None:
+                    # plugins are only loaded when the config is requested
                     self.set_defaults(config=arghparse.DelayedValue(
-                        partial(store_config, global_config=global_config)))
-                except ImportError:
-                    pass
+                        partial(_store_plugins_config, project)))
 
             if domain:
                 _mk_domain(config_opts)
@@ -24,6 +24,7 @@ demandload(
     'pkgcore.log:logger',
     "pkgcore.package:base@pkg_base",
     'pkgcore.vdb:repo_ops',
+    'pkgcore.vdb.snapshot:VdbSnapshot',
     'pkgcore.vdb.contents:ContentsFile',
 )
 
@@ -83,6 +84,10 @@ class tree(prototype.tree):
         finally:
             pass
 
+    def _generation_paths(self):
+        # category dirs change when pkgs are merged or unmerged
+        return [self.location] + [pjoin(self.location, x) for x in self.categories]
+
     def _get_packages(self, category):
         cpath = pjoin(self.location, category.lstrip(os.path.sep))
         l = set()
@@ -141,14 +146,34 @@ class tree(prototype.tree):
         "source_repository": "repository", "fullslot": "SLOT",
     }
 
+    @klass.jit_attr
+    def _snapshot(self):
+        if self.cache_location is None:
+            return None
+        return VdbSnapshot(pjoin(self.cache_location, 'snapshot'))
+
     def _get_metadata(self, pkg):
+        cpvstr = f"{pkg.category}/{pkg.package}-{pkg.fullver}"
+        path = pjoin(self.location, cpvstr)
+        snapshot = None
+        if self._snapshot is not None:
+            snapshot = self._snapshot.get(cpvstr, path)
         return IndeterminantDict(
-            partial(self._internal_load_key, pjoin(
-                self.location, pkg.category,
-                f"{pkg.package}-{pkg.fullver}")))
+            partial(self._internal_load_key, path, snapshot=snapshot))
 
-    def _internal_load_key(self, path, key):
+    def _internal_load_key(self, path, key, snapshot=None):
         key = self._metadata_rewrites.get(key, key)
+        if snapshot is not None:
+            if key == 'repo':
+                data = snapshot.get('repository', snapshot.get('REPOSITORY'))
+                if data is None:
+                    raise KeyError(key)
+                return data
+            elif key in VdbSnapshot.keys:
+                data = snapshot.get(key)
+                if data is None:
+                    raise KeyError((path, key))
+                return data
         if key == "contents":
             data = ContentsFile(pjoin(path, "CONTENTS"), mutable=True)
         elif key == "environment":
@@ -34,6 +34,12 @@ def update_mtime(path, timestamp=None):
         logger.error(f"failed updated vdb timestamp for {path!r}: {e}")
 
 
+def update_snapshot(repo):
+    snapshot = repo._snapshot
+    if snapshot is not None:
+        snapshot.refresh(repo.location)
+
+
 class install(repo_ops.install):
 
     def __init__(self, repo, newpkg, observer):
@@ -121,6 +127,7 @@ class install(repo_ops.install):
     def finalize_data(self):
         os.rename(self.tmp_write_path, self.install_path)
         update_mtime(self.repo.location)
+        update_snapshot(self.repo)
         return True
 
 
@@ -138,6 +145,7 @@ class uninstall(repo_ops.uninstall):
         update_mtime(self.repo.location)
         shutil.rmtree(self.remove_path)
         update_mtime(self.repo.location)
+        update_snapshot(self.repo)
         return True
 
 
@@ -177,4 +185,5 @@ class operations(repo_ops.operations):
 
     def _cmd_api_regen_cache(self, *args, **kwargs):
         # disable threaded cache updates
-        super()._cmd_api_regen_cache(*args, threads=1, **kwargs)
+        kwargs.update(threads=1, engine='thread')
+        super()._cmd_api_regen_cache(*args, **kwargs)
@@ -0,0 +1,148 @@
+# License: GPL2/BSD
+
+"""
+compact snapshot of installed pkg metadata
+
+Loading the installed pkgs for resolution reads a number of small files from
+each pkg's vdb entry, which adds up to thousands of reads on regular systems.
+The snapshot stores the metadata used during resolution for all installed pkgs
+in a single file that is refreshed by the vdb operations on every install and
+uninstall so it can be read in one shot instead.
+
+Entries are tied to the mtime and inode of the pkg's vdb directory along with
+the mtimes, ctimes, and sizes of the metadata files read from it. Pkgs that
+were modified since, e.g. by other package managers replacing or rewriting
+their metadata files, fall back to reading their vdb entry directly. Checking
+an entry only requires statting its files instead of reading them.
+"""
+
+__all__ = ("VdbSnapshot",)
+
+import os
+
+from snakeoil.fileutils import readfile
+from snakeoil.osutils import listdir_dirs, pjoin
+
+from pkgcore.cache.stamped import StampedCache
+
+
+class VdbSnapshot(StampedCache):
+    """On-disk snapshot of the metadata of installed pkgs.
+
+    Entries map ``category/PF`` to the stamp of the pkg's vdb directory and
+    metadata files, and the contents of those files; files that don't exist
+    are omitted.
+
+    :ivar keys: vdb metadata files stored in the snapshot
+    """
+
+    format_version = 2
+    description = 'vdb snapshot'
+    keys = frozenset((
+        'BDEPEND', 'DEPEND', 'RDEPEND', 'PDEPEND', 'EAPI', 'SLOT', 'USE', 'IUSE',
+        'REQUIRED_USE', 'KEYWORDS', 'LICENSE', 'PROPERTIES', 'RESTRICT',
+        'INHERITED', 'DEFINED_PHASES', 'CHOST', 'CBUILD', 'CTARGET',
+        # source repo, stored differently by various package managers
+        'repository', 'REPOSITORY', 'REPO',
+    ))
+
+    @staticmethod
+    def _decode_entries(entries):
+        return {
+            k: (tuple(stamp), metadata)
+            for k, (stamp, metadata) in entries.items()}
+
+    @staticmethod
+    def _encode_entries(entries):
+        return {
+            k: [list(stamp), metadata]
+            for k, (stamp, metadata) in entries.items()}
+
+    @staticmethod
+    def _stamp(path, keys):
+        """Return the stamp of a vdb entry and the given metadata files in it."""
+        try:
+            st = os.stat(path)
+            stamp = [st.st_mtime_ns, st.st_ino]
+            for key in sorted(keys):
+                # the ctime catches files rewritten in place with their
+                # mtime restored
+                st = os.stat(pjoin(path, key))
+                stamp.extend((st.st_mtime_ns, st.st_ctime_ns, st.st_size))
+        except FileNotFoundError:
+            return None
+        return tuple(stamp)
+
+    def get(self, cpvstr, path):
+        """Return the snapshot metadata of an installed pkg.
+
+        :param cpvstr: ``category/PF`` of the pkg
+        :param path: location of the pkg's vdb directory
+        :return: mapping of metadata file names to their contents, None if
+            the pkg isn't in the snapshot or was modified since
+        """
+        entry = self.entries.get(cpvstr)
+        if entry is None:
+            return None
+        stamp, metadata = entry
+        if self._stamp(path, metadata) != stamp:
+            return None
+        return metadata
+
+    def _read(self, path):
+        """Return the stamp and metadata of a vdb entry, None if it's missing."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = [st.st_mtime_ns, st.st_ino]
+        metadata = {}
+        for key in sorted(self.keys):
+            filepath = pjoin(path, key)
+            # stamp files before reading them so changes in between are
+            # caught by the next check
+            try:
+                st = os.stat(filepath)
+            except FileNotFoundError:
+                continue
+            data = readfile(filepath, True)
+            if data is not None:
+                metadata[key] = data
+                stamp.extend((st.st_mtime_ns, st.st_ctime_ns, st.st_size))
+        return tuple(stamp), metadata
+
+    def refresh(self, location):
+        """Update the snapshot to match the pkgs installed in a vdb and write it.
+
+        Only pkgs that were added or modified since they were last recorded
+        are read.
+
+        :param location: location of the vdb
+        """
+        entries = self.entries
+        with self._lock:
+            current = {}
+            try:
+                categories = [
+                    x for x in listdir_dirs(location) if not x.startswith('.')]
+            except FileNotFoundError:
+                categories = []
+            for category in categories:
+                cpath = pjoin(location, category)
+                try:
+                    pkgs = listdir_dirs(cpath)
+                except FileNotFoundError:
+                    continue
+                for pf in pkgs:
+                    if pf.startswith(('.tmp.', '-MERGING-')) or pf.endswith('.lockfile'):
+                        continue
+                    cpvstr = f'{category}/{pf}'
+                    path = pjoin(cpath, pf)
+                    entry = entries.get(cpvstr)
+                    if entry is None or self._stamp(path, entry[1]) != entry[0]:
+                        entry = self._read(path)
+                        if entry is None:
+                            continue
+                    current[cpvstr] = entry
+            self._entries = current
+            self._write()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Microbenchmark comparing CPV sorting via version keys and ver_cmp().
+
+Run with pkgcore importable, e.g. ``PYTHONPATH=src python tests/benchmarks/bench_cpv.py``.
+"""
+
+from functools import cmp_to_key
+import random
+import timeit
+
+from pkgcore.ebuild import cpv
+
+
+def generate_pkgs(count):
+    rand = random.Random(0)
+    pkgs = []
+    for _ in range(count):
+        ver = '.'.join(str(rand.randint(0, 20)) for _ in range(rand.randint(1, 4)))
+        if rand.random() < 0.2:
+            ver += rand.choice('abc')
+        if rand.random() < 0.3:
+            ver += rand.choice(('_alpha', '_beta', '_pre', '_rc', '_p')) + str(rand.randint(0, 5))
+        if rand.random() < 0.3:
+            ver += f'-r{rand.randint(1, 3)}'
+        pkgs.append(cpv.CPV(f'dev-util/bench-{ver}', versioned=True))
+    return pkgs
+
+
+def ver_cmp(x, y):
+    return cpv.native_ver_cmp(x.version, x.revision, y.version, y.revision)
+
+
+def main(count=2000, repeat=5, number=10):
+    pkgs = generate_pkgs(count)
+    ver_cmp_key = cmp_to_key(ver_cmp)
+
+    def sort_ver_cmp():
+        sorted(pkgs, key=ver_cmp_key)
+
+    def sort_version_key():
+        sorted(pkgs, key=lambda x: x.version_key)
+
+    def sort_fresh_version_key():
+        # includes generating the keys for new, unsorted pkgs
+        sorted(generate_pkgs(count), key=lambda x: x.version_key)
+
+    def sort_fresh_ver_cmp():
+        sorted(generate_pkgs(count), key=ver_cmp_key)
+
+    for name, func in (
+            ('native_ver_cmp()', sort_ver_cmp),
+            ('cached version_key', sort_version_key),
+            ('native_ver_cmp() + new pkgs', sort_fresh_ver_cmp),
+            ('version_key + new pkgs', sort_fresh_version_key)):
+        best = min(timeit.repeat(func, repeat=repeat, number=number)) / number
+        print(f'{name:>30}: {best * 1000:.2f} ms per sort of {count} pkgs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Benchmark comparing the env transfer modes of the ebuild daemon.
+
+Sends a large, multilib-like env to a running daemon using both the framed
+transfer mode and the bash export statements, inline and through a file.
+
+Run with pkgcore importable, e.g.
+``PYTHONPATH=src python tests/benchmarks/bench_env_transfer.py``.
+"""
+
+import random
+import tempfile
+import timeit
+
+from pkgcore.ebuild import processor
+
+
+def generate_env(count):
+    rand = random.Random(0)
+    flags = [f'flag{i}' for i in range(1000)]
+    env = {
+        'USE': ' '.join(rand.sample(flags, 400)),
+        'IUSE': ' '.join(rand.sample(flags, 200)),
+        'PYTHON_TARGETS': 'python3_6 python3_7 python3_8',
+        'MULTILIB_ABIS': 'amd64 x86 x32',
+        'MULTIBUILD_VARIANTS': ['amd64', 'x86', 'x32'],
+        'CFLAGS': "-O2 -pipe -march=native -DFOO='\"bar\"'",
+    }
+    for i in range(count):
+        kind = rand.random()
+        if kind < 0.4:
+            value = str(rand.randint(0, 1000))
+        elif kind < 0.8:
+            value = ' '.join(rand.sample(flags, rand.randint(1, 30)))
+        elif kind < 0.9:
+            value = f"it's a \"quoted\" value with $vars and\nnewlines {i}"
+        else:
+            value = [f'/usr/lib{i}/path {x}' for x in range(rand.randint(1, 10))]
+        env[f'VAR_{i}'] = value
+    return env
+
+
+def transfer(ebp, env, mode, tmpdir=None):
+    ebp.env_transfer = mode
+    ebp.write('process_ebuild pretend')
+    assert ebp.send_env(env, tmpdir=tmpdir)
+    ebp.write('shutdown_daemon')
+    assert ebp.expect('phases succeeded')
+
+
+def main(count=500, repeat=5, number=20):
+    env = generate_env(count)
+    ebp = processor.request_ebuild_processor(userpriv=False, sandbox=False)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, func in (
+                    ('framed', lambda: transfer(ebp, env, 'framed')),
+                    ('export', lambda: transfer(ebp, env, 'export')),
+                    ('export file', lambda: transfer(ebp, env, 'export', tmpdir))):
+                best = min(timeit.repeat(func, repeat=repeat, number=number)) / number
+                print(f'{name:>15}: {best * 1000:.2f} ms per transfer of {len(env)} vars')
+    finally:
+        processor.release_ebuild_processor(ebp)
+
+
+if __name__ == '__main__':
+    main()
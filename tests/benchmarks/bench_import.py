@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Benchmark of the cold import time of the commandline scripts.
+
+Imports each script module, including building its argparser, in a fresh
+interpreter using ``-X importtime`` and reports the best total time along with
+the modules taking the most time to import.
+
+Run with pkgcore importable, e.g.
+``PYTHONPATH=src python tests/benchmarks/bench_import.py [script ...]``.
+"""
+
+import pkgutil
+import sys
+
+from pkgcore import scripts
+from pkgcore.test.scripts.helpers import import_times
+
+
+def main(names=(), repeat=5, top=5):
+    if not names:
+        names = sorted(x.name for x in pkgutil.iter_modules(scripts.__path__))
+    for name in names:
+        runs = [import_times(f'pkgcore.scripts.{name}') for _ in range(repeat)]
+        best = min(runs, key=lambda x: sum(t[1] for t in x))
+        total = sum(t[1] for t in best)
+        print(f'{name:>13}: {total / 1000:.2f} ms, {len(best)} modules')
+        for module, self_time, cumulative, depth in sorted(best, key=lambda x: -x[1])[:top]:
+            print(f'{"":>15}{self_time / 1000:6.2f} ms (cumulative {cumulative / 1000:6.2f} ms) {module}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark comparing repo queries with and without the persistent match cache.
+
+Generates an ebuild repo with a populated md5-cache and matches slotted atoms
+for all its packages, as the resolver does, using a fresh repo instance per
+run so pkg instances and their metadata aren't reused across runs. Both
+pulling only the best match and pulling all matches are timed.
+
+Run with pkgcore importable, e.g.
+``PYTHONPATH=src python tests/benchmarks/bench_match_cache.py``.
+"""
+
+import os
+import tempfile
+import time
+
+from snakeoil.chksum import LazilyHashedPath
+from snakeoil.osutils import ensure_dirs, pjoin
+
+from pkgcore.cache import flat_hash
+from pkgcore.ebuild import eclass_cache, repository
+from pkgcore.ebuild.atom import atom
+from pkgcore.repository.match_cache import MatchCache
+from pkgcore.repository.misc import caching_repo
+
+
+def highest(pkgs):
+    return sorted(pkgs, reverse=True)
+
+
+def generate_repo(path, packages, versions):
+    for d in ('eclass', 'profiles', 'metadata'):
+        ensure_dirs(pjoin(path, d))
+    with open(pjoin(path, 'metadata', 'layout.conf'), 'w') as f:
+        f.write('masters =\n')
+    with open(pjoin(path, 'profiles', 'repo_name'), 'w') as f:
+        f.write('bench\n')
+    cache = flat_hash.md5_cache(path)
+    for i in range(packages):
+        pkg_dir = pjoin(path, 'cat', f'pkg{i}')
+        ensure_dirs(pkg_dir)
+        for v in range(versions):
+            ebuild = pjoin(pkg_dir, f'pkg{i}-1.{v}.ebuild')
+            with open(ebuild, 'w') as f:
+                f.write('EAPI=7\nSLOT="0"\n')
+            cache[f'cat/pkg{i}-1.{v}'] = {
+                'EAPI': '7', 'SLOT': '0', '_chf_': LazilyHashedPath(ebuild)}
+    # keep the repo out of the match cache's racy window
+    for root, dirs, files in os.walk(path):
+        os.utime(root, (time.time() - 60, time.time() - 60))
+
+
+def mk_repo(path):
+    return repository.UnconfiguredTree(
+        path, eclass_cache=eclass_cache.cache(pjoin(path, 'eclass')),
+        cache=(flat_hash.md5_cache(path),))
+
+
+def run(path, atoms, cache_path=None, best=False):
+    repo = mk_repo(path)
+    match_cache = MatchCache(cache_path) if cache_path is not None else None
+    start = time.perf_counter()
+    queries = caching_repo(repo, highest, match_cache=match_cache)
+    for a in atoms:
+        matches = queries.match(a)
+        if best:
+            matches[0]
+        else:
+            len(matches)
+    elapsed = time.perf_counter() - start
+    if match_cache is not None:
+        match_cache.flush()
+    return elapsed
+
+
+def main(packages=200, versions=20, repeat=5):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = pjoin(tmpdir, 'repo')
+        generate_repo(path, packages, versions)
+        atoms = [atom(f'>=cat/pkg{i}-1:0') for i in range(packages)]
+        for best in (True, False):
+            cache_path = pjoin(tmpdir, f'match-cache-{best}')
+            # populate the cache
+            run(path, atoms, cache_path, best)
+            uncached = min(run(path, atoms, best=best) for _ in range(repeat))
+            cached = min(run(path, atoms, cache_path, best) for _ in range(repeat))
+            desc = 'best match' if best else 'all matches'
+            print(f'{desc:>12}: uncached {uncached * 1000:.1f} ms, '
+                  f'cached {cached * 1000:.1f} ms '
+                  f'({len(atoms)} atoms, {versions} versions each)')
+
+
+if __name__ == '__main__':
+    main()
@@ -193,3 +193,58 @@ class TestBulk(BaseTest):
         # write a key outside of known keys
         db["dar"] = {"foo2":"dar"}
         assert list(db["dar"].items()) == []
+
+
+class TestValidateEntries(TestCase):
+
+    class ChfDictCache(DictCache):
+        # keep the chksum data around
+        __getitem__ = base.__getitem__
+
+        def _getitem(self, cpv):
+            d = dict(self._data[cpv].items())
+            d[self._chf_key] = self._chf_deserializer(d[self._chf_key])
+            return d
+
+    class eclass_db(object):
+
+        def __init__(self):
+            self.calls = 0
+
+        def rebuild_cache_entry(self, entry_eclasses):
+            self.calls += 1
+            d = {}
+            for eclass, chfs in entry_eclasses:
+                if dict(chfs)['mtime'] != 1:
+                    return None
+                d[eclass] = _mk_chf_obj(mtime=1)
+            return d
+
+    def test_validate_entries(self):
+        db = self.ChfDictCache(auxdbkeys=("foo", "_eclasses_"))
+        good = {'foo': _mk_chf_obj(mtime=1)}
+        bad = {'foo': _mk_chf_obj(mtime=2)}
+        db['cat/a-1'] = {'foo': 'a', '_eclasses_': good}
+        db['cat/a-2'] = {'foo': 'a', '_eclasses_': good}
+        db['cat/b-1'] = {'foo': 'b', '_eclasses_': bad}
+        db['cat/c-1'] = {'foo': 'c'}
+        db['cat/d-1'] = {'foo': 'd'}
+
+        ebuild_hashes = {
+            'cat/a-1': _chf_obj, 'cat/a-2': _chf_obj, 'cat/b-1': _chf_obj,
+            'cat/c-1': _chf_obj, 'cat/d-1': _mk_chf_obj(mtime=200),
+            'cat/e-1': _chf_obj,
+        }
+        eclass_db = self.eclass_db()
+        valid, stale = db.validate_entries(ebuild_hashes, eclass_db)
+        assert sorted(valid) == ['cat/a-1', 'cat/a-2', 'cat/c-1']
+        assert sorted(stale) == ['cat/b-1', 'cat/d-1', 'cat/e-1']
+        assert list(valid['cat/a-1']['_eclasses_']) == ['foo']
+        # eclass checks are only run once per eclass set
+        assert eclass_db.calls == 2
+
+        # results can be shared across calls
+        results = {}
+        db.validate_entries({'cat/a-1': _chf_obj}, eclass_db, results)
+        db.validate_entries({'cat/a-2': _chf_obj}, eclass_db, results)
+        assert eclass_db.calls == 3
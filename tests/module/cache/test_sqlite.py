@@ -0,0 +1,99 @@
+import os
+
+import pytest
+from snakeoil.chksum import LazilyHashedPath
+from snakeoil.osutils import pjoin
+from snakeoil.test.mixins import TempDirMixin
+
+from pkgcore.cache import errors, flat_hash, sqlite
+
+from . import test_base
+from .test_util import GenericCacheMixin
+
+
+class db(sqlite.database):
+
+    def __setitem__(self, cpv, data):
+        data['_chf_'] = test_base._chf_obj
+        return sqlite.database.__setitem__(self, cpv, data)
+
+    def __getitem__(self, cpv):
+        d = dict(sqlite.database.__getitem__(self, cpv).items())
+        d.pop(f'_{self.chf_type}_', None)
+        return d
+
+
+class TestSqlite(GenericCacheMixin, TempDirMixin):
+
+    def get_db(self, readonly=False):
+        return db(pjoin(self.dir, 'cache.sqlite'),
+            auxdbkeys=self.cache_keys, readonly=readonly)
+
+    def test_roundtrip(self):
+        cache = self.get_db()
+        cache['cat/pkg-1'] = {'SLOT': '0', 'KEYWORDS': 'x86 amd64'}
+        cache['cat/pkg-2'] = {'SLOT': '1'}
+        cache.commit()
+        cache = self.get_db(readonly=True)
+        self.assertEqual(sorted(cache.keys()), ['cat/pkg-1', 'cat/pkg-2'])
+        self.assertEqual(len(cache), 2)
+        self.assertIn('cat/pkg-1', cache)
+        self.assertNotIn('cat/pkg-3', cache)
+        self.assertEqual(cache['cat/pkg-1'], {'SLOT': '0', 'KEYWORDS': 'x86 amd64'})
+        self.assertRaises(KeyError, cache.__getitem__, 'cat/pkg-3')
+
+        cache = self.get_db()
+        del cache['cat/pkg-1']
+        self.assertRaises(KeyError, cache.__delitem__, 'cat/pkg-1')
+        self.assertEqual(list(cache.keys()), ['cat/pkg-2'])
+
+    def test_missing_readonly(self):
+        cache = self.get_db(readonly=True)
+        self.assertEqual(list(cache.keys()), [])
+        self.assertEqual(len(cache), 0)
+        self.assertRaises(KeyError, cache.__getitem__, 'cat/pkg-1')
+        self.assertFalse(os.path.exists(cache.location))
+
+    def test_incompatible_format(self):
+        cache = sqlite.md5_cache(self.dir)
+        cache['cat/pkg-1'] = {'SLOT': '0', '_chf_': LazilyHashedPath('', md5=1)}
+        cache.commit()
+        # different chksum types can't be read...
+        with pytest.raises(errors.InitializationError):
+            sqlite.database(cache.location, readonly=True)
+        # ...and are wiped when writable
+        cache = sqlite.database(cache.location)
+        self.assertEqual(list(cache.keys()), [])
+
+
+class TestMd5Conversion(TempDirMixin):
+
+    def test_clone(self):
+        eclassdir = pjoin(self.dir, 'eclass')
+        os.mkdir(eclassdir)
+        with open(pjoin(eclassdir, 'foo.eclass'), 'w') as f:
+            f.write('# foo\n')
+        ebuild = pjoin(self.dir, 'pkg-1.ebuild')
+        with open(ebuild, 'w') as f:
+            f.write('EAPI=7\n')
+
+        source = flat_hash.md5_cache(self.dir)
+        source['cat/pkg-1'] = {
+            'SLOT': '0', 'EAPI': '7',
+            '_chf_': LazilyHashedPath(ebuild),
+            '_eclasses_': {'foo': LazilyHashedPath(pjoin(eclassdir, 'foo.eclass'))},
+        }
+        target = sqlite.md5_cache(self.dir)
+        for k, v in source.items():
+            target[k] = source.export_entry(v)
+        target.commit()
+
+        target = sqlite.md5_cache(self.dir, readonly=True)
+        self.assertEqual(
+            target.location, pjoin(self.dir, 'metadata', 'md5-cache.sqlite'))
+        data = target['cat/pkg-1']
+        self.assertEqual(data['SLOT'], '0')
+        self.assertEqual(data['_md5_'], LazilyHashedPath(ebuild).md5)
+        self.assertEqual(
+            dict(data['_eclasses_'])['foo'],
+            (('md5', LazilyHashedPath(pjoin(eclassdir, 'foo.eclass')).md5),))
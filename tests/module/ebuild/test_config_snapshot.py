@@ -0,0 +1,86 @@
+import os
+import time
+from unittest import mock
+
+import pytest
+
+from pkgcore.ebuild import domain
+from pkgcore.ebuild.atom import atom
+from pkgcore.ebuild.config_snapshot import ConfigSnapshot
+
+
+class TestConfigSnapshot(object):
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmpdir):
+        self.dir = str(tmpdir.join('package.use'))
+        self.path = str(tmpdir.join('cache', 'snapshot'))
+        self.mtime = int((time.time() - 60) * 1e9)
+        os.mkdir(self.dir)
+        self.write('a', '>=cat/pkg-1.2-r3:0/1::gentoo foo -bar\ncat/pkg[baz] baz\n')
+        self.write('b', 'dev-*/* qux\n')
+
+    def write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(data)
+        # backdate paths out of the racy window, making sure their stamps
+        # change on filesystems with coarse timestamps
+        self.mtime += 1000
+        os.utime(path, ns=(0, self.mtime))
+        os.utime(self.dir, ns=(0, self.mtime))
+
+    def load(self, snapshot):
+        return snapshot.load(
+            self.dir, domain._read_config_file, domain.package_keywords_splitter)
+
+    def test_load(self):
+        snapshot = ConfigSnapshot(self.path)
+        expected = self.load(snapshot)
+        assert len(expected) == 3
+        snapshot.flush()
+
+        snapshot = ConfigSnapshot(self.path)
+        with mock.patch('pkgcore.ebuild.domain.parse_match', wraps=domain.parse_match) as parse:
+            data = self.load(snapshot)
+            # only non-atom restrictions get reparsed
+            assert [x[0][0] for x in parse.call_args_list] == ['dev-*/*']
+        assert data == expected
+        for x, y in zip(data, expected):
+            assert hash(x[0]) == hash(y[0])
+            assert str(x[0]) == str(y[0])
+        atoms = {x[0].cpvstr: x for x in data if isinstance(x[0], atom)}
+        assert len(atoms) == 2
+        assert atoms['cat/pkg-1.2-r3'][0].revision == 3
+        assert atoms['cat/pkg-1.2-r3'][1] == ('foo', '-bar')
+
+        # modified config files are reparsed
+        self.write('b', 'dev-*/* quux\n')
+        data = self.load(ConfigSnapshot(self.path))
+        assert ('quux',) in [x[1] for x in data]
+
+    def test_racy(self):
+        os.utime(os.path.join(self.dir, 'b'))
+        snapshot = ConfigSnapshot(self.path)
+        self.load(snapshot)
+        assert not snapshot.entries
+
+    def test_parse_errors(self):
+        self.write('b', '!cat/pkg foo\n')
+        snapshot = ConfigSnapshot(self.path)
+        self.load(snapshot)
+        snapshot.flush()
+        assert not os.path.exists(self.path)
+
+        with mock.patch('pkgcore.ebuild.domain.logger') as logger:
+            assert len(self.load(ConfigSnapshot(self.path))) == 2
+            assert logger.warning.call_count == 1
+
+    def test_invalid(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{')
+        snapshot = ConfigSnapshot(self.path)
+        assert len(self.load(snapshot)) == 3
+        snapshot.flush()
+        assert ConfigSnapshot(self.path).entries
@@ -297,6 +297,28 @@ class Test_native_Cpv(object):
         assert DummySubclass("da/ba-6.0", versioned=True) == \
             DummySubclass("da/ba-6.0-r0", versioned=True)
 
+    def test_version_key(self):
+        vers = [
+            "1", "01", "001", "1.0", "1.00", "1.01", "1.010", "1.1", "1.02",
+            "1.0a", "1.0b", "1.00a", "1.0.1", "1.000.1", "10", "2", "0",
+            "00", "0.060", "0.06", "6.054", "6.2", "12.2b", "12.2.5",
+            "1_alpha", "1_alpha0", "1_alpha1", "1_beta", "1_pre3", "1_rc",
+            "1_p", "1_p0", "1_p1", "1_alpha_p1", "1_p1_alpha", "1_p1_p2",
+            "1a_p1", "1-r1", "1-r01", "1.0-r2", "1_p-r3",
+        ]
+        vkls = self.vkls
+        pkgs = [vkls(f"da/ba-{x}") for x in vers]
+        for x in pkgs:
+            for y in pkgs:
+                assert cmp(x.version_key, y.version_key) == cpv.native_ver_cmp(
+                    x.version, x.revision, y.version, y.revision), f'{x!r}, {y!r}'
+        assert sorted(pkgs) == sorted(pkgs, key=lambda x: x.version_key)
+
+        # the first element covers the version alone
+        assert vkls("da/ba-1-r1").version_key[0] == vkls("da/ba-1").version_key[0]
+        assert cpv.ver_key("1", "1") == vkls("da/ba-1-r1").version_key
+        assert self.ukls("da/ba").version_key is None
+
     def test_no_init(self):
         """Test if the cpv is in a somewhat sane state if __init__ fails.
 
@@ -0,0 +1,61 @@
+from unittest import mock
+
+from pkgcore.ebuild import domain
+from pkgcore.ebuild.atom import atom
+from pkgcore.repository import filtered
+from pkgcore.restrictions import packages, values
+from pkgcore.test.misc import FakePkg, FakeRepo
+
+
+class TestVisibilityFilter(object):
+
+    def setup_method(self, method):
+        self.pkgs = [
+            FakePkg('dev-util/foo-1', keywords=('amd64',)),
+            FakePkg('dev-util/foo-2', keywords=('~amd64',)),
+            FakePkg('dev-util/bar-1', keywords=('amd64',)),
+            FakePkg('dev-util/bar-2', keywords=('~amd64',)),
+        ]
+        self.keywords = mock.Mock(wraps=packages.PackageRestriction(
+            'keywords', values.ContainmentMatch2('amd64')))
+
+    def filter(self):
+        return domain.generate_filter(
+            [atom('dev-util/foo'), atom('>=dev-util/bar-2')],
+            [atom('=dev-util/foo-2')],
+            ('keywords', self.keywords))
+
+    def test_reasons(self):
+        vfilter = self.filter()
+        reasons = {pkg.cpvstr: vfilter.reasons(pkg) for pkg in self.pkgs}
+        assert reasons == {
+            'dev-util/foo-1': ('package.mask',),
+            'dev-util/foo-2': ('keywords',),
+            'dev-util/bar-1': (),
+            'dev-util/bar-2': ('package.mask', 'keywords'),
+        }
+        assert [vfilter.match(pkg) for pkg in self.pkgs] == [False, False, True, False]
+        # mode isn't relevant for visibility
+        for pkg in self.pkgs:
+            assert vfilter.force_True(pkg) == vfilter.force_False(pkg) == vfilter.match(pkg)
+
+    def test_memoized(self):
+        vfilter = self.filter()
+        repo = filtered.tree(FakeRepo(self.pkgs), vfilter, True)
+        for i in range(3):
+            assert [x.cpvstr for x in repo.itermatch(packages.AlwaysTrue)] == ['dev-util/bar-1']
+            assert self.keywords.match.call_count == len(self.pkgs)
+        assert [vfilter.reasons(pkg) for pkg in self.pkgs]
+        assert self.keywords.match.call_count == len(self.pkgs)
+
+        # other filters have separate verdicts
+        vfilter = domain.generate_filter([], [], ('keywords', self.keywords))
+        assert vfilter.reasons(self.pkgs[0]) == ()
+        assert self.keywords.match.call_count == len(self.pkgs) + 1
+
+    def test_bare_restrictions(self):
+        keywords = packages.PackageRestriction('keywords', values.ContainmentMatch2('amd64'))
+        vfilter = domain.generate_filter([atom('dev-util/foo')], [], keywords)
+        reasons = [vfilter.reasons(pkg) for pkg in self.pkgs]
+        assert reasons == [
+            ('package.mask',), ('package.mask', 'visibility'), (), ('visibility',)]
@@ -11,7 +11,7 @@ from snakeoil.osutils import pjoin
 import pytest
 
 from pkgcore import fetch
-from pkgcore.ebuild import ebuild_src, digest, repo_objs
+from pkgcore.ebuild import ebuild_src, digest, processor, repo_objs
 from pkgcore.ebuild.eapi import get_eapi, EAPI
 from pkgcore.package import errors
 from pkgcore.test import malleable_obj
@@ -567,3 +567,51 @@ class TestPackageFactory(object):
         # thus, modifying (popping _mtime_) _is_ valid
         assert cache2[pkg.cpvstr] == \
             {'_eclasses_': {'eclass1': (None, 100)}, 'marker': 2, '_mtime_': 200}
+
+    def test_get_metadata_batch(self):
+        ec = FakeEclassCache('/nonexistent/path')
+        eapi = get_eapi('7')
+        pkgs = [
+            malleable_obj(cpvstr=f'cat/pkg-{x}', path='bollocks', eapi=eapi)
+            for x in range(4)]
+
+        class fake_cache(dict):
+            readonly = True
+            def validate_entry(self, *args):
+                return True
+
+        class fake_ebp(object):
+            def get_keys_batch(self, pkgs, eclass_cache):
+                self.requested = [pkg.cpvstr for pkg in pkgs]
+                yield pkgs[0], {'marker': 1}
+                yield pkgs[1], processor.ProcessorError('failed')
+                # processor died, leaving the remaining pkgs unprocessed
+
+        ebp = fake_ebp()
+        pf = self.mkinst(
+            cache=(fake_cache({'cat/pkg-0': {'marker': 0}}),), eclasses=ec,
+            _store_metadata=lambda pkg, data: data)
+        results = list(pf._get_metadata_batch(pkgs, ebp))
+        # only pkgs without valid cache entries are regenerated
+        assert ebp.requested == ['cat/pkg-1', 'cat/pkg-2', 'cat/pkg-3']
+        assert [pkg.cpvstr for pkg, data in results] == ['cat/pkg-0', 'cat/pkg-1', 'cat/pkg-2']
+        assert results[0][1] == {'marker': 0}
+        assert results[1][1] == {'marker': 1}
+        assert isinstance(results[2][1], errors.MetadataException)
+
+    def test_eclass_stats(self):
+        pf = self.mkinst()
+        assert pf.eclass_stats() == {}
+        pf._table.add('cat/pkg-1', {'_eclasses_': {'foo': 1, 'bar': 1}})
+        pf._table.add('cat/pkg-2', {'_eclasses_': {'foo': 1, 'bar': 1}})
+        pf._table.add('cat/pkg-3', {'_eclasses_': {'foo': 1}})
+        pf._table.add('cat/pkg-4', {})
+        assert pf.eclass_stats() == {'foo': 3, 'bar': 2}
+
+    def test_cached_eclasses(self):
+        pkg = malleable_obj(cpvstr='cat/pkg-1')
+        cache = {pkg.cpvstr: {'_eclasses_': [('foo', ()), ('bar', ())]}}
+        pf = self.mkinst(cache=(None, {}, cache))
+        assert pf._cached_eclasses(pkg) == {'foo', 'bar'}
+        pkg = malleable_obj(cpvstr='cat/pkg-2')
+        assert pf._cached_eclasses(pkg) == frozenset()
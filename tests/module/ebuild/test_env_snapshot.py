@@ -0,0 +1,47 @@
+import os
+
+from pkgcore.ebuild.env_snapshot import EnvSnapshot
+
+
+class TestEnvSnapshot(object):
+
+    def write_env(self, snapshot, data):
+        # the ebd rewrites the env in place
+        with open(snapshot.env_path, 'w') as f:
+            f.write(data)
+
+    def test_snapshot(self, tmpdir):
+        snapshot = EnvSnapshot(str(tmpdir))
+        assert snapshot.stamp() is None
+        assert not snapshot.trusted(snapshot.stamp())
+
+        # envs from other sources aren't trusted
+        self.write_env(snapshot, 'declare -x FOO="bar"\n')
+        stamp = snapshot.stamp()
+        assert not snapshot.trusted(stamp)
+
+        # phases not dumping the env don't mark it as trusted
+        snapshot.update(stamp)
+        assert not os.path.exists(snapshot.path)
+        assert not snapshot.trusted(snapshot.stamp())
+
+        # while dumped envs are, even across instances
+        self.write_env(snapshot, 'declare -x FOO="barbaz"\n')
+        snapshot.update(stamp)
+        snapshot = EnvSnapshot(str(tmpdir))
+        stamp = snapshot.stamp()
+        assert snapshot.trusted(stamp)
+
+        # until they're modified
+        self.write_env(snapshot, 'declare -x FOO="modified"\n')
+        assert not snapshot.trusted(snapshot.stamp())
+
+        snapshot.update(stamp)
+        assert snapshot.trusted(snapshot.stamp())
+        snapshot.invalidate()
+        assert not snapshot.trusted(snapshot.stamp())
+        snapshot.invalidate()
+
+        with open(snapshot.path, 'w') as f:
+            f.write('{')
+        assert not snapshot.trusted(snapshot.stamp())
@@ -0,0 +1,95 @@
+import pytest
+
+from pkgcore.ebuild.metadata_table import MetadataTable, MetadataRow
+
+
+class TestMetadataTable(object):
+
+    def test_add(self):
+        table = MetadataTable()
+        assert len(table) == 0
+        assert table.get('cat/pkg-1') is None
+
+        table.add('cat/pkg-1', {'SLOT': '0', 'DESCRIPTION': 'foo'})
+        table.add('cat/pkg-2', {'SLOT': '1', 'KEYWORDS': '~amd64'})
+        assert len(table) == 2
+        assert 'cat/pkg-1' in table
+        assert 'cat/pkg-3' not in table
+
+        row = table.get('cat/pkg-1')
+        assert isinstance(row, MetadataRow)
+        assert dict(row.items()) == {'SLOT': '0', 'DESCRIPTION': 'foo'}
+        row = table.get('cat/pkg-2')
+        assert dict(row.items()) == {'SLOT': '1', 'KEYWORDS': '~amd64'}
+
+        # replacing entries
+        table.add('cat/pkg-1', {'SLOT': '2'})
+        assert table.get('cat/pkg-1') == {'SLOT': '2'}
+        assert len(table) == 2
+
+    def test_shared_values(self):
+        table = MetadataTable()
+        eclasses = {'foo': object()}
+        for ver in range(10):
+            table.add(f'cat/pkg-{ver}', {
+                'DESCRIPTION': ''.join(['desc', 'ription']),
+                '_eclasses_': dict(eclasses),
+            })
+        rows = [table.get(f'cat/pkg-{ver}') for ver in range(10)]
+        assert len({id(row['DESCRIPTION']) for row in rows}) == 1
+        assert len({id(row['_eclasses_']) for row in rows}) == 1
+        assert rows[0]['_eclasses_'] == eclasses
+
+    def test_discard(self):
+        table = MetadataTable()
+        table.add('cat/pkg-1', {'SLOT': '0'})
+        table.discard('cat/pkg-1')
+        table.discard('cat/pkg-2')
+        assert table.get('cat/pkg-1') is None
+        table.add('cat/pkg-1', {'SLOT': '0'})
+        table.clear()
+        assert len(table) == 0
+
+    def test_value_counts(self):
+        table = MetadataTable()
+        assert table.value_counts('SLOT') == []
+        table.add('cat/pkg-1', {'SLOT': '0'})
+        table.add('cat/pkg-2', {'SLOT': '0'})
+        table.add('cat/pkg-3', {'SLOT': '1'})
+        table.add('cat/pkg-4', {'KEYWORDS': '~amd64'})
+        # replaced and dropped pkgs aren't counted
+        table.add('cat/pkg-1', {'SLOT': '1'})
+        table.discard('cat/pkg-2')
+        assert table.value_counts('SLOT') == [('1', 2)]
+
+
+class TestMetadataRow(object):
+
+    def test_mapping(self):
+        table = MetadataTable()
+        table.add('cat/pkg-1', {'SLOT': '0', 'DEPEND': ''})
+        table.add('cat/pkg-2', {'RDEPEND': 'dev-libs/foo'})
+        row = table.get('cat/pkg-1')
+
+        assert row['SLOT'] == '0'
+        assert row['DEPEND'] == ''
+        with pytest.raises(KeyError):
+            row['RDEPEND']
+        assert row.get('RDEPEND') is None
+        assert row.get('RDEPEND', '') == ''
+        assert 'SLOT' in row
+        assert 'RDEPEND' not in row
+        assert sorted(row) == ['DEPEND', 'SLOT']
+        assert sorted(row.values()) == ['', '0']
+        assert len(row) == 2
+        assert 'SLOT' in repr(row)
+
+    def test_pop(self):
+        table = MetadataTable()
+        table.add('cat/pkg-1', {'SLOT': '0'})
+        row = table.get('cat/pkg-1')
+        # values are shared so they're never removed
+        assert row.pop('SLOT', None) == '0'
+        assert row.pop('SLOT', None) == '0'
+        assert row.pop('KEYWORDS', '') == ''
+        assert table.get('cat/pkg-1')['SLOT'] == '0'
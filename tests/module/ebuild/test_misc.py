@@ -1,10 +1,15 @@
 # Copyright: 2007-2011 Brian Harring <ferringb@gmail.com>
 # License: GPL2/BSD
 
+from itertools import product
+
+from snakeoil.sequences import iflatten_instance
 from snakeoil.test import TestCase, mk_cpy_loadable_testcase
 
 from pkgcore.ebuild import misc
 from pkgcore.restrictions import packages
+from pkgcore.test.misc import FakePkg
+from pkgcore.util.parserestrict import parse_match
 
 AlwaysTrue = packages.AlwaysTrue
 AlwaysFalse = packages.AlwaysFalse
@@ -42,6 +47,79 @@ class test_collapsed_restrict_to_data(base):
             defaults=['y'])
 
 
+class TestCollapsedLookup(object):
+
+    restricts = (
+        'dev-util/*', 'dev-*/*', '*/foo', 'dev-util/foo', '>=dev-util/foo-2',
+        'dev-util/foo:1', '=dev-util/foo-1*', 'dev-lang/bar::gentoo',
+        '*/*::overlay', 'dev-util/bar[x]', 'foo', '<foo-2', 'sys-apps/foo:0',
+        'dev-*/foo:1', 'sys-*',
+    )
+
+    def pkgs(self):
+        for cpv, slot, repo in product(
+                ('dev-util/foo-1', 'dev-util/foo-2-r1', 'dev-lang/bar-3',
+                 'sys-apps/foo-1', 'dev-util/bar-1'),
+                ('0', '1'), ('gentoo', 'overlay')):
+            yield FakePkg(cpv, slot=slot, repo=((), repo), use=('x',))
+
+    def mk_data(self, restricts, kls=misc.collapsed_restrict_to_data):
+        data = [(parse_match(r), (f'k{i}', f'-k{i - 1}')) for i, r in enumerate(restricts)]
+        return kls([(packages.AlwaysTrue, ('k0', 'k3'))], data)
+
+    def naive(self, obj, pkg):
+        l = []
+        for specific in obj.freeform:
+            l.extend(data for restrict, data in specific if restrict.match(pkg))
+        l.extend(data for a, data in obj.atoms.get(pkg.key, ()) if a.match(pkg))
+        s = set(obj.defaults_finalized)
+        misc.incremental_expansion(s, iflatten_instance(l))
+        return s
+
+    def test_matches(self):
+        for restricts in (self.restricts, self.restricts[::-1], self.restricts[:-6]):
+            obj = self.mk_data(restricts)
+            for pkg in self.pkgs():
+                expected = self.naive(obj, pkg)
+                assert obj.pull_data(pkg) == expected
+                # memoized or not, matches don't change
+                assert obj.pull_data(pkg) == expected
+                assert set(obj.iter_pull_data(pkg)) >= expected
+
+    def test_ordering(self):
+        # exact and globbed category restrictions are interleaved
+        obj = misc.collapsed_restrict_to_data([
+            (parse_match('dev-util/*'), ('a',)),
+            (parse_match('dev-*/*'), ('-a', 'b')),
+            (parse_match('dev-util/*'), ('a', '-b')),
+        ])
+        assert obj.pull_data(FakePkg('dev-util/foo-1')) == {'a'}
+        assert obj.pull_data(FakePkg('dev-lang/foo-1')) == {'b'}
+
+    def test_memo(self):
+        obj = self.mk_data(self.restricts[:-6])
+        pkgs = list(self.pkgs())
+        for pkg in pkgs:
+            obj.pull_data(pkg)
+        # keyed by the attrs the restrictions use
+        assert len(obj._memo) == len(pkgs)
+        obj = self.mk_data(('dev-util/*', 'sys-*'))
+        for pkg in pkgs:
+            obj.pull_data(pkg)
+        assert len(obj._memo) == 4
+
+        # use deps can't be memoized
+        obj = self.mk_data(self.restricts)
+        assert obj._memo_key is None
+
+        obj = self.mk_data(self.restricts[:-6], misc.non_incremental_collapsed_restrict_to_data)
+        pkg = FakePkg('dev-util/foo-2-r1', slot='1', repo=((), 'gentoo'))
+        data = obj.pull_data(pkg)
+        assert obj.pull_data(pkg) == data
+        assert {'k0', 'k3', 'k4', 'k5'}.issubset(data)
+        assert 'k6' not in data
+
+
 class test_incremental_license_expansion(TestCase):
 
     def test_it(self):
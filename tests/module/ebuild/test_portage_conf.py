@@ -217,3 +217,15 @@ class TestPortageConfig(TempDirMixin, TestCase):
         self.assertEqual(repos, sym_repos)
         self.assertEqual('gentoo', defaults['main-repo'])
         self.assertEqual(['foo', 'bar', 'gentoo', 'binpkgs'], list(repos.keys()))
+
+    def test_sqlite_cache(self):
+        # only configured if a single file cache was generated for the repo
+        self.assertIsNone(PortageConfig._make_sqlite_cache(self.dir))
+
+        os.mkdir(pjoin(self.dir, 'metadata'))
+        open(pjoin(self.dir, 'metadata', 'md5-cache.sqlite'), 'w').close()
+        section = PortageConfig._make_sqlite_cache(self.dir)
+        self.assertEqual(
+            'pkgcore.cache.sqlite.md5_cache',
+            section.render_value(None, 'class', 'str')[1])
+        self.assertFalse(section.render_value(None, 'readonly', 'bool'))
@@ -0,0 +1,151 @@
+import os
+import subprocess
+import threading
+from unittest import mock
+
+import pytest
+
+from pkgcore.ebuild import const as e_const
+from pkgcore.ebuild import processor
+
+
+class FakeProcessor(object):
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.eclass_caching = False
+        self._preloaded_eclasses = {}
+
+    def allow_eclass_caching(self):
+        self.eclass_caching = True
+
+    def disable_eclass_caching(self):
+        self.eclass_caching = False
+
+    def preload_eclasses(self, cache, async_req=False, limited_to=None):
+        for eclass in limited_to:
+            self._preloaded_eclasses[eclass] = cache.eclasses[eclass]
+        return True
+
+    def _consume_async_expects(self):
+        return True
+
+
+class FakeEclassCache(object):
+
+    eclasses = {'foo': '/foo.eclass', 'bar': '/bar.eclass', 'baz': '/baz.eclass'}
+
+
+class TestProcessorPool(object):
+
+    @pytest.fixture(autouse=True)
+    def _setup(self):
+        pids = iter(range(1, 100))
+        self.released = []
+        with mock.patch.object(processor, 'request_ebuild_processor',
+                               side_effect=lambda **kw: FakeProcessor(next(pids))), \
+                mock.patch.object(processor, 'release_ebuild_processor',
+                                  side_effect=self.released.append), \
+                mock.patch.object(processor, 'drop_ebuild_processor'):
+            yield
+
+    def test_warm_up(self):
+        pool = processor.ProcessorPool(
+            2, FakeEclassCache(), preload=('foo', 'missing'))
+        assert len(pool._idle) == 2
+        for ebp in pool._idle:
+            assert ebp.eclass_caching
+            assert list(ebp._preloaded_eclasses) == ['foo']
+        pool.close()
+        assert sorted(x.pid for x in self.released) == [1, 2]
+        assert not any(x.eclass_caching for x in self.released)
+
+        # eclass caching disabled
+        pool = processor.ProcessorPool(1, preload=('foo',))
+        ebp = pool.acquire()
+        assert not ebp.eclass_caching
+        assert not ebp._preloaded_eclasses
+
+    def test_affinity(self):
+        cache = FakeEclassCache()
+        pool = processor.ProcessorPool(3, cache)
+        ebp1, ebp2, ebp3 = pool._idle
+        ebp2.preload_eclasses(cache, limited_to=('foo', 'bar'))
+        ebp3.preload_eclasses(cache, limited_to=('baz',))
+
+        assert pool.acquire({'foo', 'bar'}) is ebp2
+        assert pool.acquire({'baz', 'foo'}) is ebp3
+        pool.release(ebp3)
+        pool.release(ebp2)
+        # most recently released processors are preferred on ties
+        assert pool.acquire() is ebp2
+        assert pool.acquire({'bar'}) is ebp3
+
+    def test_release(self):
+        pool = processor.ProcessorPool(1, FakeEclassCache(), preload=('foo',))
+        with pool.processor() as ebp:
+            # requests block until a processor is available
+            t = threading.Thread(target=pool.acquire)
+            t.start()
+            t.join(0.1)
+            assert t.is_alive()
+            ebp.pid = None
+        t.join()
+        # dead processors are replaced
+        assert processor.drop_ebuild_processor.called
+        assert not pool._idle
+
+
+class TestEnvTransfer(object):
+
+    env = {
+        'A': 'foo', 'B': "it's \"quoted\" $(true)\n", 'C': '', 'D': 'é',
+        'E': ['1 2', '', '$x'], 'F': [], 'RO': 'readonly',
+    }
+
+    @pytest.fixture(autouse=True)
+    def _setup(self):
+        self.ebp = object.__new__(processor.EbuildProcessor)
+        self.ebp._readonly_vars = frozenset(['RO'])
+
+    def test_generate_env_frames(self):
+        header, data = self.ebp._generate_env_frames(self.env)
+        assert header == 'A 3 B 22 C 0 D 2 E[] 3 3 0 2 F[] 0'
+        assert data == "foo" "it's \"quoted\" $(true)\n" "é" "1 2" "$x"
+
+        for key in ('1A', 'A-B', 'A[0]'):
+            with pytest.raises(KeyError):
+                self.ebp._generate_env_frames({key: 'foo'})
+        with pytest.raises(ValueError):
+            self.ebp._generate_env_frames({'A': 1})
+
+    def test_read_env_frames(self, tmpdir):
+        header, data = self.ebp._generate_env_frames(self.env)
+        path = str(tmpdir.join('frames'))
+        with open(path, 'w') as f:
+            f.write(f'{header}\n{data}')
+        lib = os.path.join(e_const.EBD_PATH, 'ebuild-daemon-lib.bash')
+        script = (
+            f'source {lib}; E=stale; __ebd_read_env_frames 3<{path} || exit; '
+            'env -0 | grep -z "^[A-F]="; declare -p E F')
+        output = subprocess.run(
+            ['bash', '-c', script], env={'PKGCORE_EBD_READ_FD': '3'},
+            stdout=subprocess.PIPE, check=True).stdout.decode()
+        exported, arrays = output.rsplit('\0', 1)
+        assert sorted(exported.split('\0')) == [
+            'A=foo', "B=it's \"quoted\" $(true)\n", 'C=', 'D=é']
+        assert arrays.splitlines() == [
+            'declare -ax E=([0]="1 2" [1]="" [2]="\\$x")', 'declare -ax F']
+
+    def test_send_env(self):
+        self.ebp.write = mock.Mock()
+        self.ebp.expect = mock.Mock(return_value=True)
+        assert self.ebp.send_env({'A': 'foo bar'})
+        self.ebp.write.assert_called_once_with(
+            "start_receiving_env bytes 18\nexport A='foo bar'", append_newline=False)
+
+        self.ebp.write.reset_mock()
+        self.ebp.env_transfer = 'framed'
+        assert self.ebp.send_env({'A': 'foo bar'})
+        self.ebp.write.assert_called_once_with(
+            "start_receiving_env frames\nA 7\nfoo bar", append_newline=False)
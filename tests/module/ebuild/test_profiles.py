@@ -18,6 +18,7 @@ from pkgcore.ebuild import const, profiles, repo_objs
 from pkgcore.ebuild.atom import atom
 from pkgcore.ebuild.cpv import CPV
 from pkgcore.ebuild.misc import chunked_data
+from pkgcore.ebuild.profile_cache import ProfileCache
 from pkgcore.restrictions import packages
 from pkgcore.test import silence_logging
 
@@ -1303,3 +1304,70 @@ class TestOnDiskProfile(profile_mixin, TestCase):
         self.assertNotEqual(p, None)
         self.assertEqual(normpath(p.basepath), normpath(base))
         self.assertEqual(normpath(p.profile), normpath(pjoin(base, '1')))
+
+
+class TestProfileCache(profile_mixin, TestCase):
+
+    class kls(profiles.OnDiskProfile):
+        _node_kls = ProfileNode
+
+    def setUp(self):
+        TempDirMixin.setUp(self)
+        self.path = pjoin(self.dir, 'cache')
+        self.profiles = pjoin(self.dir, 'profiles')
+        os.mkdir(self.profiles)
+
+    def tearDown(self):
+        ProfileNode._parse_cache = None
+        TempDirMixin.tearDown(self)
+
+    def mk_profiles(self, *profiles):
+        d, self.dir = self.dir, self.profiles
+        try:
+            super().mk_profiles(*profiles)
+        finally:
+            self.dir = d
+        # make sure files are old enough to be recorded
+        for root, dirs, files in os.walk(self.profiles):
+            for name in files:
+                os.utime(pjoin(root, name), (0, 0))
+
+    def get_profile(self, profile):
+        ProfileNode._parse_cache = ProfileCache(self.path)
+        return self.kls(self.profiles, profile)
+
+    def collapse(self, p):
+        return (p.system, p.masks, p.unmasks, p.masked_use, p.forced_use, p.pkg_use)
+
+    def test_cache(self):
+        self.mk_profiles(
+            {"eapi": "5\n",
+             "packages": "*dev-util/foo\ndev-util/bar\n",
+             "package.mask": ">=dev-util/foo-2:0\n",
+             "package.use.mask": "dev-util/foo X\n"},
+            {"eapi": "5\n",
+             "package.unmask": "dev-util/foo[-Y]\n",
+             "package.use.force": "dev-util/bar:1 -X Y\n",
+             "package.use": "dev-util/foo Z\n"},
+        )
+        expected = self.collapse(self.get_profile("1"))
+        ProfileNode._parse_cache.flush()
+
+        with mock.patch.object(atom, '__init__', autospec=True, side_effect=atom.__init__) as parse:
+            self.assertEqual(self.collapse(self.get_profile("1")), expected)
+            self.assertEqual(parse.call_count, 0)
+        self.assertEqual(sorted(self.get_profile("1").masks),
+                         sorted([atom('>=dev-util/foo-2:0'), atom('dev-util/bar', negate_vers=True)]))
+
+        # modified files get reparsed
+        with open(pjoin(self.profiles, "0", "package.mask"), "w") as f:
+            f.write("dev-util/baz\n")
+        self.assertEqual(sorted(self.get_profile("1").masks),
+                         sorted([atom('dev-util/bar', negate_vers=True), atom('dev-util/baz')]))
+
+    def test_recent(self):
+        self.mk_profiles({"package.mask": "dev-util/foo\n"})
+        os.utime(pjoin(self.profiles, "0", "package.mask"))
+        self.get_profile("0").masks
+        ProfileNode._parse_cache.flush()
+        self.assertFalse(os.path.exists(self.path))
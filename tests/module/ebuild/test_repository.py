@@ -2,18 +2,25 @@
 # Copyright: 2007 Marien Zwart <marienz@gentoo.org>
 # License: BSD/GPL2
 
+import contextlib
 import os
 import textwrap
 from unittest import mock
 
+from snakeoil import chksum
 from snakeoil.fileutils import touch
 from snakeoil.osutils import ensure_dirs, pjoin
 from snakeoil.test.mixins import TempDirMixin
 
+from pkgcore.cache import flat_hash
 from pkgcore.ebuild import errors as ebuild_errors
-from pkgcore.ebuild import repository, restricts, eclass_cache
+from pkgcore.ebuild import ebuild_src, repository, restricts, eclass_cache, processor
 from pkgcore.ebuild.atom import atom
+from pkgcore.ebuild.eapi import get_eapi
+from pkgcore.ebuild.metadata_table import MetadataRow
+from pkgcore.package.errors import MetadataException
 from pkgcore.repository import errors
+from pkgcore.test import malleable_obj
 
 
 class TestUnconfiguredTree(TempDirMixin):
@@ -180,6 +187,89 @@ class TestUnconfiguredTree(TempDirMixin):
             {('cat', 'pkg'): ('3',), ('empty', 'empty'): ()},
             dict(repo.versions))
 
+    def test_validate_cache(self):
+        ensure_dirs(pjoin(self.dir, 'cat', 'pkg'))
+        for ver in ('1', '2'):
+            with open(pjoin(self.dir, 'cat', 'pkg', f'pkg-{ver}.ebuild'), 'w') as f:
+                f.write('inherit foo\n')
+        touch(pjoin(self.dir, 'cat', 'pkg', 'notpkg-1.ebuild'))
+
+        def mk_repo():
+            return self.mk_tree(
+                self.dir, cache=(flat_hash.md5_cache(self.dir),))
+
+        eclass = pjoin(mk_repo().eclass_cache.eclassdir, 'foo.eclass')
+        with open(eclass, 'w') as f:
+            f.write('foo\n')
+        repo = mk_repo()
+        assert repo.validate_cache() == (set(), {'cat/pkg-1', 'cat/pkg-2'})
+        for ver in ('1', '2'):
+            path = pjoin(self.dir, 'cat', 'pkg', f'pkg-{ver}.ebuild')
+            repo.cache[0][f'cat/pkg-{ver}'] = {
+                'EAPI': '0', 'SLOT': '0',
+                '_chf_': chksum.LazilyHashedPath(path),
+                '_eclasses_': repo.eclass_cache.get_eclass_data(['foo']),
+            }
+        assert repo.validate_cache('cat') == ({'cat/pkg-1', 'cat/pkg-2'}, set())
+
+        # preloaded entries are used for metadata requests
+        assert repo.validate_cache(preload=True)[0] == {'cat/pkg-1', 'cat/pkg-2'}
+        with mock.patch.object(repo.cache[0], 'validate_entry') as validate_entry:
+            pkg = repo.match(atom('=cat/pkg-1'))[0]
+            assert pkg.slot == '0'
+            assert pkg.inherited == ('foo',)
+            validate_entry.assert_not_called()
+        assert isinstance(pkg.data, MetadataRow)
+
+        with open(pjoin(self.dir, 'cat', 'pkg', 'pkg-2.ebuild'), 'a') as f:
+            f.write('SLOT=1\n')
+        assert mk_repo().validate_cache() == ({'cat/pkg-1'}, {'cat/pkg-2'})
+
+        # eclass changes invalidate all inheriting pkgs
+        with open(eclass, 'a') as f:
+            f.write('bar\n')
+        assert mk_repo().validate_cache() == (set(), {'cat/pkg-1', 'cat/pkg-2'})
+
+    def test_layout_index(self):
+        ensure_dirs(pjoin(self.dir, 'cat', 'pkg'))
+        touch(pjoin(self.dir, 'cat', 'pkg', 'pkg-1.ebuild'))
+        index = pjoin(self.dir, 'metadata', 'layout-index')
+        repo = self.mk_tree(self.dir, layout_index=index)
+        for path in (self.dir, pjoin(self.dir, 'cat'), pjoin(self.dir, 'cat', 'pkg')):
+            os.utime(path, (0, 0))
+        assert dict(repo.versions) == {('cat', 'pkg'): ('1',)}
+        repo.layout_index.flush()
+
+        # listings are pulled from the index
+        repo = self.mk_tree(self.dir, layout_index=index)
+        with mock.patch('pkgcore.ebuild.repository.listdir_files') as listdir_files, \
+                mock.patch('pkgcore.ebuild.repository.listdir_dirs') as listdir_dirs:
+            assert dict(repo.versions) == {('cat', 'pkg'): ('1',)}
+            listdir_files.assert_not_called()
+            listdir_dirs.assert_not_called()
+
+        # only changed dirs are rescanned
+        touch(pjoin(self.dir, 'cat', 'pkg', 'pkg-2.ebuild'))
+        repo = self.mk_tree(self.dir, layout_index=index)
+        with mock.patch('pkgcore.ebuild.repository.listdir_dirs') as listdir_dirs:
+            assert sorted(repo.versions[('cat', 'pkg')]) == ['1', '2']
+            listdir_dirs.assert_not_called()
+
+    def test_generation_paths(self):
+        ensure_dirs(pjoin(self.dir, 'cat', 'pkg'))
+        touch(pjoin(self.dir, 'cat', 'pkg', 'pkg-1.ebuild'))
+        repo = self.mk_tree(self.dir)
+        assert pjoin(self.dir, 'cat', 'pkg') in repo._generation_paths()
+
+        # synced repos only depend on their sync markers
+        touch(pjoin(self.dir, 'metadata', 'timestamp.chk'))
+        repo = self.mk_tree(self.dir)
+        with mock.patch.object(repo, '_metadata_index_paths') as metadata_index_paths:
+            paths = repo._generation_paths()
+            metadata_index_paths.assert_not_called()
+        assert pjoin(self.dir, 'metadata', 'timestamp.chk') in paths
+        assert pjoin(self.dir, 'cat', 'pkg') not in paths
+
     def test_package_mask(self):
         with open(pjoin(self.pdir, 'package.mask'), 'w') as f:
             f.write(textwrap.dedent('''\
@@ -292,3 +382,67 @@ class TestSlavedTree(TestUnconfiguredTree):
     def test_masters(self):
         repo = self.mk_tree(self.dir)
         self.assertEqual(repo.masters, (self.master_repo,))
+
+
+class TestRegenOpHelper(object):
+
+    class FakeProcessor(object):
+
+        def __init__(self, requested, fail):
+            self.requested = requested
+            self.fail = fail
+
+        def get_keys_batch(self, pkgs, eclass_cache):
+            self.requested.append([pkg.cpvstr for pkg in pkgs])
+            for pkg in pkgs:
+                if pkg.cpvstr in self.fail:
+                    exc = self.fail.pop(pkg.cpvstr)
+                    if isinstance(exc, processor.ProcessorError):
+                        # processor died after reporting the failure
+                        yield pkg, exc
+                        return
+                    raise exc
+                yield pkg, {'SLOT': '0'}
+
+    class FakeCache(dict):
+        readonly = True
+
+        def validate_entry(self, *args):
+            return True
+
+    def batch(self, pkgs, fail):
+        cache = self.FakeCache({'cat/pkg-2': {'SLOT': '1'}})
+        package_class = ebuild_src.package_factory(None, (cache,), None, {}, {})
+        object.__setattr__(package_class, '_store_metadata', lambda pkg, data: data)
+        requested = []
+        helper = object.__new__(repository._RegenOpHelper)
+        helper.repo = mock.Mock(package_class=package_class)
+        helper.force = False
+        helper.pool = mock.Mock()
+        helper.pool.processor = contextlib.contextmanager(
+            lambda eclasses: iter([self.FakeProcessor(requested, fail)]))
+        failures = [(pkg.cpvstr, e) for pkg, e in helper.batch(pkgs)]
+        return failures, requested
+
+    def mk_pkgs(self):
+        eapi = get_eapi('7')
+        return [
+            malleable_obj(cpvstr=f'cat/pkg-{x}', path='bollocks', eapi=eapi)
+            for x in range(4)]
+
+    def test_dead_processor(self):
+        # cached pkgs after the dying one don't cause stale pkgs to be skipped
+        failures, requested = self.batch(
+            self.mk_pkgs(), {'cat/pkg-0': processor.ProcessorError('died')})
+        assert [x[0] for x in failures] == ['cat/pkg-0']
+        assert isinstance(failures[0][1], MetadataException)
+        assert requested == [
+            ['cat/pkg-0', 'cat/pkg-1', 'cat/pkg-3'], ['cat/pkg-1', 'cat/pkg-3']]
+
+    def test_exceptions(self):
+        # the pkg being regenerated is blamed, not a cached pkg
+        exc = ValueError('broken')
+        failures, requested = self.batch(self.mk_pkgs(), {'cat/pkg-1': exc})
+        assert failures == [('cat/pkg-1', exc)]
+        assert requested == [
+            ['cat/pkg-0', 'cat/pkg-1', 'cat/pkg-3'], ['cat/pkg-3']]
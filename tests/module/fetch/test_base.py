@@ -114,3 +114,18 @@ class TestFetcher(object):
         alt_handlers = {chf: partial(f, chf) for chf in chksums}
         assert None == self.fetcher._verify(self.fp, self.obj, handlers=alt_handlers)
         assert sorted(l) == sorted(alt_handlers)
+
+    def test_verify_all(self):
+        paths = [f'{self.fp}{i}' for i in range(4)]
+        for i, path in enumerate(paths):
+            with open(path, 'w') as f:
+                f.write(data if i % 2 else data[:-1])
+        os.unlink(paths[2])
+        targets = [(path, self.obj) for path in paths]
+        results = list(self.fetcher.verify_all(targets, jobs=2))
+        assert [x[:2] for x in results] == targets
+        assert results[1][2] is None
+        assert results[3][2] is None
+        assert isinstance(results[0][2], errors.FetchFailed)
+        assert results[0][2].resumable
+        assert isinstance(results[2][2], errors.MissingDistfile)
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+import os
+import shutil
+from socketserver import ThreadingMixIn
+import sys
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from pkgcore.fetch import custom, errors, fetchable
+from pkgcore.operations import format
+
+fetch_command = (
+    f'{sys.executable} -c "import sys, urllib.request; '
+    f'urllib.request.urlretrieve(sys.argv[1], sys.argv[2])" '
+    '"${URI}" "${DISTDIR}/${FILE}"')
+
+
+class Handler(SimpleHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def translate_path(self, path):
+        return os.path.join(self.server.directory, path.lstrip('/'))
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.active, server.max_active)
+        try:
+            # keep requests open long enough to overlap
+            time.sleep(0.2)
+            super().do_GET()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, directory):
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def uri(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TestFetcher(object):
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmpdir):
+        self.distdir = str(tmpdir.mkdir('distdir'))
+        self.srcdir = tmpdir.mkdir('src')
+        self.servers = []
+        yield
+        for server in self.servers:
+            server.stop()
+
+    def mk_server(self):
+        server = Server(str(self.srcdir))
+        self.servers.append(server)
+        return server
+
+    def mk_fetchable(self, filename, server, data=None):
+        if data is None:
+            data = filename * 100
+        self.srcdir.join(filename).write(data)
+        chksums = {
+            'size': len(data),
+            'sha512': int(hashlib.sha512(data.encode()).hexdigest(), 16),
+        }
+        return fetchable(filename, [f'{server.uri}/{filename}'], chksums)
+
+    def mk_fetcher(self, **kwargs):
+        kwargs.setdefault('userpriv', False)
+        kwargs.setdefault('attempts', 2)
+        return custom.fetcher(self.distdir, fetch_command, **kwargs)
+
+    def test_fetch(self):
+        server = self.mk_server()
+        target = self.mk_fetchable('foo', server)
+        fetcher = self.mk_fetcher()
+        path = fetcher(target)
+        assert path == os.path.join(self.distdir, 'foo')
+        with open(path) as f:
+            assert f.read() == 'foo' * 100
+
+        missing = fetchable('bar', [f'{server.uri}/bar'], target.chksums)
+        with pytest.raises(errors.FetchFailed):
+            fetcher(missing)
+
+    def test_mirror_jobs(self):
+        servers = (self.mk_server(), self.mk_server())
+        targets = [
+            self.mk_fetchable(f'file{i}', servers[i % 2]) for i in range(6)]
+        # duplicates are only fetched once
+        targets.append(targets[0])
+
+        with pytest.raises(ValueError):
+            self.mk_fetcher(mirror_jobs=0)
+
+        fetcher = self.mk_fetcher(mirror_jobs=1)
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            paths = list(executor.map(fetcher, targets))
+        assert paths == [os.path.join(self.distdir, x.filename) for x in targets]
+        assert [x.max_active for x in servers] == [1, 1]
+
+    def test_verify_existing(self):
+        server = self.mk_server()
+        targets = [self.mk_fetchable(f'file{i}', server) for i in range(3)]
+        for target in targets[:2]:
+            shutil.copy(str(self.srcdir.join(target.filename)), self.distdir)
+        fetcher = self.mk_fetcher()
+        op = format.fetch_base(None, None, targets, fetcher)
+        with mock.patch.object(fetcher, 'fetch', wraps=fetcher.fetch) as fetch:
+            assert op.fetch_all(mock.Mock())
+        # only the missing file is fetched
+        assert [x[0][0] for x in fetch.call_args_list] == [targets[2]]
+        assert sorted(op.verified_files.values()) == targets
@@ -0,0 +1,108 @@
+import os
+import time
+from unittest import mock
+
+import pytest
+
+from pkgcore.fetch import base, errors, fetchable
+from pkgcore.fetch.stamps import VerifiedStamps
+from pkgcore.test.misc import backdate
+
+
+class TestVerifiedStamps(object):
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmpdir):
+        self.dir = str(tmpdir)
+        self.path = os.path.join(self.dir, 'stamps')
+        self.file = os.path.join(self.dir, 'file')
+        self.write_data('foo')
+
+    def write_data(self, data):
+        with open(self.file, 'w') as f:
+            f.write(data)
+        backdate(self.file)
+
+    def test_check(self):
+        stamps = VerifiedStamps(self.path)
+        assert not stamps.check(self.file, {'sha512': 1})
+        stamps.add(self.file, {'sha512': 1, 'size': 3})
+        assert stamps.check(self.file, {'sha512': 1})
+        assert stamps.check(self.file, {'sha512': 1, 'size': 3})
+        assert not stamps.check(self.file, {'sha512': 1, 'size': 4})
+        assert not stamps.check(self.file, {'sha512': 2})
+        assert not stamps.check(self.file, {'sha512': 1, 'blake2b': 1})
+
+        # chksums verified for the same file are merged
+        stamps.add(self.file, {'blake2b': 1})
+        assert stamps.check(self.file, {'sha512': 1, 'blake2b': 1})
+
+        # modified files have to be reverified
+        self.write_data('bar')
+        assert not stamps.check(self.file, {'sha512': 1})
+        stamps.add(self.file, {'blake2b': 2})
+        assert not stamps.check(self.file, {'sha512': 1})
+        os.unlink(self.file)
+        assert not stamps.check(self.file, {'blake2b': 2})
+
+    def test_restored_mtime(self):
+        stamps = VerifiedStamps(self.path)
+        stamps.add(self.file, {'sha512': 1})
+        st = os.stat(self.file)
+        # make sure the ctime changes on filesystems with coarse timestamps
+        time.sleep(0.1)
+        with open(self.file, 'w') as f:
+            f.write('bar')
+        os.utime(self.file, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert not stamps.check(self.file, {'sha512': 1})
+
+    def test_racy(self):
+        stamps = VerifiedStamps(self.path)
+        os.utime(self.file)
+        stamps.add(self.file, {'sha512': 1})
+        assert not stamps.check(self.file, {'sha512': 1})
+
+    def test_persistence(self):
+        stamps = VerifiedStamps(self.path)
+        stamps.add(self.file, {'sha512': 1})
+        stamps.add(os.path.join(self.dir, 'missing'), {'sha512': 1})
+        stamps.flush()
+        stamps = VerifiedStamps(self.path)
+        assert stamps.check(self.file, {'sha512': 1})
+        assert list(stamps.entries) == [self.file]
+
+        with open(self.path, 'w') as f:
+            f.write('{')
+        assert not VerifiedStamps(self.path).check(self.file, {'sha512': 1})
+
+
+class TestFetcherStamps(object):
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmpdir):
+        self.path = str(tmpdir.join('file'))
+        with open(self.path, 'w') as f:
+            f.write('foo')
+        backdate(self.path)
+        self.fetcher = base.fetcher()
+        self.fetcher.stamps = VerifiedStamps(str(tmpdir.join('stamps')))
+        self.target = fetchable(self.path, chksums={
+            'size': 3,
+            'sha256': 0x2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae})
+
+    def test_verify(self):
+        with mock.patch('pkgcore.fetch.base.get_chksums', wraps=base.get_chksums) as get_chksums:
+            self.fetcher._verify(self.path, self.target)
+            self.fetcher._verify(self.path, self.target)
+            assert get_chksums.call_count == 1
+            self.fetcher.force_verify = True
+            self.fetcher._verify(self.path, self.target)
+            assert get_chksums.call_count == 2
+
+        # changed files aren't accepted
+        self.fetcher.force_verify = False
+        with open(self.path, 'w') as f:
+            f.write('bar')
+        backdate(self.path)
+        with pytest.raises(errors.ChksumFailure):
+            self.fetcher._verify(self.path, self.target)
@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+from pkgcore.operations import regen
+from pkgcore.package.errors import MetadataException
+from pkgcore.repository import util
+
+
+class FakeObserver(object):
+
+    def __init__(self):
+        self.errors = []
+
+    def error(self, msg):
+        self.errors.append(msg)
+
+
+class FakeHelper(object):
+
+    def __init__(self, repo):
+        self.repo = repo
+
+    def __call__(self, pkg):
+        if pkg.package == 'bad':
+            raise ValueError(f'{pkg.cpvstr} failed in {os.getpid()}')
+
+
+class FakeBatchHelper(FakeHelper):
+
+    batch_size = 2
+
+    def __init__(self, repo):
+        super().__init__(repo)
+        self.batches = []
+
+    def batch(self, pkgs):
+        self.batches.append([pkg.cpvstr for pkg in pkgs])
+        for pkg in pkgs:
+            if pkg.package == 'bad':
+                yield pkg, ValueError(f'{pkg.cpvstr} failed in {os.getpid()}')
+            elif pkg.package == 'ugly':
+                yield pkg, MetadataException(pkg, 'data', 'failed sourcing ebuild')
+
+
+class RegenRepo(util.SimpleTree):
+
+    def _regen_operation_helper(self, **kwargs):
+        return FakeHelper(self)
+
+
+class BatchRegenRepo(util.SimpleTree):
+
+    helpers = ()
+
+    def _regen_operation_helper(self, **kwargs):
+        self.helper = FakeBatchHelper(self)
+        self.helper.kwargs = kwargs
+        self.helpers += (self.helper,)
+        return self.helper
+
+
+class TestRegenRepository(object):
+
+    def setup_method(self, method):
+        self.repo = RegenRepo({
+            'cat': {'good': ['1', '2'], 'bad': ['1', '2']},
+            'dev-util': {'good': ['1']},
+        })
+        self.pkgs = list(self.repo)
+        self.observer = FakeObserver()
+
+    @pytest.mark.parametrize('engine', ('thread', 'process'))
+    def test_errors(self, engine):
+        errors = list(regen.regen_repository(
+            self.repo, self.pkgs, self.observer, threads=2, engine=engine))
+        assert sorted(pkg.cpvstr for pkg, e in errors) == ['cat/bad-1', 'cat/bad-2']
+        assert all(isinstance(e, ValueError) for pkg, e in errors)
+        assert not self.observer.errors
+
+    def test_process_workers(self):
+        errors = list(regen.regen_repository_procs(
+            self.repo, self.pkgs, self.observer, procs=2))
+        # failures are raised in the forked workers, not the parent
+        pids = {str(e).split()[-1] for pkg, e in errors}
+        assert str(os.getpid()) not in pids
+        # versions of the same package are handled by the same worker
+        assert len(pids) == 1
+
+    def test_batches(self):
+        repo = BatchRegenRepo({
+            'cat': {'good': ['1', '2'], 'bad': ['1'], 'ugly': ['1']},
+        })
+        pkgs = sorted(repo)
+        errors = list(regen.regen_repository(repo, pkgs, self.observer, threads=1))
+        # metadata failures are dropped, other errors are reported
+        assert [pkg.cpvstr for pkg, e in errors] == ['cat/bad-1']
+        assert repo.helper.batches == [
+            ['cat/bad-1', 'cat/good-1'], ['cat/good-2', 'cat/ugly-1']]
+
+    def test_shared_helper(self):
+        repo = BatchRegenRepo({'cat': {'good': ['1', '2', '3']}})
+        list(regen.regen_repository(repo, list(repo), self.observer, threads=8))
+        # threads share a single helper sized to the number of pkgs
+        assert len(repo.helpers) == 1
+        assert repo.helper.kwargs == {'threads': 3}
+        assert sorted(sum(repo.helper.batches, [])) == [
+            'cat/good-1', 'cat/good-2', 'cat/good-3']
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            list(regen.regen_repository(
+                self.repo, self.pkgs, self.observer, engine='foo'))
+
+    def test_shards(self):
+        shards = regen._shard_pkgs(self.pkgs)
+        assert sorted(len(x) for x in shards) == [1, 2, 2]
+        for shard in shards:
+            assert len({self.pkgs[i].key for i in shard}) == 1
+
+    def test_dead_workers(self):
+        class DyingHelper(FakeHelper):
+            def __call__(self, pkg):
+                if pkg.package == 'bad':
+                    os._exit(1)
+
+        class DyingRepo(util.SimpleTree):
+            def _regen_operation_helper(self, **kwargs):
+                return DyingHelper(self)
+
+        repo = DyingRepo({
+            'cat': {'good': ['1', '2'], 'bad': ['1', '2']},
+            'dev-util': {'good': ['1']},
+        })
+        for procs in (1, 2):
+            observer = FakeObserver()
+            errors = list(regen.regen_repository_procs(repo, list(repo), observer, procs=procs))
+            failed = sorted(pkg.cpvstr for pkg, e in errors)
+            assert all(isinstance(e, regen.RegenWorkerDied) for pkg, e in errors)
+            # pkgs of the shard the worker died on are reported
+            assert {'cat/bad-1', 'cat/bad-2'}.issubset(failed)
+            if procs == 2:
+                # the remaining worker handles the other shards
+                assert failed == ['cat/bad-1', 'cat/bad-2']
+            assert len(observer.errors) == 1
@@ -0,0 +1,219 @@
+import threading
+
+import pytest
+from snakeoil.osutils import ensure_dirs, pjoin
+
+from pkgcore.ebuild import eclass_cache, processor, repository
+from pkgcore.operations.scheduler import FetchScheduler, MergeScheduler, op_dependencies
+from pkgcore.test.misc import FakePkg
+
+
+class FakeOp(object):
+
+    def __init__(self, cpv, deps=(), desc='add'):
+        self.pkg = FakePkg(cpv)
+        self.deps = deps
+        self.desc = desc
+
+    def __repr__(self):
+        return self.pkg.cpvstr
+
+
+def mk_ops(*specs):
+    return [FakeOp(*spec) for spec in specs]
+
+
+def pkg_deps(ops, *extra):
+    """Map the pkgs of ops to the pkgs of their deps.
+
+    Extra (cpv, deps) pairs add pkgs without ops.
+    """
+    pkgs = {op.pkg.cpvstr: op.pkg for op in ops}
+    specs = [(op.pkg.cpvstr, op.deps) for op in ops]
+    for cpv, deps in extra:
+        pkgs[cpv] = FakePkg(cpv)
+        specs.append((cpv, deps))
+    return {pkgs[cpv]: frozenset(pkgs[x] for x in deps) for cpv, deps in specs}
+
+
+class TestOpDependencies(object):
+
+    def test_deps(self):
+        ops = mk_ops(
+            ('dev-libs/a-1',),
+            ('dev-libs/b-1', ('dev-libs/a-1',)),
+            ('dev-libs/c-1', ('dev-libs/a-1',)),
+            ('dev-libs/d-1', ('dev-libs/b-1', 'dev-libs/c-1')),
+            # deps on later ops are ignored
+            ('dev-libs/e-1', ('dev-libs/f-1',)),
+            ('dev-libs/f-1',),
+        )
+        assert op_dependencies(ops, pkg_deps(ops)) == [
+            frozenset(), {0}, {0}, {1, 2}, frozenset(), frozenset()]
+
+    def test_indirect(self):
+        # deps are followed through pkgs without ops
+        ops = mk_ops(('dev-libs/a-1',), ('dev-libs/b-1', ('virtual/a-1',)))
+        deps = pkg_deps(ops, ('virtual/a-1', ('dev-libs/a-1',)))
+        assert op_dependencies(ops, deps) == [frozenset(), {0}]
+
+    def test_remove_barrier(self):
+        ops = mk_ops(
+            ('dev-libs/a-1',),
+            ('dev-libs/b-1',),
+            ('dev-libs/c-1', (), 'remove'),
+            ('dev-libs/d-1',),
+        )
+        assert op_dependencies(ops, pkg_deps(ops)) == [
+            frozenset(), frozenset(), {0, 1}, {2}]
+
+
+class TestMergeScheduler(object):
+
+    def run(self, ops, jobs=1, fail=(), **kwargs):
+        events = []
+        lock = threading.Lock()
+
+        def build(op):
+            with lock:
+                events.append(('build', op.pkg.package))
+            if op.pkg.package in fail:
+                return False
+            return op.pkg.package
+
+        def merge(op, result):
+            assert result == op.pkg.package
+            events.append(('merge', op.pkg.package))
+
+        scheduler = MergeScheduler(
+            ops, build, merge, jobs=jobs, deps=op_dependencies(ops, pkg_deps(ops)))
+        return scheduler, scheduler.run(**kwargs), events
+
+    def test_serial(self):
+        ops = mk_ops(('dev-libs/a-1',), ('dev-libs/b-1',), ('dev-libs/c-1', ('dev-libs/a-1',)))
+        _, result, events = self.run(ops)
+        assert result
+        assert events == [
+            ('build', 'a'), ('merge', 'a'), ('build', 'b'), ('merge', 'b'),
+            ('build', 'c'), ('merge', 'c')]
+
+        # a single job builds in the calling thread
+        threads = []
+        scheduler = MergeScheduler(
+            ops, lambda op: threads.append(threading.current_thread()), lambda *args: None)
+        assert scheduler.run()
+        assert threads == [threading.current_thread()] * len(ops)
+
+    def test_parallel(self):
+        ops = mk_ops(
+            ('dev-libs/a-1',), ('dev-libs/b-1',), ('dev-libs/c-1', ('dev-libs/a-1',)),
+            ('dev-libs/d-1', ('dev-libs/c-1',)))
+        barrier = threading.Barrier(2, timeout=10)
+        events = []
+
+        def build(op):
+            if op.pkg.package in ('a', 'b'):
+                # fails unless both builds run concurrently
+                barrier.wait()
+            return op.pkg.package
+
+        def merge(op, result):
+            events.append(result)
+
+        scheduler = MergeScheduler(
+            ops, build, merge, jobs=2, deps=op_dependencies(ops, pkg_deps(ops)))
+        assert scheduler.run()
+        assert sorted(events[:2]) == ['a', 'b']
+        assert events[2:] == ['c', 'd']
+
+    def test_failures(self):
+        ops = mk_ops(
+            ('dev-libs/a-1',), ('dev-libs/b-1', ('dev-libs/a-1',)),
+            ('dev-libs/c-1',), ('dev-libs/d-1', ('dev-libs/b-1',)))
+        scheduler, result, events = self.run(ops, fail=('a',))
+        assert not result
+        assert scheduler.failed == [ops[0]]
+        assert events == [('build', 'a')]
+
+        # dependents of failed ops are skipped
+        scheduler, result, events = self.run(ops, fail=('a',), ignore_failures=True)
+        assert not result
+        assert scheduler.failed == [ops[0]]
+        assert scheduler.skipped == [ops[1], ops[3]]
+        assert events == [('build', 'a'), ('build', 'c'), ('merge', 'c')]
+
+    @pytest.mark.parametrize('jobs', (1, 2))
+    def test_ebd(self, tmpdir, jobs):
+        path = str(tmpdir)
+        for pkg in ('a', 'b'):
+            ensure_dirs(pjoin(path, 'cat', pkg))
+            with open(pjoin(path, 'cat', pkg, f'{pkg}-1.ebuild'), 'w') as f:
+                f.write(f'EAPI=7\nSLOT="{pkg}"\n')
+        ensure_dirs(pjoin(path, 'eclass'))
+        ensure_dirs(pjoin(path, 'profiles'))
+        ensure_dirs(pjoin(path, 'metadata'))
+        with open(pjoin(path, 'metadata', 'layout.conf'), 'w') as f:
+            f.write('masters =\n')
+        repo = repository.UnconfiguredTree(
+            path, eclass_cache=eclass_cache.cache(pjoin(path, 'eclass')))
+        ops = [FakeOp('cat/a-1'), FakeOp('cat/b-1')]
+        for op in ops:
+            op.pkg = repo.match(op.pkg.unversioned_atom)[0]
+        merged = []
+
+        def build(op):
+            # processor timeouts must work outside the main thread as well
+            ebp = processor.request_ebuild_processor()
+            try:
+                ebp.write('alive')
+                assert ebp.expect('yep!', timeout=10)
+                return ebp.get_keys(op.pkg, repo.eclass_cache)
+            finally:
+                processor.release_ebuild_processor(ebp)
+
+        def merge(op, result):
+            merged.append((op.pkg.package, result['SLOT']))
+
+        try:
+            assert MergeScheduler(
+                ops, build, merge, jobs=jobs, deps=[frozenset(), frozenset()]).run()
+        finally:
+            processor.shutdown_all_processors()
+        assert sorted(merged) == [('a', 'a'), ('b', 'b')]
+
+
+class TestFetchScheduler(object):
+
+    def test_result(self):
+        ops = mk_ops(('dev-libs/a-1',), ('dev-libs/b-1', (), 'remove'), ('dev-libs/c-1',))
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch(op):
+            if op.pkg.package == 'a':
+                started.set()
+                assert release.wait(10)
+            return op.pkg.package
+
+        with pytest.raises(ValueError):
+            FetchScheduler(ops, fetch, jobs=0)
+
+        with FetchScheduler(ops, fetch, jobs=2) as fetcher:
+            assert started.wait(10)
+            # results of other ops are available while 'a' is still fetching
+            assert fetcher.result(ops[2]) == 'c'
+            release.set()
+            assert fetcher.result(ops[0]) == 'a'
+            # removals aren't fetched
+            with pytest.raises(KeyError):
+                fetcher.result(ops[1])
+
+    def test_errors(self):
+        ops = mk_ops(('dev-libs/a-1',))
+
+        def fetch(op):
+            raise RuntimeError('fetching failed')
+
+        with FetchScheduler(ops, fetch) as fetcher:
+            with pytest.raises(RuntimeError):
+                fetcher.result(ops[0])
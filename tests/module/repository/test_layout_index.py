@@ -0,0 +1,73 @@
+import json
+import os
+
+from pkgcore.repository.layout_index import LayoutIndex
+from pkgcore.test.misc import backdate
+
+
+class TestLayoutIndex(object):
+
+    def test_lookup(self, tmpdir):
+        d = str(tmpdir.mkdir('dir'))
+        backdate(d)
+        index = LayoutIndex(str(tmpdir.join('index')))
+        calls = []
+
+        def listdir():
+            calls.append(None)
+            return tuple(sorted(os.listdir(d)))
+
+        assert index.lookup('key', [d], listdir) == ()
+        assert index.lookup('key', [d], listdir) == ()
+        assert len(calls) == 1
+
+        # changes to the path regenerate the entry
+        os.mkdir(os.path.join(d, 'a'))
+        backdate(d)
+        assert index.lookup('key', [d], listdir) == ('a',)
+        assert len(calls) == 2
+
+    def test_missing_path(self, tmpdir):
+        d = str(tmpdir.join('missing'))
+        index = LayoutIndex(str(tmpdir.join('index')))
+        assert index.lookup('key', [d], lambda: ()) == ()
+        assert index.lookup('key', [d], lambda: ('a',)) == ()
+        os.mkdir(d)
+        backdate(d)
+        assert index.lookup('key', [d], lambda: ('a',)) == ('a',)
+
+    def test_racy(self, tmpdir):
+        d = str(tmpdir.mkdir('dir'))
+        index = LayoutIndex(str(tmpdir.join('index')))
+        # recently modified paths aren't cached
+        assert index.lookup('key', [d], lambda: ()) == ()
+        assert index.lookup('key', [d], lambda: ('a',)) == ('a',)
+
+    def test_flush(self, tmpdir):
+        d = str(tmpdir.mkdir('dir'))
+        backdate(d)
+        path = str(tmpdir.join('cache', 'index'))
+        index = LayoutIndex(path)
+        index.flush()
+        assert not os.path.exists(path)
+
+        assert index.lookup('key', [d], lambda: ('a', 'b')) == ('a', 'b')
+        index.flush()
+        index = LayoutIndex(path)
+        assert index.lookup('key', [d], lambda: ()) == ('a', 'b')
+
+        # unwritable locations are ignored
+        index = LayoutIndex(str(tmpdir.join('dir', 'index', 'path')))
+        open(str(tmpdir.join('dir', 'index')), 'w').close()
+        index.lookup('key', [d], lambda: ())
+        index.flush()
+
+    def test_invalid(self, tmpdir):
+        d = str(tmpdir.mkdir('dir'))
+        backdate(d)
+        path = str(tmpdir.join('index'))
+        for data in ('', '{}', json.dumps({'version': 0, 'entries': {}})):
+            with open(path, 'w') as f:
+                f.write(data)
+            index = LayoutIndex(path)
+            assert index.lookup('key', [d], lambda: ('a',)) == ('a',)
@@ -0,0 +1,104 @@
+import os
+from unittest import mock
+
+from pkgcore.ebuild.atom import atom
+from pkgcore.repository.match_cache import MatchCache
+from pkgcore.repository.misc import caching_repo
+from pkgcore.test.misc import FakePkg, FakeRepo
+
+
+def highest(pkgs):
+    return sorted(pkgs, reverse=True)
+
+
+class TestMatchCache(object):
+
+    def mk_repo(self, tmpdir, *cpvs):
+        stamp = str(tmpdir.join('stamp'))
+        if not os.path.exists(stamp):
+            open(stamp, 'w').close()
+        pkgs = [FakePkg(cpv, repo=FakeRepo(repo_id='test')) for cpv in cpvs]
+        return FakeRepo(pkgs=pkgs, repo_id='test', _generation_paths=lambda: [stamp])
+
+    def queries(self, itermatch):
+        return [str(x[0][0]) for x in itermatch.call_args_list]
+
+    def test_reuse(self, tmpdir):
+        path = str(tmpdir.join('cache'))
+        repo = self.mk_repo(tmpdir, 'cat/a-1', 'cat/a-2', 'cat/b-1')
+        a = atom('cat/a')
+
+        cache = MatchCache(path, 'config')
+        matches = caching_repo(repo, highest, match_cache=cache).match(a)
+        assert matches[0].cpvstr == 'cat/a-2'
+        cache.flush()
+
+        # the leading match is pulled directly via an exact lookup
+        cache = MatchCache(path, 'config')
+        with mock.patch.object(repo, 'itermatch', wraps=repo.itermatch) as itermatch:
+            matches = caching_repo(repo, highest, match_cache=cache).match(a)
+            assert matches[0].cpvstr == 'cat/a-2'
+            assert self.queries(itermatch) == ['=cat/a-2::test']
+            assert [x[1] for x in itermatch.call_args_list] == [{}]
+            # the rest is matched as usual
+            assert [x.cpvstr for x in matches] == ['cat/a-2', 'cat/a-1']
+            assert self.queries(itermatch) == ['=cat/a-2::test', 'cat/a']
+            assert itermatch.call_args_list[1][1] == {'sorter': highest}
+        cache.flush()
+
+        # while the rest of complete entries is pulled via an unversioned lookup
+        cache = MatchCache(path, 'config')
+        with mock.patch.object(repo, 'itermatch', wraps=repo.itermatch) as itermatch:
+            matches = caching_repo(repo, highest, match_cache=cache).match(a)
+            assert [x.cpvstr for x in matches] == ['cat/a-2', 'cat/a-1']
+            assert self.queries(itermatch) == ['=cat/a-2::test', 'cat/a']
+            assert [x[1] for x in itermatch.call_args_list] == [{}, {}]
+
+        # versioned atoms are pulled the same way
+        b = atom('>=cat/a-1')
+        list(caching_repo(repo, highest, match_cache=cache).match(b))
+        with mock.patch.object(repo, 'itermatch', wraps=repo.itermatch) as itermatch:
+            matches = caching_repo(repo, highest, match_cache=cache).match(b)
+            assert [x.cpvstr for x in matches] == ['cat/a-2', 'cat/a-1']
+            assert self.queries(itermatch) == ['=cat/a-2::test', 'cat/a']
+
+        # non-atom restrictions aren't cached
+        restrict = atom('cat/b').restrictions[0]
+        with mock.patch.object(repo, 'itermatch', wraps=repo.itermatch) as itermatch:
+            matches = caching_repo(repo, highest, match_cache=cache).match(restrict)
+            assert [x.cpvstr for x in matches] == ['cat/b-1']
+            assert itermatch.call_count == 1
+
+    def test_invalidation(self, tmpdir):
+        path = str(tmpdir.join('cache'))
+        repo = self.mk_repo(tmpdir, 'cat/a-1', 'cat/a-2')
+        a = atom('cat/a')
+
+        cache = MatchCache(path, 'config')
+        list(caching_repo(repo, highest, match_cache=cache).match(a))
+        cache.flush()
+
+        def assert_matched(config='config'):
+            cache = MatchCache(path, config)
+            with mock.patch.object(repo, 'itermatch', wraps=repo.itermatch) as itermatch:
+                list(caching_repo(repo, highest, match_cache=cache).match(a))
+                assert self.queries(itermatch) == ['cat/a']
+            cache.flush()
+
+        # different configs
+        assert_matched('other')
+        # and changes to the repo regenerate entries
+        st = os.stat(str(tmpdir.join('stamp')))
+        os.utime(str(tmpdir.join('stamp')), ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))
+        assert_matched()
+
+        # stale entries fall back to matching
+        cache = MatchCache(path, 'config')
+        repo.pkgs = repo.pkgs[:1]
+        matches = caching_repo(repo, highest, match_cache=cache).match(a)
+        assert [x.cpvstr for x in matches] == ['cat/a-1']
+
+        # repos not supporting generations aren't cached
+        cache = MatchCache(path, 'config')
+        repo = FakeRepo(pkgs=repo.pkgs, repo_id='test')
+        assert cache.section(repo, highest) is None
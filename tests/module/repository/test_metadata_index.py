@@ -0,0 +1,127 @@
+import os
+from unittest import mock
+
+from pkgcore.ebuild.cpv import versioned_CPV
+from pkgcore.ebuild.repo_objs import Maintainer
+from pkgcore.package.mutated import MutatedPkg
+from pkgcore.repository.metadata_index import MetadataIndex
+from pkgcore.repository.util import SimpleTree
+from pkgcore.restrictions import packages, values
+from pkgcore.test.misc import backdate
+
+
+class IndexedTree(SimpleTree):
+
+    def __init__(self, metadata, index_path, stamp_path):
+        self.metadata = metadata
+        self.stamp_path = stamp_path
+        self.pulled = []
+        d = {}
+        for cpv in map(versioned_CPV, metadata):
+            d.setdefault(cpv.category, {}).setdefault(cpv.package, []).append(cpv.fullver)
+        super().__init__(d, pkg_klass=self._mk_pkg)
+        self.metadata_index = MetadataIndex(index_path)
+
+    def _mk_pkg(self, *args):
+        pkg = versioned_CPV(*args)
+        self.pulled.append(pkg.cpvstr)
+        return MutatedPkg(pkg, self.metadata[pkg.cpvstr])
+
+    def _metadata_index_paths(self, category):
+        return [self.stamp_path]
+
+
+def maintainer(regex):
+    return packages.PackageRestriction(
+        'maintainers', values.AnyMatch(values.UnicodeConversion(
+            values.StrRegex(regex, case_sensitive=False))))
+
+
+class TestMetadataIndex(object):
+
+    metadata = {
+        'cat/a-1': {
+            'eapi': '6', 'license': ('GPL-2',), 'description': 'foo tool',
+            'maintainers': (Maintainer('foo@gentoo.org', 'Foo'),)},
+        'cat/a-2': {
+            'eapi': '7', 'license': ('GPL-2', 'BSD'), 'description': 'foo tool',
+            'maintainers': (Maintainer('foo@gentoo.org', 'Foo'),)},
+        'cat/b-1': {
+            'eapi': '7', 'license': ('MIT',), 'description': 'bar lib',
+            'maintainers': (Maintainer('bar@gentoo.org'),)},
+        'other/c-1': {
+            'eapi': '7', 'license': ('BSD',), 'description': 'foo lib',
+            'maintainers': ()},
+    }
+
+    def mk_tree(self, tmpdir):
+        stamp = tmpdir.join('stamp')
+        if not stamp.check():
+            stamp.ensure()
+            backdate(str(stamp))
+        stamp = str(stamp)
+        return IndexedTree(self.metadata, str(tmpdir.join('index')), stamp)
+
+    def match(self, repo, restrict):
+        return sorted(pkg.cpvstr for pkg in repo.itermatch(restrict))
+
+    def test_match(self, tmpdir):
+        repo = self.mk_tree(tmpdir)
+        assert self.match(repo, maintainer('foo@')) == ['cat/a-1', 'cat/a-2']
+        assert self.match(repo, maintainer('gentoo')) == ['cat/a-1', 'cat/a-2', 'cat/b-1']
+        assert self.match(repo, packages.PackageRestriction(
+            'description', values.StrRegex('lib'))) == ['cat/b-1', 'other/c-1']
+        assert self.match(repo, packages.PackageRestriction(
+            'license', values.ContainmentMatch2(('BSD', 'MIT')))) == \
+            ['cat/a-2', 'cat/b-1', 'other/c-1']
+        assert self.match(repo, packages.PackageRestriction(
+            'license', values.ContainmentMatch2(('BSD', 'GPL-2'), match_all=True))) == \
+            ['cat/a-2']
+
+        # only candidate packages are pulled after the index is generated
+        del repo.pulled[:]
+        assert self.match(repo, packages.PackageRestriction(
+            'eapi', values.StrExactMatch('6'))) == ['cat/a-1']
+        assert sorted(repo.pulled) == ['cat/a-1', 'cat/a-2']
+
+    def test_planning(self, tmpdir):
+        repo = self.mk_tree(tmpdir)
+        index = repo.metadata_index
+        eapi7 = packages.PackageRestriction('eapi', values.StrExactMatch('7'))
+        cat = packages.PackageRestriction('category', values.StrExactMatch('cat'))
+
+        # unindexed restrictions don't trigger index generation
+        assert index.match(repo, cat) is None
+        assert index._postings is None
+        assert index.match(repo, packages.PackageRestriction(
+            'eapi', values.StrExactMatch('7'), negate=True)) is None
+
+        assert index.match(repo, packages.AndRestriction(eapi7, cat)) == \
+            frozenset(['cat/a/2', 'cat/b/1', 'other/c/1'])
+        assert index.match(repo, packages.OrRestriction(eapi7, cat)) is None
+        assert index.match(repo, packages.OrRestriction(eapi7, maintainer('foo'))) == \
+            frozenset(['cat/a/1', 'cat/a/2', 'cat/b/1', 'other/c/1'])
+
+        # residual restrictions are still applied
+        assert self.match(repo, packages.AndRestriction(eapi7, cat)) == \
+            ['cat/a-2', 'cat/b-1']
+
+    def test_persistence(self, tmpdir):
+        repo = self.mk_tree(tmpdir)
+        assert self.match(repo, maintainer('bar')) == ['cat/b-1']
+        repo.metadata_index.flush()
+
+        repo = self.mk_tree(tmpdir)
+        with mock.patch.object(MetadataIndex, '_generate') as generate:
+            assert self.match(repo, maintainer('bar')) == ['cat/b-1']
+            generate.assert_not_called()
+
+        # changes to the related paths regenerate the index
+        os.utime(str(tmpdir.join('stamp')))
+        backdate(str(tmpdir.join('stamp')), secs=30)
+        repo = self.mk_tree(tmpdir)
+        with mock.patch.object(
+                MetadataIndex, '_generate', autospec=True,
+                side_effect=MetadataIndex._generate) as generate:
+            assert self.match(repo, maintainer('bar')) == ['cat/b-1']
+            assert generate.call_count == 2
@@ -1,11 +1,14 @@
 # Copyright: 2007 Brian Harring <ferringb@gmail.com>
 # License: GPL2/BSD
 
+from unittest import mock
+
 from snakeoil.currying import post_curry
 from snakeoil.test import TestCase
 
+from pkgcore.ebuild.atom import atom
 from pkgcore.resolver import plan
-from pkgcore.test.misc import FakePkg
+from pkgcore.test.misc import FakePkg, FakeRepo
 
 
 class TestPkgSorting(TestCase):
@@ -30,3 +33,90 @@ class TestPkgSorting(TestCase):
 
     test_pkg_sort_lowest = post_curry(check_it, plan.pkg_sort_lowest,
         [11,9,1,6], [1,6,9,11])
+
+    def test_livefs(self):
+        vdb = FakeRepo(repo_id='vdb', livefs=True)
+        pkgs = [
+            FakePkg('d-b/a-1'), FakePkg('d-b/a-2', repo=vdb),
+            FakePkg('d-b/a-1', repo=vdb), FakePkg('d-b/a-2')]
+
+        def sort(sorter, *args):
+            l = sorter(*(args + ([[x] for x in pkgs],)))
+            return [(x[0].fullver, x[0].repo.livefs) for x in l]
+
+        assert sort(plan.highest_iter_sort) == [
+            ('2', True), ('2', False), ('1', True), ('1', False)]
+        assert sort(plan.lowest_iter_sort) == [
+            ('1', True), ('1', False), ('2', True), ('2', False)]
+        # nonlivefs pkgs not matching the restriction are preferred
+        assert sort(plan.downgrade_iter_sort, atom('=d-b/a-2')) == [
+            ('1', False), ('2', False), ('2', True), ('1', True)]
+
+
+class TestIncrementalResolution(object):
+
+    def mk_resolver(self):
+        repo = FakeRepo(repo_id='test')
+        repo.pkgs = [
+            FakePkg('cat/a-1', data={'RDEPEND': 'cat/dep'}, repo=repo),
+            FakePkg('cat/b-1', data={'RDEPEND': 'cat/missing'}, repo=repo),
+            FakePkg('cat/c-1', data={'RDEPEND': 'cat/dep'}, repo=repo),
+            FakePkg('cat/dep-1', repo=repo),
+        ]
+        return plan.merge_plan(
+            [repo], plan.pkg_sort_highest,
+            plan.merge_plan.prefer_highest_version_strategy)
+
+    def pkgs(self, resolver):
+        return sorted(x.pkg.cpvstr for x in resolver.state.iter_ops())
+
+    def resolved(self, resolver):
+        return [str(x) for x, _pos in resolver.state.checkpoints]
+
+    def test_resume(self):
+        resolver = self.mk_resolver()
+        a, b, c = atom('cat/a'), atom('cat/b'), atom('cat/c')
+        ret = resolver.add_atoms([a, b, c])
+        assert ret[0][0] == b
+        # the failed atom is dropped, keeping the prior resolution
+        assert self.resolved(resolver) == ['cat/a']
+        assert self.pkgs(resolver) == ['cat/a-1', 'cat/dep-1']
+
+        # previously added atoms aren't resolved again
+        with mock.patch.object(resolver, '_add_atom', wraps=resolver._add_atom) as add_atom:
+            assert not resolver.add_atoms([a, c])
+            assert [x[0][0] for x in add_atom.call_args_list] == [c]
+        assert self.resolved(resolver) == ['cat/a', 'cat/c']
+        assert self.pkgs(resolver) == ['cat/a-1', 'cat/c-1', 'cat/dep-1']
+
+    def test_remove_atoms(self):
+        resolver = self.mk_resolver()
+        a, c = atom('cat/a'), atom('cat/c')
+        assert not resolver.add_atoms([a, c])
+        assert not resolver.remove_atoms([atom('cat/b')])
+        assert self.resolved(resolver) == ['cat/a', 'cat/c']
+
+        # later atoms are resolved again, pulling in the deps they share
+        # with the removed atoms
+        with mock.patch.object(resolver, '_add_atom', wraps=resolver._add_atom) as add_atom:
+            assert not resolver.remove_atoms([a])
+            assert [x[0][0] for x in add_atom.call_args_list] == [c]
+        assert self.resolved(resolver) == ['cat/c']
+        assert self.pkgs(resolver) == ['cat/c-1', 'cat/dep-1']
+
+        resolver.reset()
+        assert not resolver.state.checkpoints
+        assert not self.pkgs(resolver)
+
+    def test_pkg_deps(self):
+        resolver = self.mk_resolver()
+        assert not resolver.add_atoms([atom('cat/a')])
+        deps = {
+            pkg.cpvstr: sorted(x.cpvstr for x in pkgs)
+            for pkg, pkgs in resolver.state.pkg_deps.items()}
+        assert deps == {'cat/a-1': ['cat/dep-1'], 'cat/dep-1': []}
+
+        # dropped along with the ops on backtracking
+        resolver.reset()
+        assert not resolver.state.pkg_deps
+
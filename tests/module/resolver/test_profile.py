@@ -0,0 +1,68 @@
+import io
+import json
+
+from pkgcore.ebuild.atom import atom
+from pkgcore.resolver import plan
+from pkgcore.resolver.profile import ResolverProfile
+from pkgcore.test.misc import FakePkg, FakeRepo
+
+
+class TestResolverProfile(object):
+
+    def mk_resolver(self, profile):
+        repo = FakeRepo(repo_id='test')
+        repo.pkgs = [
+            FakePkg('cat/a-1', data={'RDEPEND': 'cat/b cat/c'}, repo=repo),
+            FakePkg('cat/b-1', data={'RDEPEND': 'cat/c'}, repo=repo),
+            FakePkg('cat/c-1', data={'RDEPEND': '!cat/d'}, repo=repo),
+            FakePkg('cat/c-2', data={'RDEPEND': 'cat/missing'}, repo=repo),
+        ]
+        return plan.merge_plan(
+            [repo], plan.pkg_sort_highest,
+            plan.merge_plan.prefer_highest_version_strategy, profile=profile)
+
+    def test_report(self):
+        profile = ResolverProfile()
+        resolver = self.mk_resolver(profile)
+        assert not resolver.add_atoms([atom('cat/a')])
+        assert sorted(str(x.pkg.cpvstr) for x in resolver.state.iter_ops()) == \
+            ['cat/a-1', 'cat/b-1', 'cat/c-1']
+        # resolving again reuses the cached repo queries
+        resolver.reset()
+        assert not resolver.add_atoms([atom('cat/a')])
+
+        f = io.StringIO()
+        profile.dump(f)
+        report = json.loads(f.getvalue())
+
+        phases = report['phases']
+        assert phases['add_atoms']['count'] == 2
+        assert phases['process_blocker']['count'] == 2
+        # unused hooks are skipped
+        assert 'load_vdb_state' not in phases
+        for timing in phases.values():
+            assert timing['time'] >= timing['own_time'] >= 0
+
+        atoms = report['atoms']
+        assert atoms['cat/a']['count'] == 2
+        # insoluble atoms are pruned from later choices
+        assert atoms['cat/missing']['count'] == 1
+        # nested resolution is included in the total
+        assert atoms['cat/a']['time'] >= atoms['cat/b']['time']
+
+        repo = report['repos']['test']
+        assert repo['misses'] == 4
+        assert repo['hits'] == repo['queries'] - 4 > 0
+        assert repo['hit_rate'] == round(repo['hits'] / repo['queries'], 4)
+
+        # cat/c-2 fails due to its missing dep, falling back to cat/c-1
+        backtracks = report['backtracks']
+        assert backtracks['count'] >= 1
+        assert sum(backtracks['depths'].values()) == backtracks['count']
+        assert sum(backtracks['ops_undone'].values()) == backtracks['count']
+
+    def test_disabled(self):
+        resolver = self.mk_resolver(None)
+        assert resolver.profile is None
+        assert 'add_atoms' not in vars(resolver)
+        assert not resolver.add_atoms([atom('cat/a')])
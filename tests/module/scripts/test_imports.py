@@ -0,0 +1,54 @@
+import pkgutil
+import sys
+
+import pytest
+
+from pkgcore import scripts
+from pkgcore.test.scripts.helpers import import_times
+
+# cold import time budget of a script, including building its argparser, as a
+# multiple of the time to import the commandline framework all scripts build
+# on; being relative keeps it independent of the speed of the test system
+budget = 5
+
+# modules only required when running commands, not for building their argparsers
+lazy_modules = frozenset([
+    'pkgcore.ebuild.domain',
+    'pkgcore.ebuild.repository',
+    'pkgcore.ebuild.resolver',
+    'pkgcore.plugin',
+    'pkgcore.resolver.plan',
+])
+
+# modules required by specific scripts
+required_modules = {
+    'pplugincache': frozenset(['pkgcore.plugin']),
+}
+
+
+def import_time(module):
+    """Return the total cold import time of a module."""
+    return sum(x[1] for x in import_times(module))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="-X importtime requires python 3.7")
+@pytest.mark.parametrize('script', sorted(x.name for x in pkgutil.iter_modules(scripts.__path__)))
+class TestImports(object):
+
+    def test_lazy_modules(self, script):
+        modules = {x[0] for x in import_times(f'pkgcore.scripts.{script}')}
+        unexpected = lazy_modules.difference(required_modules.get(script, ())) & modules
+        assert not unexpected, f'{script} imports {", ".join(sorted(unexpected))}'
+
+    def test_import_time(self, script):
+        # time the reference alongside the script and use the best of a few
+        # runs to avoid failing on load spikes
+        ratios = []
+        for _ in range(5):
+            reference = import_time('pkgcore.util.commandline')
+            ratios.append(import_time(f'pkgcore.scripts.{script}') / reference)
+            if ratios[-1] <= budget:
+                break
+        assert min(ratios) <= budget, (
+            f'{script} import took {min(ratios):.1f}x as long as '
+            f'pkgcore.util.commandline, budget is {budget}x')
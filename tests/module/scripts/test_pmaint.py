@@ -255,3 +255,8 @@ class TestRegen(TestCase, ArgParseMixin):
             'fake', '--threads', '2', domain=make_domain())
         self.assertTrue(isinstance(options.repos[0], util.SimpleTree))
         self.assertEqual(options.threads, 2)
+        self.assertEqual(options.engine, 'thread')
+
+        options = self.parse(
+            'fake', '--engine', 'process', domain=make_domain())
+        self.assertEqual(options.engine, 'process')
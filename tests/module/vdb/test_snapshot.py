@@ -0,0 +1,100 @@
+import os
+import time
+from unittest import mock
+
+import pytest
+
+from pkgcore.vdb import ondisk, repo_ops
+from pkgcore.vdb.snapshot import VdbSnapshot
+
+
+class TestVdbSnapshot(object):
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmpdir):
+        self.location = str(tmpdir.join('vdb'))
+        self.cache = str(tmpdir.join('cache'))
+        self.add_pkg('cat/pkg-1', SLOT='0\n', EAPI='7\n', repository='gentoo\n')
+        self.add_pkg('cat/pkg-2', SLOT='2\n', EAPI='7\n', RDEPEND='cat/dep\n')
+
+    def add_pkg(self, cpvstr, **metadata):
+        path = os.path.join(self.location, cpvstr)
+        os.makedirs(path, exist_ok=True)
+        for k, v in metadata.items():
+            # files are replaced, not rewritten in place
+            with open(os.path.join(path, f'.{k}'), 'w') as f:
+                f.write(v)
+            os.rename(os.path.join(path, f'.{k}'), os.path.join(path, k))
+
+    def mk_repo(self):
+        return ondisk.tree(self.location, cache_location=self.cache)
+
+    def metadata(self, repo):
+        return {
+            pkg.cpvstr: (pkg.slot, str(pkg.rdepend), pkg.source_repository)
+            for pkg in repo}
+
+    def test_refresh(self):
+        snapshot = VdbSnapshot(os.path.join(self.cache, 'snapshot'))
+        snapshot.refresh(self.location)
+        snapshot = VdbSnapshot(os.path.join(self.cache, 'snapshot'))
+        path = os.path.join(self.location, 'cat/pkg-1')
+        assert snapshot.get('cat/pkg-1', path) == {
+            'SLOT': '0\n', 'EAPI': '7\n', 'repository': 'gentoo\n'}
+        assert snapshot.get('cat/pkg-3', path) is None
+
+        # modified pkgs aren't used
+        self.add_pkg('cat/pkg-1', USE='foo\n')
+        assert snapshot.get('cat/pkg-1', path) is None
+        snapshot.refresh(self.location)
+        assert snapshot.get('cat/pkg-1', path)['USE'] == 'foo\n'
+
+        # as are pkgs with files rewritten in place, even if their mtimes are restored
+        use = os.path.join(path, 'USE')
+        st = os.stat(use)
+        time.sleep(0.1)
+        with open(use, 'w') as f:
+            f.write('bar\n')
+        os.utime(use, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert snapshot.get('cat/pkg-1', path) is None
+        snapshot.refresh(self.location)
+        assert snapshot.get('cat/pkg-1', path)['USE'] == 'bar\n'
+
+        # removed pkgs are dropped
+        os.rename(path, os.path.join(self.location, 'cat/.tmp.pkg-1'))
+        snapshot.refresh(self.location)
+        assert list(snapshot.entries) == ['cat/pkg-2']
+
+        with open(snapshot.path, 'w') as f:
+            f.write('{')
+        with mock.patch('pkgcore.cache.stamped.logger') as logger:
+            assert VdbSnapshot(snapshot.path).entries == {}
+            assert logger.warning.call_count == 1
+
+    def test_metadata(self):
+        expected = self.metadata(self.mk_repo())
+        repo_ops.update_snapshot(self.mk_repo())
+
+        repo = self.mk_repo()
+        with mock.patch('pkgcore.vdb.ondisk.readfile') as readfile:
+            assert self.metadata(repo) == expected
+            assert readfile.call_count == 0
+
+        # stale pkgs fall back to reading their vdb entries
+        self.add_pkg('cat/pkg-2', SLOT='3\n')
+        self.add_pkg('cat/pkg-3', SLOT='0\n', EAPI='7\n')
+        repo = self.mk_repo()
+        with mock.patch('pkgcore.vdb.ondisk.readfile', wraps=ondisk.readfile) as readfile:
+            metadata = self.metadata(repo)
+            assert metadata['cat/pkg-1'] == expected['cat/pkg-1']
+            assert metadata['cat/pkg-2'][0] == '3'
+            assert metadata['cat/pkg-3'][0] == '0'
+            paths = {os.path.dirname(x[0][0]) for x in readfile.call_args_list}
+            assert paths == {
+                os.path.join(self.location, x) for x in ('cat/pkg-2', 'cat/pkg-3')}
+
+    def test_disabled(self):
+        repo = ondisk.tree(self.location, disable_cache=True)
+        assert repo._snapshot is None
+        repo_ops.update_snapshot(repo)
+        assert not os.path.exists(self.cache)